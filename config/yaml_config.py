@@ -32,6 +32,19 @@ class YamlConfig:
             return [v.to_primitive() for v in self._value]
         return self._value
 
+    def get_value(self, path: str, default: Any = None) -> Any:
+        """
+        按点分路径读取可选配置项并返回原生值，缺失时返回 default
+        例: config.get_value("pmf.application.async_mode", False)
+        """
+        node: Any = self
+        for key in path.split("."):
+            if not isinstance(node, YamlConfig) or not isinstance(node._value, dict) or key not in node._value:
+                return default
+            node = node._value[key]
+        value = node.to_primitive()
+        return default if value is None else value
+
     def __getattr__(self, name: str) -> Any:
         # 允许通过属性访问映射中的键：model.somekey
         if isinstance(self._value, dict) and name in self._value:
@@ -8,12 +8,13 @@ from pathlib import Path
 # sys.path.insert(0, project_root)
 from config.yaml_config import load_yaml_config
 from config.config import get_plugin_config
-from db.redisClient import RedisClient
+from db.redisClient import RedisClient, AsyncRedisClient
 from db.mysqlClient import mysql
-from db.mongoClient import mongo
+from db.mongoClient import mongo, amongo
+from db.mongoProfiler import QueryProfiler, profiler_router
 from registry import etcdRegistry,consulRegistry,polarisRegistry,nacosRegistry
 from fastapi import FastAPI
-from utils import iputil
+from utils import iputil, traceutil
 from mq.mqtt import MQTTClient
 from mq.rabbit import RabbitMQClient
 from storage.s3 import S3Manager
@@ -28,8 +29,12 @@ class App:
     config = None
     class client:
         mysql = None
-        redis = None
+        redis = None            # redis.Redis（集群/哨兵模式为 RedisCluster / 哨兵主节点客户端）
+        aredis = None           # redis.asyncio 客户端，async_mode 开启时提供
+        redis_client = None     # db.redisClient.RedisClient，批量操作、锁、Stream 等辅助方法
+        aredis_client = None    # db.redisClient.AsyncRedisClient
         mgo = None
+        amgo = None
         mqtt = None
         rabbitmq = None
         kafka = None
@@ -44,6 +49,9 @@ class App:
         self.config_file = config_file
         self.config_path = os.path.dirname(config_file)
         self.config = load_yaml_config(config_file)
+        # 追踪需在客户端建立连接之前启用，各客户端据此安装追踪钩子
+        traceutil.from_config(self.config.get_value("pmf.trace", {}),
+                              default_service=self.config.get_value("pmf.application.name", "pmf"))
         self.init_clients()
         global app
         app = self
@@ -64,12 +72,29 @@ class App:
         if "redis" in used_clients:
             redis_config = get_plugin_config(cfg_server, cfg_server_addr, self.config.pmf.config.prefix.redis.to_primitive(), cfg_env, cfg_ext, app_project,self.config_path)
             logger.debug(f"正在初始化Redis客户端,配置信息为：{redis_config}")
-            self.client.redis = RedisClient(host=redis_config.pmf.data.redis.host.to_primitive(), 
-                                            port=redis_config.pmf.data.redis.port.to_primitive(),
-                                            db=redis_config.pmf.data.redis.database.to_primitive(), 
-                                            password=redis_config.pmf.data.redis.password.to_primitive(),
-                                            socket_timeout=redis_config.pmf.data.redis.timeout.to_primitive(),
-                                            max_connections=redis_config.pmf.data.redis_pool.max.to_primitive()).connect()
+            # mode: standalone(默认，host/port) / cluster(nodes) / sentinel(sentinels + master)
+            redis_kwargs = dict(host=redis_config.get_value("pmf.data.redis.host", "localhost"), 
+                                port=redis_config.get_value("pmf.data.redis.port", 6379),
+                                db=redis_config.get_value("pmf.data.redis.database", 0), 
+                                mode=redis_config.get_value("pmf.data.redis.mode", "standalone"),
+                                cluster_nodes=redis_config.get_value("pmf.data.redis.nodes"),
+                                sentinels=redis_config.get_value("pmf.data.redis.sentinels"),
+                                master_name=redis_config.get_value("pmf.data.redis.master", "mymaster"),
+                                sentinel_password=redis_config.get_value("pmf.data.redis.sentinel_password"),
+                                password=redis_config.pmf.data.redis.password.to_primitive(),
+                                socket_timeout=redis_config.pmf.data.redis.timeout.to_primitive(),
+                                max_connections=redis_config.pmf.data.redis_pool.max.to_primitive(),
+                                batch_size=redis_config.get_value("pmf.data.redis_pool.batch", 500),
+                                codecs=redis_config.get_value("pmf.data.redis.codecs"),
+                                default_codec=redis_config.get_value("pmf.data.redis.default_codec", "json"))
+            # App.client.redis 仍为 redis 客户端本身，辅助方法（mget_many/lock/publish_stream 等）通过 App.client.redis_client 使用
+            self.client.redis_client = RedisClient(**redis_kwargs)
+            self.client.redis = self.client.redis_client.connect()
+            if self.config.get_value("pmf.application.async_mode", False):
+                # 异步模式下额外提供 redis.asyncio 客户端，连接在事件循环内按需建立
+                self.client.aredis_client = AsyncRedisClient(**redis_kwargs)
+                self.client.aredis = self.client.aredis_client.connect()
+                self.app.add_event_handler("shutdown", self.client.aredis_client.close)
             logger.debug(f"Redis客户端初始化完成")
             
         if "mysql" in used_clients:
@@ -84,9 +109,24 @@ class App:
         if "mongo" in used_clients:
             mgo_config = get_plugin_config(cfg_server, cfg_server_addr, self.config.pmf.config.prefix.mongo.to_primitive(), cfg_env, cfg_ext, app_project,self.config_path)
             logger.debug(f"正在初始化Mongo客户端,配置信息为：{mgo_config}")
+            profiler = None
+            if mgo_config.get_value("pmf.data.mongodb.profiler.enabled", False):
+                # 查询分析：慢查询日志、抽样 explain 与索引建议，报告见 GET /debug/mongo/profile
+                profiler = QueryProfiler(slow_ms=mgo_config.get_value("pmf.data.mongodb.profiler.slow_ms", 100),
+                                         sample_rate=mgo_config.get_value("pmf.data.mongodb.profiler.sample_rate", 0.01))
+                self.app.include_router(profiler_router(profiler))
             self.client.mgo = mongo(uri=mgo_config.pmf.data.mongodb.uri.to_primitive(), 
                                     db_name=mgo_config.pmf.data.mongodb.db.to_primitive(),
-                                    pool_size=mgo_config.pmf.data.mongo_pool.max.to_primitive())
+                                    pool_size=mgo_config.pmf.data.mongo_pool.max.to_primitive(),
+                                    profiler=profiler)
+            # 关闭时提交 bulk_writer 缓冲中的数据
+            self.app.add_event_handler("shutdown", self.client.mgo.close_writers)
+            if self.config.get_value("pmf.application.async_mode", False):
+                # 异步模式下额外提供 AsyncMongoClient，连接在事件循环内按需建立
+                self.client.amgo = amongo(uri=mgo_config.pmf.data.mongodb.uri.to_primitive(),
+                                          db_name=mgo_config.pmf.data.mongodb.db.to_primitive(),
+                                          pool_size=mgo_config.pmf.data.mongo_pool.max.to_primitive())
+                self.app.add_event_handler("shutdown", self.client.amgo.close)
             logger.debug(f"Mongo客户端初始化完成")
             
         if "etcd" in used_clients:
@@ -0,0 +1,155 @@
+import random
+import threading
+import time
+import logging
+from typing import Any, Callable
+
+"""
+数据库客户端共用的熔断器。
+
+状态:
+    closed    正常放行，连续失败达到阈值后进入 open
+    open      快速失败，等待一段带抖动的退避时间
+    half_open 退避结束后只放行一个探测请求，成功则 closed，失败则重新 open 并加长退避
+
+Usage:
+    breaker = CircuitBreaker(name="mysql")
+    if not breaker.allow():
+        raise CircuitOpenError("mysql")
+    try:
+        do_query()
+        breaker.record_success()
+    except Exception:
+        breaker.record_failure()
+        raise
+"""
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态时抛出，调用方应直接返回错误而不是等待连接超时"""
+
+    def __init__(self, name: str, retry_after: float = 0.0):
+        super().__init__(f"{name} 熔断中，{retry_after:.1f} 秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    线程安全的熔断器
+    :param name: 名称，用于日志
+    :param failure_threshold: 连续失败多少次后熔断
+    :param base_delay: 首次熔断的退避秒数
+    :param max_delay: 退避秒数上限，每次探测失败退避翻倍
+    :param jitter: 抖动比例，实际退避在 [delay*(1-jitter), delay] 之间，避免多个进程同时重连
+    """
+
+    def __init__(self, name: str = "default", failure_threshold: int = 3, base_delay: float = 1.0,
+                 max_delay: float = 30.0, jitter: float = 0.5):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._state = CLOSED
+        self._failures = 0
+        self._opens = 0
+        self._open_until = 0.0
+        self._probe_deadline = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._open_until:
+                return HALF_OPEN
+            return self._state
+
+    def _backoff(self) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** max(self._opens - 1, 0)))
+        return delay * (1 - self.jitter * random.random())
+
+    def allow(self) -> bool:
+        """是否放行本次调用；半开状态下同一时刻只放行一个探测"""
+        if self._state == CLOSED:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if now < self._open_until:
+                    return False
+                self._state = HALF_OPEN
+                self._probe_deadline = now + self.max_delay
+                logger.info(f"{self.name} 熔断器进入半开状态，放行探测请求")
+                return True
+            # HALF_OPEN: 探测结果未回报且超时，放行新的探测
+            if now >= self._probe_deadline:
+                self._probe_deadline = now + self.max_delay
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            return max(0.0, self._open_until - time.monotonic()) if self._state == OPEN else 0.0
+
+    def record_success(self) -> None:
+        if self._state == CLOSED and self._failures == 0:
+            return
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"{self.name} 探测成功，熔断器关闭")
+            self._state = CLOSED
+            self._failures = 0
+            self._opens = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._open(f"连续失败 {self._failures} 次")
+
+    def _open(self, reason: str) -> None:
+        self._opens += 1
+        delay = self._backoff()
+        self._state = OPEN
+        self._open_until = time.monotonic() + delay
+        logger.warning(f"{self.name} {reason}，熔断 {delay:.1f} 秒")
+
+    def trip(self) -> None:
+        """立即熔断，用于客户端已确认服务端整体不可用的场景"""
+        with self._lock:
+            if self._state == OPEN:
+                return
+            self._failures = max(self._failures, self.failure_threshold)
+            self._open("服务不可用")
+
+    def check(self) -> None:
+        """不放行时抛出 CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在熔断器保护下执行 func，并按结果更新状态"""
+        self.check()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opens = 0
+            self._open_until = 0.0
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional
+
+from pymongo import InsertOne, ReplaceOne, UpdateOne, WriteConcern
+from pymongo.errors import BulkWriteError, PyMongoError
+
+"""
+MongoDB 批量写入缓冲，适用于日志、事件等高频写入的集合。
+
+插入/更新先进入内存缓冲，满 max_ops 条或最早一条等待超过 max_age 秒时以无序 bulk_write 一次提交，
+无序模式下单条失败（如重复 _id）不影响同批其他文档。
+通过 mgo/amgo.bulk_writer 创建的写入器在应用关闭（或客户端 close）时自动提交剩余数据。
+
+Usage:
+    writer = app.client.mgo.bulk_writer("access_log", max_ops=1000, max_age=1, w=1)
+    writer.insert({"path": "/api", "cost": 12})
+    writer.upsert({"_id": "u1"}, {"$inc": {"hits": 1}})
+    writer.stats()
+    writer.close()
+
+    # asyncio
+    writer = app.client.amgo.bulk_writer("access_log")
+    await writer.insert({...})
+    await writer.close()
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class _BulkBuffer:
+    """同步/异步写入器共用的缓冲与统计"""
+
+    def __init__(self, collection, max_ops: int = 1000, max_age: float = 1.0, ordered: bool = False,
+                 write_concern: Optional[WriteConcern] = None, w: Any = None, j: Optional[bool] = None,
+                 wtimeout: Optional[int] = None):
+        if write_concern is None and (w is not None or j is not None or wtimeout is not None):
+            write_concern = WriteConcern(w=w, j=j, wtimeout=wtimeout)
+        self.collection = collection.with_options(write_concern=write_concern) if write_concern else collection
+        self.max_ops = max_ops
+        self.max_age = max_age
+        self.ordered = ordered
+        self._ops: List[Any] = []
+        self._first_at = 0.0
+        self._started = time.monotonic()
+        self._stats = dict(queued=0, written=0, flushes=0, inserted=0, upserted=0, modified=0,
+                           write_errors=0, failed_batches=0, lost=0, flush_seconds=0.0, last_flush_ms=0.0)
+
+    @staticmethod
+    def _upsert_op(filter: Mapping[str, Any], update: Mapping[str, Any]):
+        # 含更新操作符时按 update 处理，否则视为整文档替换
+        if any(k.startswith("$") for k in update):
+            return UpdateOne(filter, update, upsert=True)
+        return ReplaceOne(filter, update, upsert=True)
+
+    def _append(self, op) -> bool:
+        """加入缓冲，返回是否已满需要提交"""
+        if not self._ops:
+            self._first_at = time.monotonic()
+        self._ops.append(op)
+        self._stats["queued"] += 1
+        return len(self._ops) >= self.max_ops
+
+    def _due(self) -> bool:
+        return bool(self._ops) and time.monotonic() - self._first_at >= self.max_age
+
+    def _take(self) -> List[Any]:
+        ops, self._ops = self._ops, []
+        return ops
+
+    def _record(self, ops: List[Any], result: Any, elapsed: float) -> None:
+        s = self._stats
+        s["flushes"] += 1
+        s["flush_seconds"] += elapsed
+        s["last_flush_ms"] = elapsed * 1000
+        s["written"] += len(ops)
+        if result is not None:
+            s["inserted"] += result.inserted_count
+            s["upserted"] += result.upserted_count
+            s["modified"] += result.modified_count
+
+    def _record_error(self, ops: List[Any], e: Exception, elapsed: float) -> None:
+        s = self._stats
+        if isinstance(e, BulkWriteError):
+            details = e.details
+            errors = details.get("writeErrors", [])
+            s["flushes"] += 1
+            s["flush_seconds"] += elapsed
+            s["written"] += len(ops) - len(errors)
+            s["inserted"] += details.get("nInserted", 0)
+            s["upserted"] += details.get("nUpserted", 0)
+            s["modified"] += details.get("nModified", 0)
+            s["write_errors"] += len(errors)
+            first = errors[0].get("errmsg") if errors else details.get("writeConcernErrors")
+            logger.warning(f"{self.collection.name} 批量写入 {len(errors)}/{len(ops)} 条失败: {first}")
+        else:
+            # 连接类错误已由驱动重试过一次（retryWrites），这里不再重试，避免堆积
+            s["failed_batches"] += 1
+            s["lost"] += len(ops)
+            logger.error(f"{self.collection.name} 批量写入失败，丢弃 {len(ops)} 条: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """写入统计，throughput 为自创建以来的平均写入条数/秒，flush_rate 为提交期间的写入条数/秒"""
+        s = dict(self._stats)
+        s["pending"] = len(self._ops)
+        uptime = time.monotonic() - self._started
+        s["throughput"] = s["written"] / uptime if uptime > 0 else 0.0
+        s["flush_rate"] = s["written"] / s["flush_seconds"] if s["flush_seconds"] else 0.0
+        return s
+
+
+class BulkWriter(_BulkBuffer):
+    """
+    同步批量写入器，后台线程按 max_age 定时提交
+    :param collection: pymongo Collection
+    :param max_ops: 缓冲条数达到该值时由调用线程立即提交
+    :param max_age: 缓冲中最早一条的最长等待秒数
+    :param ordered: 是否有序提交，默认无序
+    :param write_concern / w / j / wtimeout: 写关注，日志类数据可使用 w=1 或 w=0
+    """
+
+    def __init__(self, collection, **kwargs: Any):
+        super().__init__(collection, **kwargs)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"bulk-{self.collection.name}", daemon=True)
+        self._thread.start()
+
+    def add(self, op) -> None:
+        """加入任意 pymongo 写操作（InsertOne/UpdateOne/DeleteOne...）"""
+        with self._lock:
+            full = self._append(op)
+        if full:
+            self.flush()
+
+    def insert(self, doc: Mapping[str, Any]) -> None:
+        self.add(InsertOne(doc))
+
+    def upsert(self, filter: Mapping[str, Any], update: Mapping[str, Any]) -> None:
+        self.add(self._upsert_op(filter, update))
+
+    def flush(self) -> None:
+        with self._lock:
+            ops = self._take()
+        if not ops:
+            return
+        start = time.perf_counter()
+        try:
+            result = self.collection.bulk_write(ops, ordered=self.ordered)
+        except PyMongoError as e:
+            with self._lock:
+                self._record_error(ops, e, time.perf_counter() - start)
+            return
+        with self._lock:
+            self._record(ops, result if result.acknowledged else None, time.perf_counter() - start)
+
+    def _run(self) -> None:
+        interval = max(min(self.max_age / 4, 1.0), 0.01)
+        while not self._stop.wait(interval):
+            if self._due():
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.exception(f"{self.collection.name} 定时提交异常: {e}")
+
+    def close(self) -> None:
+        """停止定时线程并提交剩余数据"""
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class AsyncBulkWriter(_BulkBuffer):
+    """
+    异步批量写入器，参数同 BulkWriter，collection 为 AsyncMongoClient 的集合
+    定时提交任务在首次写入时于当前事件循环中创建
+    """
+
+    def __init__(self, collection, **kwargs: Any):
+        super().__init__(collection, **kwargs)
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def add(self, op) -> None:
+        if self._task is None and not self._closed:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if self._append(op):
+            await self.flush()
+
+    async def insert(self, doc: Mapping[str, Any]) -> None:
+        await self.add(InsertOne(doc))
+
+    async def upsert(self, filter: Mapping[str, Any], update: Mapping[str, Any]) -> None:
+        await self.add(self._upsert_op(filter, update))
+
+    async def flush(self) -> None:
+        ops = self._take()
+        if not ops:
+            return
+        start = time.perf_counter()
+        try:
+            result = await self.collection.bulk_write(ops, ordered=self.ordered)
+        except PyMongoError as e:
+            self._record_error(ops, e, time.perf_counter() - start)
+            return
+        self._record(ops, result if result.acknowledged else None, time.perf_counter() - start)
+
+    async def _run(self) -> None:
+        interval = max(min(self.max_age / 4, 1.0), 0.01)
+        while True:
+            await asyncio.sleep(interval)
+            if self._due():
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.exception(f"{self.collection.name} 定时提交异常: {e}")
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def __aenter__(self) -> "AsyncBulkWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
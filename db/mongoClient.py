@@ -1,7 +1,91 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient, monitoring
+from typing import Optional
 import logging
+import weakref
+from db.circuitBreaker import CircuitBreaker, CircuitOpenError, HALF_OPEN
+from utils import traceutil
 logging.getLogger("pymongo").setLevel(logging.WARNING)
 
+
+class _BreakerListener(monitoring.ServerHeartbeatListener, monitoring.TopologyListener):
+    """
+    根据 pymongo 的拓扑与心跳事件驱动熔断器，不依赖业务请求去撞超时
+    只看拓扑中是否还有可读节点：单个从节点宕机不影响主节点上的请求；
+    心跳失败只在当前没有可读节点时计数（如启动时服务端就不可达）
+    """
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self.readable = False
+
+    # 拓扑事件
+    def opened(self, event):
+        pass
+
+    def description_changed(self, event):
+        self.readable = event.new_description.has_readable_server()
+        if self.readable:
+            self.breaker.record_success()
+        elif event.previous_description.has_readable_server():
+            # 所有可读节点都已不可用
+            self.breaker.trip()
+
+    def closed(self, event):
+        pass
+
+    # 心跳事件
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        if not self.readable:
+            self.breaker.record_failure()
+
+
+class _TracingListener(monitoring.CommandListener):
+    """每个命令记录为一个 client span，父 span 为发起命令时的当前 span"""
+
+    # 认证与会话维护命令不记录
+    _IGNORED = {"saslStart", "saslContinue", "authenticate", "getnonce", "endSessions", "hello", "isMaster", "ismaster"}
+
+    def __init__(self):
+        self._spans = {}
+
+    def started(self, event):
+        if event.command_name in self._IGNORED:
+            return
+        collection = event.command.get(event.command_name)
+        span = traceutil.start_span(f"mongodb {event.command_name}", "client", {
+            "db.system": "mongodb", "db.name": event.database_name, "db.operation": event.command_name,
+            "db.mongodb.collection": collection if isinstance(collection, str) else None,
+        })
+        if span.recording:
+            self._spans[(event.connection_id, event.request_id)] = span
+
+    def succeeded(self, event):
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.end()
+
+    def failed(self, event):
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.set_error(event.failure)
+            span.end()
+
+
+def _listeners(breaker: CircuitBreaker, profiler=None) -> list:
+    listeners = [_BreakerListener(breaker)]
+    if profiler is not None:
+        listeners.append(profiler)
+    if traceutil.enabled():
+        listeners.append(_TracingListener())
+    return listeners
+
+
 class mongo:
     uri = str
     db_name = str
@@ -9,28 +93,155 @@ class mongo:
     max_overflow = int
     client: MongoClient
     db = None
-    
-    def __init__(self, uri, db_name, pool_size=5, max_overflow=100):
+
+    def __init__(self, uri, db_name, pool_size=5, max_overflow=100, breaker: Optional[CircuitBreaker] = None,
+                 profiler=None):
         self.uri = uri
         self.db_name = db_name
         self.pool_size = pool_size
         self.max_overflow = max_overflow
-        self.client = MongoClient(self.uri,minPoolSize=self.pool_size, maxPoolSize=self.max_overflow)
+        self.breaker = breaker or CircuitBreaker(name="mongo")
+        # profiler: db.mongoProfiler.QueryProfiler，统计命令耗时并对慢查询执行 explain
+        self.profiler = profiler
+        # bulk_writer 创建的写入器，关闭时提交剩余数据
+        self._writers = weakref.WeakSet()
+        self.client = MongoClient(self.uri,minPoolSize=self.pool_size, maxPoolSize=self.max_overflow,
+                                  event_listeners=_listeners(self.breaker, profiler))
+        if profiler is not None:
+            profiler.attach(self.client)
         self.db = self.client[self.db_name]
 
     def get_collection(self, collection_name):
+        # 熔断期间直接抛出 CircuitOpenError，避免请求阻塞在服务器选择超时上
+        self.breaker.check()
+        if self.breaker.state == HALF_OPEN:
+            self._probe()
         return self.db[collection_name]
 
+    def _probe(self):
+        """半开状态下放行的请求先执行一次 ping，按结果关闭或重新打开熔断器"""
+        try:
+            self.db.command('ping')
+        except Exception as e:
+            self.breaker.record_failure()
+            raise CircuitOpenError(self.breaker.name, self.breaker.retry_after()) from e
+        self.breaker.record_success()
+
+    def close_writers(self):
+        """提交并关闭所有 bulk_writer，应用关闭时调用，避免缓冲中的数据丢失"""
+        for writer in list(self._writers):
+            writer.close()
+
     def close(self):
+        self.close_writers()
         self.client.close()
 
     def check_connection(self) -> bool:
+        # MongoClient 自带断线重连与节点发现，这里不再重建客户端，避免丢弃健康的连接池
+        if not self.breaker.allow():
+            return False
         try:
             # The ismaster command is cheap and does not require auth.
             self.db.command('version')
+            self.breaker.record_success()
             return True
         except Exception as e:
             logging.error(f"MongoDB connection check failed: {e}")
-            self.client = MongoClient(self.uri,minPoolSize=self.pool_size, maxPoolSize=self.max_overflow)
-            self.db = self.client[self.db_name]
-            return False
\ No newline at end of file
+            self.breaker.record_failure()
+            return False
+
+    def bulk_writer(self, collection_name, **kwargs):
+        """按条数或时间批量提交插入/更新，参数见 db.mongoBulk.BulkWriter"""
+        from db.mongoBulk import BulkWriter
+        writer = BulkWriter(self.get_collection(collection_name), **kwargs)
+        self._writers.add(writer)
+        return writer
+
+    def iter_batches(self, collection_name, filter=None, projection=None, batch_size=1000, **kwargs):
+        """按固定大小分批迭代查询结果，参数见 db.mongoExport.iter_batches"""
+        from db.mongoExport import iter_batches
+        return iter_batches(self.get_collection(collection_name), filter, projection, batch_size=batch_size, **kwargs)
+
+    def export(self, collection_name, target, filter=None, projection=None, **kwargs) -> int:
+        """导出到 JSONL 文件或回调，可按 _id 分区并行，参数见 db.mongoExport.export"""
+        from db.mongoExport import export
+        return export(self.get_collection(collection_name), target, filter, projection, **kwargs)
+
+    def paginate(self, collection_name, filter=None, sort=None, size=20, cursor=None, **kwargs):
+        """键集分页，返回 db.pagination.Page，参数见 db.pagination.paginate_mongo"""
+        from db.pagination import paginate_mongo
+        return paginate_mongo(self.get_collection(collection_name), filter, sort, size, cursor, **kwargs)
+
+    def watch(self, collection_name, name="default", resume_dir=None, **kwargs):
+        """监听集合变更，用于缓存失效与物化视图，参数见 db.mongoWatch.ChangeStreamListener"""
+        from db.mongoWatch import ChangeStreamListener
+        return ChangeStreamListener(self.get_collection(collection_name), name=name, resume_dir=resume_dir, **kwargs)
+
+
+class amongo:
+    """
+    mongo 的异步版本，基于 PyMongo 原生异步 API（AsyncMongoClient）
+    用法：
+        mgo = amongo(uri, "jihai")
+        await mgo.get_collection("log").insert_one({...})
+        writer = mgo.bulk_writer("log", max_ops=1000, max_age=1)
+        await writer.insert({...})
+        await mgo.close()
+    """
+
+    def __init__(self, uri, db_name, pool_size=5, max_overflow=100, breaker: Optional[CircuitBreaker] = None):
+        self.uri = uri
+        self.db_name = db_name
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.breaker = breaker or CircuitBreaker(name="amongo")
+        self._client: Optional[AsyncMongoClient] = None
+        self._writers = weakref.WeakSet()
+
+    @property
+    def client(self) -> AsyncMongoClient:
+        # 注册了监听器的 AsyncMongoClient 构造时需要运行中的事件循环，因此在首次使用时创建
+        if self._client is None:
+            self._client = AsyncMongoClient(self.uri, minPoolSize=self.pool_size, maxPoolSize=self.max_overflow,
+                                            event_listeners=_listeners(self.breaker))
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    def get_collection(self, collection_name):
+        self.breaker.check()
+        if self.breaker.state == HALF_OPEN:
+            # 同步方法内无法发起请求，半开探测以驱动心跳维护的拓扑为准
+            if not self.client.topology_description.has_readable_server():
+                self.breaker.record_failure()
+                raise CircuitOpenError(self.breaker.name, self.breaker.retry_after())
+            self.breaker.record_success()
+        return self.db[collection_name]
+
+    async def close(self):
+        for writer in list(self._writers):
+            await writer.close()
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.close()
+
+    async def check_connection(self) -> bool:
+        if not self.breaker.allow():
+            return False
+        try:
+            await self.db.command('version')
+            self.breaker.record_success()
+            return True
+        except Exception as e:
+            logging.error(f"MongoDB connection check failed: {e}")
+            self.breaker.record_failure()
+            return False
+
+    def bulk_writer(self, collection_name, **kwargs):
+        """异步批量写入器，参数见 db.mongoBulk.AsyncBulkWriter"""
+        from db.mongoBulk import AsyncBulkWriter
+        writer = AsyncBulkWriter(self.get_collection(collection_name), **kwargs)
+        self._writers.add(writer)
+        return writer
@@ -0,0 +1,171 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Union
+
+from bson import Decimal128, ObjectId
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+"""
+MongoDB 大集合流式导出。
+
+iter_batches: 按固定大小分批迭代游标，使用投影只取需要的字段，batch_size 同时作为服务端每批返回条数
+split_ranges: 按 _id 把集合切分为若干区间，供多线程并行读取
+export:       分区并行读取，写入 JSONL 文件或回调函数；每个线程同时只持有一批数据，内存占用与集合大小无关
+
+Usage:
+    coll = app.client.mgo.get_collection("orders")
+    for batch in iter_batches(coll, {"status": 1}, projection={"_id": 1, "amount": 1}, batch_size=2000):
+        ...
+    export(coll, "/tmp/orders.jsonl", projection={"items": 0}, partitions=4)
+    export(coll, lambda docs: es.bulk(docs), batch_size=500)
+"""
+
+logger = logging.getLogger(__name__)
+
+# 服务端会话 30 分钟无活动即过期，no_cursor_timeout 游标随之失效，需要定期刷新
+_SESSION_REFRESH_SECONDS = 300
+
+
+def bson_default(obj: Any) -> Any:
+    """BSON 常见类型的 JSON 转换"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal128):
+        obj = obj.to_decimal()
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, bytes):
+        return obj.hex()
+    return str(obj)
+
+
+def dumps_line(doc: Mapping[str, Any]) -> bytes:
+    """序列化为一行 JSONL"""
+    if orjson is not None:
+        return orjson.dumps(doc, default=bson_default, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(doc, ensure_ascii=False, separators=(",", ":"), default=bson_default) + "\n").encode("utf-8")
+
+
+def iter_batches(collection, filter: Optional[Mapping[str, Any]] = None, projection: Any = None,
+                 batch_size: int = 1000, sort: Any = None, limit: int = 0,
+                 no_cursor_timeout: bool = False) -> Iterator[List[Dict[str, Any]]]:
+    """
+    按 batch_size 分批返回文档列表（最后一批可能不足）
+    :param projection: 投影，如 {"_id": 1, "name": 1}，大文档只取需要的字段可显著减少网络与解码开销
+    :param no_cursor_timeout: 长时间处理时使用，游标绑定显式会话并定期刷新，避免 30 分钟后失效
+    """
+    session = collection.database.client.start_session() if no_cursor_timeout else None
+    try:
+        cursor = collection.find(filter or {}, projection, batch_size=batch_size, sort=sort, limit=limit,
+                                 no_cursor_timeout=no_cursor_timeout, session=session)
+        last_refresh = time.monotonic()
+        batch: List[Dict[str, Any]] = []
+        with cursor:
+            for doc in cursor:
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+                    if session is not None and time.monotonic() - last_refresh > _SESSION_REFRESH_SECONDS:
+                        collection.database.client.admin.command("refreshSessions", [session.session_id], session=session)
+                        last_refresh = time.monotonic()
+        if batch:
+            yield batch
+    finally:
+        if session is not None:
+            session.end_session()
+
+
+def _id_bound(collection, filter: Mapping[str, Any], direction: int) -> Any:
+    doc = collection.find_one(filter, {"_id": 1}, sort=[("_id", direction)])
+    return doc["_id"] if doc else None
+
+
+def split_ranges(collection, filter: Optional[Mapping[str, Any]] = None, partitions: int = 4) -> List[Dict[str, Any]]:
+    """
+    按 _id 将集合划分为 partitions 个互不重叠的区间，返回每个区间的查询条件
+    _id 为 ObjectId 时按其时间戳均分（只需两次索引查询），否则使用 $bucketAuto 按数量均分
+    """
+    filter = dict(filter or {})
+    if partitions <= 1:
+        return [filter]
+    low, high = _id_bound(collection, filter, 1), _id_bound(collection, filter, -1)
+    if low is None:
+        return [filter]
+    if isinstance(low, ObjectId) and isinstance(high, ObjectId):
+        start, end = low.generation_time.timestamp(), high.generation_time.timestamp() + 1
+        step = (end - start) / partitions
+        bounds = [ObjectId.from_datetime(datetime.fromtimestamp(start + step * i, low.generation_time.tzinfo))
+                  for i in range(1, partitions)]
+    else:
+        buckets = collection.aggregate([{"$match": filter}, {"$project": {"_id": 1}},
+                                        {"$bucketAuto": {"groupBy": "$_id", "buckets": partitions}}])
+        bounds = [b["_id"]["max"] for b in buckets][:-1]
+    ranges = []
+    edges = [None] + bounds + [None]
+    for lo, hi in zip(edges, edges[1:]):
+        cond: Dict[str, Any] = {}
+        if lo is not None:
+            cond["$gte"] = lo
+        if hi is not None:
+            cond["$lt"] = hi
+        if not cond:
+            ranges.append(filter)
+        elif filter:
+            ranges.append({"$and": [filter, {"_id": cond}]})
+        else:
+            ranges.append({"_id": cond})
+    return ranges
+
+
+def export(collection, target: Union[str, Callable[[List[Dict[str, Any]]], Any]],
+           filter: Optional[Mapping[str, Any]] = None, projection: Any = None, batch_size: int = 1000,
+           partitions: int = 1, no_cursor_timeout: bool = False) -> int:
+    """
+    导出集合，返回导出的文档数
+    :param target: JSONL 文件路径，或接收每批文档列表的回调（并行时回调会在多个线程中被调用）
+    :param partitions: 按 _id 分区并行读取的线程数，分区并行时输出顺序不保证
+    """
+    ranges = split_ranges(collection, filter, partitions)
+    write_lock = threading.Lock()
+    out = open(target, "wb") if isinstance(target, str) else None
+
+    def handle(batch: List[Dict[str, Any]]) -> None:
+        if out is None:
+            target(batch)
+            return
+        data = b"".join(dumps_line(doc) for doc in batch)
+        with write_lock:
+            out.write(data)
+
+    def run(range_filter: Mapping[str, Any]) -> int:
+        count = 0
+        for batch in iter_batches(collection, range_filter, projection, batch_size=batch_size,
+                                  no_cursor_timeout=no_cursor_timeout):
+            handle(batch)
+            count += len(batch)
+        return count
+
+    start = time.perf_counter()
+    try:
+        if len(ranges) == 1:
+            total = run(ranges[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="mongo-export") as pool:
+                total = sum(pool.map(run, ranges))
+    finally:
+        if out is not None:
+            out.close()
+    logger.info(f"导出 {collection.name} {total} 条，分区 {len(ranges)}，耗时 {time.perf_counter() - start:.2f}s")
+    return total
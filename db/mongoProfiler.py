@@ -0,0 +1,283 @@
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+"""
+MongoDB 查询分析器，基于 pymongo CommandListener。
+
+    - 按 集合/命令/查询形状 统计耗时直方图（形状：查询条件中的值替换为 ?，只保留字段与操作符）
+    - 超过 slow_ms 的命令输出 WARNING 日志
+    - 对慢查询或按 sample_rate 抽样的查询在后台线程执行 explain，标记 COLLSCAN 并按 ESR 规则
+     （等值字段 -> 排序字段 -> 范围字段）给出建议索引
+
+Usage:
+    profiler = QueryProfiler(slow_ms=100, sample_rate=0.01)
+    mgo = mongo(uri, "jihai", profiler=profiler)
+    profiler.report()          # 按总耗时排序的统计
+    profiler.suggestions()     # createIndex 建议
+    app.include_router(profiler_router(profiler))   # GET /debug/mongo/profile
+"""
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上限（毫秒）
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float("inf"))
+
+# 需要分析查询形状的命令 -> 从命令中取 (过滤条件, 排序)
+_SHAPES = {
+    "find": lambda c: (c.get("filter"), c.get("sort")),
+    "count": lambda c: (c.get("query"), None),
+    "distinct": lambda c: (c.get("query"), None),
+    "findAndModify": lambda c: (c.get("query"), c.get("sort")),
+    "delete": lambda c: ((c.get("deletes") or [{}])[0].get("q"), None),
+    "update": lambda c: ((c.get("updates") or [{}])[0].get("q"), None),
+    "aggregate": lambda c: _aggregate_shape(c.get("pipeline") or []),
+}
+_RANGE_OPS = {"$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$exists", "$regex", "$not"}
+_IGNORED_DBS = {"admin", "config", "local"}
+# explain 时需要去掉的会话/事务相关字段
+_SESSION_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+
+
+def _aggregate_shape(pipeline: List[Mapping[str, Any]]) -> Tuple[Any, Any]:
+    match = sort = None
+    for stage in pipeline[:2]:
+        match = stage.get("$match", match)
+        sort = stage.get("$sort", sort)
+    return match, sort
+
+
+def query_shape(value: Any) -> Any:
+    """把查询条件中的具体值替换为 ?，字段顺序固定"""
+    if isinstance(value, Mapping):
+        return {k: query_shape(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)) and value and all(isinstance(v, Mapping) for v in value):
+        return [query_shape(v) for v in value]
+    return "?"
+
+
+def suggest_index(filter: Optional[Mapping[str, Any]], sort: Optional[Mapping[str, Any]] = None) -> List[Tuple[str, int]]:
+    """按 ESR 规则生成建议索引：等值字段、排序字段、范围字段"""
+    equality, ranges = [], []
+    for field, cond in (filter or {}).items():
+        if field.startswith("$"):
+            continue
+        if isinstance(cond, Mapping) and any(k in _RANGE_OPS for k in cond):
+            ranges.append(field)
+        else:
+            equality.append(field)
+    keys = [(f, 1) for f in equality]
+    for field, direction in (sort or {}).items():
+        if field not in equality:
+            keys.append((field, -1 if direction in (-1, "-1", "desc") else 1))
+    keys += [(f, 1) for f in ranges if f not in dict(keys)]
+    return keys
+
+
+def _plan_stages(plan: Any, found: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """递归收集 explain 结果中的 stage 与使用的索引名"""
+    if isinstance(plan, Mapping):
+        stage = plan.get("stage")
+        if stage:
+            found["stages"].append(stage)
+        if plan.get("indexName"):
+            found["indexes"].append(plan["indexName"])
+        for k, v in plan.items():
+            if k not in ("rejectedPlans", "command"):
+                _plan_stages(v, found)
+    elif isinstance(plan, list):
+        for item in plan:
+            _plan_stages(item, found)
+    return found
+
+
+class _Stats:
+    __slots__ = ("count", "errors", "total_ms", "max_ms", "buckets", "filter", "sort", "plan",
+                 "collscan", "indexes", "explained_at", "explaining")
+
+    def __init__(self, filter: Any, sort: Any):
+        self.count = self.errors = 0
+        self.total_ms = self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.filter, self.sort = filter, sort
+        self.plan: Optional[List[str]] = None
+        self.collscan = False
+        self.indexes: List[str] = []
+        self.explained_at = 0.0
+        self.explaining = False
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+
+    def percentile(self, p: float) -> float:
+        """由直方图估算分位数（返回所在桶的上限，最后一个桶返回最大值）"""
+        target, seen = p * self.count, 0
+        for bound, n in zip(BUCKETS_MS, self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """
+    :param slow_ms: 慢查询阈值毫秒，超过时输出日志并触发 explain
+    :param sample_rate: 非慢查询触发 explain 的抽样比例
+    :param explain_interval: 同一查询形状两次 explain 的最小间隔秒数
+    :param max_shapes: 统计的查询形状数上限，超出后新形状不再记录
+    """
+
+    def __init__(self, slow_ms: float = 100, sample_rate: float = 0.01, explain_interval: float = 600,
+                 max_shapes: int = 2000):
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.explain_interval = explain_interval
+        self.max_shapes = max_shapes
+        self.client = None
+        self._stats: Dict[Tuple[str, str, str, str], _Stats] = {}
+        self._pending: Dict[Tuple[Any, int], Tuple[Tuple[str, str, str, str], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._explains: "queue.Queue" = queue.Queue(maxsize=100)
+        self._worker: Optional[threading.Thread] = None
+
+    def attach(self, client) -> None:
+        """绑定 MongoClient，用于执行 explain"""
+        self.client = client
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._explain_loop, name="mongo-profiler", daemon=True)
+            self._worker.start()
+
+    # ---------------- CommandListener ----------------
+
+    def started(self, event) -> None:
+        shape_fn = _SHAPES.get(event.command_name)
+        if shape_fn is None or event.database_name in _IGNORED_DBS:
+            return
+        command = event.command
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            return
+        filter, sort = shape_fn(command)
+        shape = json.dumps(query_shape(filter or {}), sort_keys=True)
+        if sort:
+            shape += " sort " + json.dumps(dict(sort))
+        key = (event.database_name, collection, event.command_name, shape)
+        self._pending[(event.connection_id, event.request_id)] = (key, command)
+
+    def succeeded(self, event) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event) -> None:
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool) -> None:
+        item = self._pending.pop((event.connection_id, event.request_id), None)
+        if item is None:
+            return
+        key, command = item
+        ms = event.duration_micros / 1000
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_shapes:
+                    return
+                filter, sort = _SHAPES[key[2]](command)
+                stats = self._stats[key] = _Stats(filter, sort)
+            stats.add(ms)
+            if failed:
+                stats.errors += 1
+            slow = ms >= self.slow_ms
+            explain = (self.client is not None and not stats.explaining
+                       and time.monotonic() - stats.explained_at >= self.explain_interval
+                       and (slow or random.random() < self.sample_rate))
+            if explain:
+                stats.explaining = True
+        if slow:
+            logger.warning(f"MongoDB 慢查询 {ms:.1f}ms {key[0]}.{key[1]} {key[2]} {key[3]}")
+        if explain:
+            explain_cmd = {k: v for k, v in command.items() if not k.startswith("$") and k not in _SESSION_FIELDS}
+            try:
+                self._explains.put_nowait((key, explain_cmd))
+            except queue.Full:
+                stats.explaining = False
+
+    # ---------------- explain ----------------
+
+    def _explain_loop(self) -> None:
+        while True:
+            key, command = self._explains.get()
+            stats = self._stats.get(key)
+            try:
+                result = self.client[key[0]].command("explain", command, verbosity="queryPlanner")
+                found = _plan_stages(result, dict(stages=[], indexes=[]))
+                if stats is not None:
+                    stats.plan = found["stages"]
+                    stats.indexes = sorted(set(found["indexes"]))
+                    stats.collscan = "COLLSCAN" in found["stages"]
+                    if stats.collscan:
+                        logger.warning(f"MongoDB 全表扫描 {key[0]}.{key[1]} {key[2]} {key[3]}")
+            except PyMongoError as e:
+                logger.debug(f"explain 失败 {key}: {e}")
+            finally:
+                if stats is not None:
+                    stats.explained_at = time.monotonic()
+                    stats.explaining = False
+
+    # ---------------- 报告 ----------------
+
+    def report(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """按总耗时倒序返回各查询形状的统计"""
+        with self._lock:
+            items = list(self._stats.items())
+        rows = []
+        for (db, coll, command, shape), s in sorted(items, key=lambda kv: kv[1].total_ms, reverse=True)[:limit]:
+            rows.append(dict(
+                collection=f"{db}.{coll}", command=command, shape=shape, count=s.count, errors=s.errors,
+                total_ms=round(s.total_ms, 3), avg_ms=round(s.total_ms / s.count, 3) if s.count else 0.0,
+                p50_ms=s.percentile(0.5), p95_ms=s.percentile(0.95), p99_ms=s.percentile(0.99),
+                max_ms=round(s.max_ms, 3), plan=s.plan, indexes=s.indexes, collscan=s.collscan,
+                suggested_index=suggest_index(s.filter, s.sort) if s.collscan else None,
+            ))
+        return rows
+
+    def suggestions(self) -> List[str]:
+        """全表扫描查询的建议索引（createIndex 语句，已去重）"""
+        result = []
+        for row in self.report(limit=len(self._stats)):
+            if row["suggested_index"]:
+                db, coll = row["collection"].split(".", 1)
+                keys = ", ".join(f'"{f}": {d}' for f, d in row["suggested_index"])
+                stmt = f'db.getSiblingDB("{db}").{coll}.createIndex({{{keys}}})'
+                if stmt not in result:
+                    result.append(stmt)
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+def profiler_router(profiler: QueryProfiler, path: str = "/debug/mongo/profile"):
+    """返回暴露分析报告的 APIRouter：GET path 返回统计与索引建议"""
+    from fastapi import APIRouter
+    from models import Result
+
+    router = APIRouter()
+
+    @router.get(path, include_in_schema=False)
+    def mongo_profile(limit: int = 100):
+        return Result.success(data=dict(queries=profiler.report(limit), suggestions=profiler.suggestions())).to_dict()
+
+    return router
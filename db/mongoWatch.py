@@ -0,0 +1,371 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from bson import json_util
+from pymongo.errors import OperationFailure, PyMongoError
+
+"""
+基于 MongoDB change stream 的缓存失效与物化视图。
+
+ChangeStreamListener 在后台线程监听一个集合的变更：
+    - 恢复令牌（resume token）定期写入本地文件，进程重启后从中断处继续，不丢失变更
+    - 令牌过期（oplog 已被覆盖）或集合被删除时清空已注册的缓存（包括 Redis key）并重建物化视图
+    - invalidate / update_cache / invalidate_redis 注册需要随文档变更失效或更新的缓存
+    - materialize 声明增量维护的分组汇总视图，代替反复执行的 aggregate 查询
+
+需要副本集或分片集群（单机 mongod 不支持 change stream）。
+
+Usage:
+    listener = app.client.mgo.watch("goods", resume_dir="/data/resume")
+    listener.invalidate(local_cache)                                   # 按 str(_id) 删除
+    listener.invalidate_redis(app.client.redis, "goods:{_id}")
+    stock = listener.materialize("stock_by_shop", group_by="shopId", sums={"stock": "stock"})
+    listener.start()
+    stock.get("shop-1")   # {"count": 12, "stock": 340}
+"""
+
+logger = logging.getLogger(__name__)
+
+# 恢复令牌已不在 oplog 中或无法使用：CappedPositionLost / InvalidResumeToken / ChangeStreamFatalError / ChangeStreamHistoryLost
+_HISTORY_LOST_CODES = {136, 260, 280, 286}
+
+# 作废 Redis key 时每批删除的数量
+_REDIS_DELETE_BATCH = 500
+
+
+def _doc_key(doc_id: Any) -> str:
+    return str(doc_id)
+
+
+def _redis_pattern(key_template: str) -> str:
+    """把 key 模板转换为 SCAN MATCH 模式，{_id} 替换为 *，其余字符按字面匹配"""
+    marker = "\0"
+    literal = key_template.format(_id=marker)
+    escaped = "".join("\\" + c if c in "*?[]\\" else c for c in literal)
+    return escaped.replace(marker, "*")
+
+
+class MaterializedView:
+    """
+    按 group_by 字段分组的计数与求和视图，随变更增量更新
+    :param name: 视图名称
+    :param group_by: 分组字段（支持 a.b 形式），缺失时归入 None 组
+    :param sums: 输出名 -> 文档字段，数值相加
+    :param match: 文档过滤函数，返回 False 的文档不计入视图
+    每个文档对视图的贡献保存在内存中，文档更新或删除时先撤销旧贡献再计入新值。
+    """
+
+    def __init__(self, name: str, group_by: str, sums: Optional[Mapping[str, str]] = None,
+                 match: Optional[Callable[[Mapping[str, Any]], bool]] = None):
+        self.name = name
+        self.group_by = group_by
+        self.sums = dict(sums or {})
+        self.match = match
+        self._rows: Dict[Any, Dict[str, Any]] = {}
+        self._contrib: Dict[str, Tuple[Any, Tuple[float, ...]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def projection(self) -> Optional[Dict[str, int]]:
+        # 有过滤函数时需要完整文档
+        if self.match is not None:
+            return None
+        fields = {self.group_by: 1, **{f: 1 for f in self.sums.values()}}
+        return fields
+
+    @staticmethod
+    def _field(doc: Mapping[str, Any], path: str) -> Any:
+        value: Any = doc
+        for part in path.split("."):
+            if not isinstance(value, Mapping):
+                return None
+            value = value.get(part)
+        return value
+
+    def _contribution(self, doc: Mapping[str, Any]) -> Optional[Tuple[Any, Tuple[float, ...]]]:
+        if self.match is not None and not self.match(doc):
+            return None
+        values = tuple(float(self._field(doc, f) or 0) for f in self.sums.values())
+        return self._field(doc, self.group_by), values
+
+    def _apply(self, group: Any, values: Tuple[float, ...], sign: int) -> None:
+        row = self._rows.get(group)
+        if row is None:
+            row = self._rows[group] = dict(count=0, **{name: 0 for name in self.sums})
+        row["count"] += sign
+        for name, value in zip(self.sums, values):
+            row[name] += sign * value
+        if row["count"] <= 0:
+            del self._rows[group]
+
+    def upsert(self, doc_id: Any, doc: Optional[Mapping[str, Any]]) -> None:
+        """文档新增或变更（doc 为 None 表示删除）"""
+        key = _doc_key(doc_id)
+        new = self._contribution(doc) if doc is not None else None
+        with self._lock:
+            old = self._contrib.pop(key, None)
+            if old is not None:
+                self._apply(old[0], old[1], -1)
+            if new is not None:
+                self._contrib[key] = new
+                self._apply(new[0], new[1], 1)
+
+    def rebuild(self, docs: Iterable[Mapping[str, Any]]) -> None:
+        with self._lock:
+            self._rows.clear()
+            self._contrib.clear()
+        for doc in docs:
+            self.upsert(doc["_id"], doc)
+
+    def get(self, group: Any, default: Any = None) -> Any:
+        with self._lock:
+            row = self._rows.get(group)
+            return dict(row) if row is not None else default
+
+    def rows(self) -> Dict[Any, Dict[str, Any]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._rows.items()}
+
+
+class ChangeStreamListener:
+    """
+    集合变更监听器
+    :param collection: pymongo Collection
+    :param name: 监听器名称，用于恢复令牌文件名
+    :param resume_dir: 恢复令牌保存目录，None 表示不持久化（重启后只接收新变更）
+    :param pipeline: change stream 过滤管道，如 [{"$match": {"operationType": {"$in": ["update"]}}}]
+    :param save_every: 每处理多少条变更或 save_interval 秒保存一次令牌
+    """
+
+    def __init__(self, collection, name: str = "default", resume_dir: Optional[str] = None,
+                 pipeline: Optional[List[Mapping[str, Any]]] = None, save_every: int = 100,
+                 save_interval: float = 5, reconnect_interval: float = 5):
+        self.collection = collection
+        self.name = name
+        self.pipeline = list(pipeline or [])
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.reconnect_interval = reconnect_interval
+        self.token_file = None
+        if resume_dir:
+            os.makedirs(resume_dir, exist_ok=True)
+            self.token_file = os.path.join(resume_dir, f"{collection.database.name}.{collection.name}.{name}.token")
+        self.views: Dict[str, MaterializedView] = {}
+        self.stats = dict(events=0, resyncs=0, errors=0, last_event_at=0.0)
+        self._handlers: List[Callable[[Mapping[str, Any]], None]] = []
+        self._caches: List[Any] = []
+        self._redis_keys: List[Tuple[Any, str]] = []
+        self._token: Any = None
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------------- 注册 ----------------
+
+    def on_change(self, fn: Callable[[Mapping[str, Any]], None]) -> "ChangeStreamListener":
+        """注册原始变更回调，参数为 change 事件文档"""
+        self._handlers.append(fn)
+        return self
+
+    def invalidate(self, cache: Any, key_fn: Callable[[Any], str] = _doc_key) -> "ChangeStreamListener":
+        """
+        文档变更或删除时从缓存中删除 key_fn(_id)
+        cache 需提供 delete(key)，如 LocalCache / TwoTierCache（后者同时删除 Redis 中的 key）
+        """
+        self._caches.append(cache)
+        self._handlers.append(lambda change: cache.delete(key_fn(change["documentKey"]["_id"])))
+        return self
+
+    def update_cache(self, cache: Any, key_fn: Callable[[Any], str] = _doc_key) -> "ChangeStreamListener":
+        """文档变更时把最新文档写入缓存（cache.set），删除时从缓存删除"""
+        self._caches.append(cache)
+
+        def handle(change: Mapping[str, Any]) -> None:
+            key = key_fn(change["documentKey"]["_id"])
+            doc = change.get("fullDocument")
+            if doc is None:
+                cache.delete(key)
+            else:
+                cache.set(key, doc)
+        self._handlers.append(handle)
+        return self
+
+    def invalidate_redis(self, redis: Any, key_template: str) -> "ChangeStreamListener":
+        """
+        文档变更时删除 Redis key，key_template 中的 {_id} 替换为文档 _id
+        恢复令牌失效或集合被删除时按模板 SCAN 删除全部匹配的 key
+        """
+        self._redis_keys.append((redis, key_template))
+
+        def handle(change: Mapping[str, Any]) -> None:
+            redis.delete(key_template.format(_id=change["documentKey"]["_id"]))
+        self._handlers.append(handle)
+        return self
+
+    def materialize(self, name: str, group_by: str, sums: Optional[Mapping[str, str]] = None,
+                    match: Optional[Callable[[Mapping[str, Any]], bool]] = None) -> MaterializedView:
+        """声明增量维护的物化视图，start() 时全量构建一次，之后随变更更新"""
+        view = MaterializedView(name, group_by, sums, match)
+        self.views[name] = view
+        return view
+
+    # ---------------- 生命周期 ----------------
+
+    def start(self, wait: float = 0) -> "ChangeStreamListener":
+        """启动后台监听，wait>0 时等待视图构建完成"""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._token = self._load_token()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"watch-{self.collection.name}", daemon=True)
+        self._thread.start()
+        if wait > 0:
+            self._ready.wait(wait)
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._save_token(force=True)
+
+    # ---------------- 监听循环 ----------------
+
+    def _run(self) -> None:
+        build = True
+        while not self._stop.is_set():
+            try:
+                with self.collection.watch(self.pipeline, full_document="updateLookup",
+                                           resume_after=self._token, max_await_time_ms=1000) as stream:
+                    if build:
+                        # 先打开 change stream 再全量构建，构建期间的变更随后重放，不会遗漏
+                        self._rebuild_views()
+                        build = False
+                    self._ready.set()
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self._dispatch(change)
+                        self._token = stream.resume_token
+                        self._save_token()
+                    if not stream.alive and not self._stop.is_set():
+                        # 集合被删除或重命名后 change stream 失效，从当前时刻重新监听并重建视图
+                        self._token = None
+                        build = True
+            except OperationFailure as e:
+                if e.code in _HISTORY_LOST_CODES:
+                    self._resync(e)
+                    build = True
+                    continue
+                self._on_error(e)
+            except PyMongoError as e:
+                self._on_error(e)
+        self._ready.clear()
+
+    def _dispatch(self, change: Mapping[str, Any]) -> None:
+        self.stats["events"] += 1
+        self.stats["last_event_at"] = time.time()
+        self._unsaved += 1
+        op = change.get("operationType")
+        if op in ("drop", "rename", "dropDatabase", "invalidate"):
+            self._clear_caches()
+            for view in self.views.values():
+                view.rebuild(())
+            return
+        if "documentKey" not in change:
+            return
+        doc_id = change["documentKey"]["_id"]
+        doc = change.get("fullDocument") if op != "delete" else None
+        for view in self.views.values():
+            view.upsert(doc_id, doc)
+        for handler in self._handlers:
+            try:
+                handler(change)
+            except Exception as e:
+                logger.exception(f"变更处理失败 {self.collection.name}/{doc_id}: {e}")
+
+    def _rebuild_views(self) -> None:
+        if not self.views:
+            return
+        from db.mongoExport import iter_batches
+        for view in self.views.values():
+            start = time.perf_counter()
+            view.rebuild(doc for batch in iter_batches(self.collection, projection=view.projection, batch_size=2000)
+                         for doc in batch)
+            logger.info(f"物化视图 {view.name} 构建完成，{len(view.rows())} 组，耗时 {time.perf_counter() - start:.2f}s")
+
+    def _resync(self, e: Exception) -> None:
+        # 中断期间的变更已无法获取：作废所有缓存，从当前时刻重新监听并重建视图
+        self.stats["resyncs"] += 1
+        logger.warning(f"{self.collection.name} 恢复令牌失效，清空缓存并重建视图: {e}")
+        self._token = None
+        self._save_token(force=True)
+        self._clear_caches()
+
+    def _clear_caches(self) -> None:
+        for cache in self._caches:
+            clear = getattr(cache, "clear_local", None) or getattr(cache, "clear", None)
+            if clear is not None:
+                clear()
+        for redis, key_template in self._redis_keys:
+            try:
+                removed = self._delete_redis_keys(redis, _redis_pattern(key_template))
+                logger.info(f"{self.collection.name} 已删除 Redis 缓存 {key_template}: {removed} 个")
+            except Exception as e:
+                logger.exception(f"{self.collection.name} 删除 Redis 缓存 {key_template} 失败: {e}")
+
+    @staticmethod
+    def _delete_redis_keys(redis: Any, pattern: str) -> int:
+        # 逐 key 删除，集群模式下 pipeline 按节点分组，避免跨 slot 的 DEL
+        removed = 0
+        pipe = redis.pipeline(transaction=False)
+        queued = 0
+        for key in redis.scan_iter(match=pattern, count=_REDIS_DELETE_BATCH):
+            pipe.delete(key)
+            queued += 1
+            if queued >= _REDIS_DELETE_BATCH:
+                removed += sum(pipe.execute())
+                queued = 0
+        if queued:
+            removed += sum(pipe.execute())
+        return removed
+
+    def _on_error(self, e: Exception) -> None:
+        self.stats["errors"] += 1
+        self._ready.clear()
+        logger.warning(f"{self.collection.name} change stream 中断: {e}，{self.reconnect_interval}s 后重连")
+        self._stop.wait(self.reconnect_interval)
+
+    # ---------------- 恢复令牌 ----------------
+
+    def _load_token(self) -> Any:
+        if not self.token_file or not os.path.exists(self.token_file):
+            return None
+        try:
+            with open(self.token_file, "r", encoding="utf-8") as f:
+                return json_util.loads(f.read()) or None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取恢复令牌失败 {self.token_file}: {e}")
+            return None
+
+    def _save_token(self, force: bool = False) -> None:
+        if not self.token_file:
+            return
+        if not force and (self._unsaved == 0 or (self._unsaved < self.save_every
+                                                 and time.monotonic() - self._saved_at < self.save_interval)):
+            return
+        tmp = f"{self.token_file}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json_util.dumps(self._token))
+            os.replace(tmp, self.token_file)
+            self._unsaved = 0
+            self._saved_at = time.monotonic()
+        except OSError as e:
+            logger.warning(f"保存恢复令牌失败 {self.token_file}: {e}")
@@ -1,17 +1,69 @@
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Iterable, Union
 from datetime import datetime
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
 
 from sqlalchemy import (
-    create_engine, Column, BigInteger, String, DateTime, text, engine
+    create_engine, Column, BigInteger, String, DateTime, text, engine, event
 )
+from db.queryRegistry import QueryRegistry
+from db.circuitBreaker import CircuitBreaker
+from utils import traceutil
+from utils.jsonutil import dumps
 
 logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
 
 BaseModel = declarative_base()
 
+
+def _keys_and_rows(result: Union[engine.Result, Iterable[Any]]) -> Tuple[Tuple[str, ...], List[Any]]:
+    """从 Result 或 Row 列表中一次性取出列名与全部行"""
+    if isinstance(result, engine.Result):
+        return tuple(result.keys()), result.all()
+    rows = result if isinstance(result, list) else list(result)
+    if not rows:
+        return (), rows
+    return tuple(rows[0]._fields), rows
+
+
+def rows_to_dicts(result: Union[engine.Result, Iterable[Any]]) -> List[Dict[str, Any]]:
+    """将整个查询结果转换为字典列表，列名只取一次，替代逐行 row._asdict()"""
+    keys, rows = _keys_and_rows(result)
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def rows_to_columns(result: Union[engine.Result, Iterable[Any]]) -> Dict[str, List[Any]]:
+    """将整个查询结果转换为按列组织的数组 {列名: [值...]}，不创建逐行字典"""
+    keys, rows = _keys_and_rows(result)
+    if not rows:
+        return {k: [] for k in keys}
+    return dict(zip(keys, map(list, zip(*rows))))
+
+
+def rows_to_split(result: Union[engine.Result, Iterable[Any]]) -> Dict[str, List[Any]]:
+    """将整个查询结果转换为 {"columns": [列名...], "data": [[值...]...]}，行只转为元组，不创建逐行字典"""
+    keys, rows = _keys_and_rows(result)
+    return {"columns": list(keys), "data": [tuple(row) for row in rows]}
+
+
+def rows_to_json(result: Union[engine.Result, Iterable[Any]], orient: str = "records") -> bytes:
+    """
+    将整个查询结果直接序列化为紧凑的JSON字节串
+    :param orient: records 输出字典列表，columns 输出按列组织的数组，split 输出列名与行数组
+    records 的 JSON 结构本身要求每行一个对象，逐行字典由 zip 一次构建后整体交给 orjson；
+    不需要该结构时使用 columns/split，不创建逐行字典
+    """
+    if orient == "records":
+        data = rows_to_dicts(result)
+    elif orient == "columns":
+        data = rows_to_columns(result)
+    elif orient == "split":
+        data = rows_to_split(result)
+    else:
+        raise ValueError(f"不支持的 orient: {orient}")
+    return dumps(data)
+
 class mysql:
     """
     mysql 类
@@ -29,14 +81,19 @@ class mysql:
             SQLAlchemy Engine 实例，表示与数据库的底层连接引擎。未连接时为 None。
         SessionLocal (sqlalchemy.orm.session.sessionmaker | None)
             sessionmaker 工厂，用于创建 Session 实例。未连接时为 None。
+        queries (db.queryRegistry.QueryRegistry)
+            命名SQL注册表，语句按当前引擎方言预编译并缓存。
+        breaker (db.circuitBreaker.CircuitBreaker)
+            熔断器。连接失败或断线时计数，熔断期间 get_session/query 直接抛出 CircuitOpenError。
     方法:
-        __init__(uri: str, pool_size: int = 2, max_overflow: int = 10, debug: bool = False)
+        __init__(uri: str, pool_size: int = 2, max_overflow: int = 10, debug: bool = False, breaker: CircuitBreaker = None)
             构造函数，保存连接配置并尝试建立连接（调用 connect）。
             参数:
                 uri: 数据库连接字符串。
                 pool_size: 连接池大小。
                 max_overflow: 最大溢出连接数。
                 debug: 是否开启调试输出。
+                breaker: 自定义熔断器，默认 CircuitBreaker(name="mysql")。
             异常:
                 若连接过程中发生错误，会将异常向上传递。
         connect()
@@ -44,11 +101,14 @@ class mysql:
             行为:
                 - 调用 create_engine(..., pool_pre_ping=True, echo=debug, pool_size=..., max_overflow=...)
                 - 使用 sessionmaker(autocommit=True, autoflush=True, bind=Engine) 创建 SessionLocal
+                - 在 Engine 上注册事件，连接失败/断线记为熔断失败，成功取出连接记为成功
+                - 已启用 utils.traceutil 追踪时，每条 SQL 执行记录为一个 client span
             异常:
                 - 创建引擎或会话失败时抛出异常（并可在外部捕获）。
         get_session() -> sqlalchemy.orm.session.Session
             返回一个新的 Session 实例用于数据库操作。
             行为:
+                - 熔断期间直接抛出 CircuitOpenError。
                 - 若 SessionLocal 为 None，则先尝试 connect() 建立连接。
                 - 调用并返回 SessionLocal()。
             返回:
@@ -63,11 +123,25 @@ class mysql:
         check_connection() -> bool
             检查与数据库的连通性。
             行为:
+                - 熔断期间不访问数据库，直接返回 False；半开时作为探测请求执行。
                 - 使用 Engine.connect() 执行简短查询（如 "SELECT 1"）。
                 - 成功则返回 True。
-                - 失败时打印错误信息、尝试重新 connect()，并返回 False。
+                - 失败时打印错误信息并返回 False。不会重建 Engine，断开的连接由连接池自行作废，
+                  健康连接保持不变，避免大量请求同时重建连接池。
             返回:
-                - True 表示连接正常，False 表示检查失败并已尝试重连。
+                - True 表示连接正常，False 表示检查失败或处于熔断中。
+        register_query(name: str, sql: str)
+            登记命名SQL，并按当前引擎方言立即编译缓存。
+        query(name: str, params: dict = None, session: Session = None) -> sqlalchemy.engine.Result
+            执行已登记的命名SQL，跳过 text() 的解析与编译。
+            行为:
+                - 传入 session 时使用其当前事务的连接，结果随 session 提交/关闭。
+                - 未传入时在独立事务中执行并提交，结果一次性缓冲后归还连接。
+        paginate(stmt, order_by, size: int = 20, cursor: str = None, total: str = None, session: Session = None)
+            键集分页，按排序键定位下一页而非 OFFSET，返回 db.pagination.Page（items/next_cursor/total）。
+            行为:
+                - 传入 session 时 select(Model) 返回 ORM 对象，否则在独立连接中执行并返回 Row。
+                - total 为 None/exact/cached/estimated，默认不统计总数。
         close()
             清理并释放资源。
             行为:
@@ -86,11 +160,15 @@ class mysql:
     Engine = engine.Engine
     SessionLocal = sessionmaker
     
-    def __init__(self, uri: str,pool_size: int = 2, max_overflow: int = 10, debug: bool = False):
+    def __init__(self, uri: str,pool_size: int = 2, max_overflow: int = 10, debug: bool = False, breaker: Optional[CircuitBreaker] = None):
         self.uri = uri
         self.pool_size = pool_size
         self.max_overflow = max_overflow
         self.debug = debug
+        self.queries = QueryRegistry()
+        self.breaker = breaker or CircuitBreaker(name="mysql")
+        self.Engine = None
+        self.SessionLocal = None
         self.connect()
 
 
@@ -100,11 +178,47 @@ class mysql:
                                         pool_size=self.pool_size,
                                         max_overflow=self.max_overflow)
             self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.Engine)
+            self.queries.compile_all(self.Engine.dialect)
+            event.listen(self.Engine, "handle_error", self._on_error)
+            event.listen(self.Engine.pool, "checkout", self._on_checkout)
+            if traceutil.enabled():
+                event.listen(self.Engine, "before_cursor_execute", self._trace_start)
+                event.listen(self.Engine, "after_cursor_execute", self._trace_end)
         except Exception as e:
             print(f"MySQL连接失败: {e}")
             raise e
+
+    def _on_error(self, context) -> None:
+        # connection 为空表示建立连接失败
+        if context.is_disconnect or context.connection is None:
+            self.breaker.record_failure()
+        span = getattr(context.execution_context, "_trace_span", None)
+        if span is not None:
+            span.set_error(context.original_exception)
+            span.end()
+
+    def _trace_start(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        system = conn.dialect.name
+        # 只记录带占位符的语句，不记录参数值
+        context._trace_span = traceutil.start_span(f"{system} {operation}", "client", {
+            "db.system": system, "db.operation": operation, "db.statement": statement[:1000],
+            "db.executemany": executemany,
+        })
+
+    def _trace_end(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            span.set_attribute("db.rowcount", cursor.rowcount)
+            span.end()
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        self.breaker.record_success()
         
     def get_session(self) -> Session:
+        self.breaker.check()
         if self.SessionLocal is None:
             self.connect()
         return self.SessionLocal()
@@ -114,14 +228,37 @@ class mysql:
             self.connect()
         return self.Engine        
     
+    def register_query(self, name: str, sql: str):
+        return self.queries.register(name, sql, self.get_engine().dialect)
+
+    def query(self, name: str, params: Optional[Dict[str, Any]] = None, session: Optional[Session] = None) -> engine.Result:
+        self.breaker.check()
+        if session is not None:
+            return self.queries.execute(session, name, params)
+        with self.get_engine().begin() as connection:
+            result = self.queries.execute(connection, name, params)
+            # 连接归还连接池前先缓冲结果
+            return result.freeze()() if result.returns_rows else result
+
+    def paginate(self, stmt, order_by, size: int = 20, cursor: Optional[str] = None, total: Optional[str] = None,
+                 session: Optional[Session] = None, cache=None):
+        """键集分页，返回 db.pagination.Page，参数见 db.pagination.paginate_sql"""
+        from db.pagination import paginate_sql
+        self.breaker.check()
+        if session is not None:
+            return paginate_sql(session, stmt, order_by, size, cursor, total, cache)
+        with self.get_engine().connect() as connection:
+            return paginate_sql(connection, stmt, order_by, size, cursor, total, cache)
+
     def check_connection(self) -> bool:
+        if not self.breaker.allow():
+            return False
         try:
-            with self.Engine.connect() as connection:
+            with self.get_engine().connect() as connection:
                 connection.execute(text("SELECT 1"))
             return True
         except Exception as e:
             print(f"MySQL连接检查失败: {e}")
-            self.connect()
             return False
         
     def close(self):
@@ -0,0 +1,310 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from db.redisCache import LocalCache
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+"""
+键集（seek）分页：按排序键的最后一个值定位下一页，替代 OFFSET + 每页 COUNT(*)，深分页耗时与第一页相同。
+
+    - 排序键末尾自动追加主键（MySQL 为 order_by 最后一列，需唯一；MongoDB 为 _id）保证顺序稳定
+    - 游标为不透明的 base64 字符串，内含排序键的值（保留 datetime/Decimal/ObjectId 类型），最后一页 next_cursor 为 None
+    - 排序键允许 NULL/缺失值，按 MySQL 与 MongoDB 的默认顺序视为最小值（升序在前，降序在后）；
+      MySQL 排序列声明为 NOT NULL 且方向一致时才使用行值比较
+    - 总数可选：None 不统计；exact 精确统计；cached 精确统计并按查询条件缓存；estimated 无过滤条件时使用
+      表/集合的估算行数（MySQL information_schema.TABLES.TABLE_ROWS，MongoDB estimated_document_count），否则精确统计
+
+Usage:
+    page = app.client.mysql.paginate(select(Order).where(Order.shop_id == 1),
+                                     order_by=[(Order.created_at, "desc"), Order.id], size=20, cursor=token)
+    page = app.client.mgo.paginate("orders", {"shop_id": 1}, sort=[("created_at", -1)], size=20, cursor=token,
+                                   total="cached")
+    return Result.success_cursor(page).response()
+"""
+
+
+class CursorError(ValueError):
+    """游标无法解析或与当前排序不匹配"""
+
+
+# 默认的总数缓存，可传入 TwoTierCache 等实现了 get/set 的对象在多进程间共享
+count_cache = LocalCache(max_size=1000, ttl=60)
+
+TOTAL_MODES = (None, "exact", "cached", "estimated")
+
+
+@dataclass
+class Page:
+    items: List[Any]
+    size: int
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def _tag(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    if ObjectId is not None and isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise CursorError(f"不支持作为分页键的类型: {type(value).__name__}")
+
+
+def _untag(value: Any) -> Any:
+    if isinstance(value, dict) and len(value) == 1:
+        (tag, raw), = value.items()
+        if tag == "$dt":
+            return datetime.fromisoformat(raw)
+        if tag == "$d":
+            return date.fromisoformat(raw)
+        if tag == "$dec":
+            return Decimal(raw)
+        if tag == "$oid" and ObjectId is not None:
+            return ObjectId(raw)
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    data = json.dumps([_tag(v) for v in values], separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(data.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str, key_count: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise CursorError(f"无效的分页游标: {e}") from None
+    if not isinstance(values, list) or len(values) != key_count:
+        raise CursorError("分页游标与排序字段不匹配")
+    try:
+        return [_untag(v) for v in values]
+    except (ValueError, TypeError) as e:
+        raise CursorError(f"无效的分页游标: {e}") from None
+
+
+def _check_total(total: Optional[str]) -> None:
+    if total not in TOTAL_MODES:
+        raise ValueError(f"不支持的 total: {total}")
+
+
+def _cached_count(key: str, counter, cache) -> int:
+    cache = count_cache if cache is None else cache
+    value = cache.get(key)
+    if value is None:
+        value = counter()
+        cache.set(key, value)
+    return value
+
+
+# ---------------- MySQL / SQLAlchemy ----------------
+
+def _sql_keys(order_by: Sequence[Any]) -> List[Tuple[Any, bool]]:
+    """[(列, 是否降序)]，元素可以是列、(列, "asc"/"desc") 或 列.desc()"""
+    keys = []
+    for item in order_by:
+        if isinstance(item, tuple):
+            column, direction = item
+            keys.append((column, str(direction).lower() in ("desc", "-1")))
+            continue
+        modifier = getattr(item, "modifier", None)
+        name = getattr(modifier, "__name__", "")
+        if name in ("desc_op", "asc_op"):
+            keys.append((item.element, name == "desc_op"))
+        else:
+            keys.append((item, False))
+    if not keys:
+        raise ValueError("order_by 不能为空，最后一列需唯一（通常为主键）")
+    return keys
+
+
+def _sql_after(column: Any, desc: bool, value: Any):
+    """排序上位于 value 之后的条件，NULL 视为最小值；没有符合的行时返回 None"""
+    from sqlalchemy import or_
+    if value is None:
+        return None if desc else column.is_not(None)
+    if not desc:
+        return column > value
+    if getattr(column, "nullable", True):
+        return or_(column < value, column.is_(None))
+    return column < value
+
+
+def _seek_clause(keys: List[Tuple[Any, bool]], values: List[Any]):
+    from sqlalchemy import and_, false, or_, tuple_
+    descs = {desc for _, desc in keys}
+    if len(descs) == 1 and None not in values \
+            and not (keys[0][1] and any(getattr(c, "nullable", True) for c, _ in keys)):
+        # 方向一致时使用行值比较 (a, b) > (x, y)，可以直接使用联合索引做范围扫描；
+        # 降序时 NULL 排在最后但不满足 <，因此要求各列 NOT NULL
+        left, right = tuple_(*[c for c, _ in keys]), tuple_(*values)
+        return left < right if keys[0][1] else left > right
+    ors = []
+    for i, (column, desc) in enumerate(keys):
+        after = _sql_after(column, desc, values[i])
+        if after is None:
+            continue
+        cond = [keys[j][0].is_(None) if values[j] is None else keys[j][0] == values[j] for j in range(i)]
+        cond.append(after)
+        ors.append(and_(*cond))
+    return or_(*ors) if ors else false()
+
+
+def _row_value(row: Any, column: Any) -> Any:
+    key = getattr(column, "key", None) or getattr(column, "name", None)
+    mapping = getattr(row, "_mapping", None)
+    if mapping is not None:
+        if key in mapping:
+            return mapping[key]
+        if column in mapping:
+            return mapping[column]
+    return getattr(row, key)
+
+
+def _selects_entity(executor, stmt) -> bool:
+    """Session 执行 select(Model) 时返回 ORM 对象"""
+    from sqlalchemy.orm import Session
+    if not isinstance(executor, Session):
+        return False
+    descriptions = stmt.column_descriptions
+    return len(descriptions) == 1 and descriptions[0].get("entity") is not None \
+        and descriptions[0].get("expr") is descriptions[0]["entity"]
+
+
+def _sql_count(executor, stmt, total: str, cache) -> int:
+    from sqlalchemy import func, select, text
+    count_stmt = select(func.count()).select_from(stmt.order_by(None).limit(None).offset(None).subquery())
+
+    # Session.get_bind() 返回 Engine，Connection 本身即可用于编译
+    bind = executor.get_bind() if hasattr(executor, "get_bind") else executor
+
+    def exact() -> int:
+        return executor.execute(count_stmt).scalar_one()
+
+    if total == "estimated" and stmt.whereclause is None and bind.dialect.name == "mysql":
+        froms = stmt.get_final_froms()
+        if len(froms) == 1 and getattr(froms[0], "name", None):
+            rows = executor.execute(text("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                                         "WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()) AND TABLE_NAME = :name"),
+                                    {"schema": froms[0].schema, "name": froms[0].name}).scalar()
+            if rows is not None:
+                return int(rows)
+    if total == "cached":
+        compiled = count_stmt.compile(bind)
+        return _cached_count(f"sql:{compiled}:{sorted(compiled.params.items(), key=str)}", exact, cache)
+    return exact()
+
+
+def paginate_sql(executor, stmt, order_by: Sequence[Any], size: int = 20, cursor: Optional[str] = None,
+                 total: Optional[str] = None, cache=None) -> Page:
+    """
+    :param executor: Session 或 Connection
+    :param stmt: select 语句，不含 order_by/limit；select(Order) 时 items 为 ORM 对象，否则为 Row
+    :param order_by: 排序键，最后一列需唯一，如 [(Order.created_at, "desc"), Order.id]
+    :param cursor: 上一页返回的 next_cursor，第一页为 None
+    :param total: None / exact / cached / estimated
+    """
+    _check_total(total)
+    keys = _sql_keys(order_by)
+    query = stmt
+    if cursor:
+        query = query.where(_seek_clause(keys, decode_cursor(cursor, len(keys))))
+    query = query.order_by(*[c.desc() if desc else c.asc() for c, desc in keys]).limit(size + 1)
+    result = executor.execute(query)
+    rows = list(result.scalars() if _selects_entity(executor, stmt) else result)
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor([_row_value(rows[-1], c) for c, _ in keys])
+    count = _sql_count(executor, stmt, total, cache) if total else None
+    return Page(items=rows, size=size, next_cursor=next_cursor, total=count)
+
+
+# ---------------- MongoDB ----------------
+
+def _mongo_keys(sort: Any) -> List[Tuple[str, int]]:
+    if isinstance(sort, Mapping):
+        keys = list(sort.items())
+    else:
+        keys = [(k, 1) if isinstance(k, str) else (k[0], k[1]) for k in (sort or [])]
+    keys = [(k, -1 if d in (-1, "-1", "desc") else 1) for k, d in keys]
+    if "_id" not in [k for k, _ in keys]:
+        keys.append(("_id", keys[-1][1] if keys else 1))
+    return keys
+
+
+def _mongo_seek(keys: List[Tuple[str, int]], values: List[Any]) -> Dict[str, Any]:
+    # null 与缺失字段排在最前；{字段: None} 同时匹配两者
+    ors = []
+    for i, (key, direction) in enumerate(keys):
+        value = values[i]
+        if value is None and direction < 0:
+            continue
+        cond = {keys[j][0]: values[j] for j in range(i)}
+        if value is None:
+            cond[key] = {"$ne": None}
+        elif direction > 0 or key == "_id":
+            cond[key] = {"$lt" if direction < 0 else "$gt": value}
+        else:
+            cond["$or"] = [{key: {"$lt": value}}, {key: None}]
+        ors.append(cond)
+    if not ors:
+        return {"_id": {"$in": []}}
+    return ors[0] if len(ors) == 1 else {"$or": ors}
+
+
+def _doc_value(doc: Mapping[str, Any], key: str) -> Any:
+    value: Any = doc
+    for part in key.split("."):
+        value = value.get(part) if isinstance(value, Mapping) else None
+    return value
+
+
+def paginate_mongo(collection, filter: Optional[Mapping[str, Any]] = None, sort: Any = None, size: int = 20,
+                   cursor: Optional[str] = None, projection: Any = None, total: Optional[str] = None,
+                   cache=None) -> Page:
+    """
+    :param sort: [(字段, 1/-1)]，末尾自动追加 _id；索引应与 sort 一致（含 _id）
+    :param projection: 包含式投影会自动加入排序字段
+    :param total: None / exact / cached / estimated（无过滤条件时使用 estimated_document_count）
+    """
+    _check_total(total)
+    filter = dict(filter or {})
+    keys = _mongo_keys(sort)
+    query = filter
+    if cursor:
+        seek = _mongo_seek(keys, decode_cursor(cursor, len(keys)))
+        query = {"$and": [filter, seek]} if filter else seek
+    if isinstance(projection, Mapping) and any(v for k, v in projection.items() if k != "_id"):
+        projection = dict(projection, **{k: 1 for k, _ in keys})
+    docs = list(collection.find(query, projection, sort=keys, limit=size + 1))
+    next_cursor = None
+    if len(docs) > size:
+        docs = docs[:size]
+        next_cursor = encode_cursor([_doc_value(docs[-1], k) for k, _ in keys])
+    count = None
+    if total == "estimated" and not filter:
+        count = collection.estimated_document_count()
+    elif total == "cached":
+        key = f"mongo:{collection.full_name}:{json.dumps(filter, sort_keys=True, default=str)}"
+        count = _cached_count(key, lambda: collection.count_documents(filter), cache)
+    elif total:
+        count = collection.count_documents(filter)
+    return Page(items=docs, size=size, next_cursor=next_cursor, total=count)
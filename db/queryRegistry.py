@@ -0,0 +1,135 @@
+import threading
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, CursorResult, Dialect
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+
+"""
+命名SQL注册表：启动时登记 text() 语句，按方言编译一次并缓存，
+执行时直接走 exec_driver_sql，跳过每次请求的 text() 解析与编译。
+
+Usage:
+    queries = QueryRegistry()
+    queries.register("channel_by_id", "SELECT * FROM pay_channel WHERE channel_id = :channel_id")
+    queries.compile_all(engine.dialect)
+    with engine.connect() as conn:
+        row = queries.execute(conn, "channel_by_id", {"channel_id": "wx"}).first()
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledQuery:
+    """
+    某条命名SQL在特定方言下的编译结果。
+    属性:
+        name: 语句名称
+        sql: 驱动可直接执行的SQL字符串（已转换为方言的参数风格）
+        positional: 驱动是否使用位置参数（qmark/format）
+        param_names: 位置参数风格下参数出现的顺序；命名参数风格下为参数名集合
+        bind_names: 语句中声明的所有绑定参数名
+    """
+    __slots__ = ("name", "sql", "positional", "param_names", "bind_names", "_escaped")
+
+    def __init__(self, name: str, clause: TextClause, dialect: Dialect):
+        compiled = clause.compile(dialect=dialect)
+        self.name = name
+        self.sql: str = compiled.string
+        self.positional: bool = bool(compiled.positional)
+        self.bind_names: Tuple[str, ...] = tuple(compiled.binds)
+        self.param_names: Tuple[str, ...] = tuple(compiled.positiontup or ()) if self.positional else self.bind_names
+        # 含特殊字符的参数名会被方言转义，命名参数风格下需要按转义后的名字传参
+        self._escaped: Dict[str, str] = dict(getattr(compiled, "escaped_bind_names", None) or {})
+
+    def bind(self, params: Optional[Dict[str, Any]] = None) -> Union[Tuple[Any, ...], Dict[str, Any]]:
+        """将命名参数转换为驱动所需的参数形式"""
+        params = params or {}
+        missing = [n for n in self.bind_names if n not in params]
+        if missing:
+            raise KeyError(f"SQL语句 {self.name} 缺少参数: {', '.join(missing)}")
+        if self.positional:
+            return tuple(params[n] for n in self.param_names)
+        if self._escaped:
+            return {self._escaped.get(n, n): params[n] for n in self.bind_names}
+        return {n: params[n] for n in self.bind_names}
+
+
+class QueryRegistry:
+    """
+    命名SQL注册表。
+    - register(name, sql): 登记语句，text() 只构造一次
+    - compile_all(dialect): 启动时按方言预编译全部语句
+    - execute(conn, name, params): 使用缓存的编译结果直接执行
+    编译结果按 (方言名, 驱动, 语句名) 缓存，线程安全。
+    """
+
+    def __init__(self):
+        self._clauses: Dict[str, TextClause] = {}
+        self._compiled: Dict[Tuple[str, str, str], CompiledQuery] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, sql: Union[str, TextClause], dialect: Optional[Dialect] = None) -> TextClause:
+        """登记命名SQL；若给出方言则立即编译"""
+        clause = sql if isinstance(sql, TextClause) else text(sql)
+        with self._lock:
+            if name in self._clauses:
+                # 覆盖同名语句时丢弃旧的编译结果
+                self._compiled = {k: v for k, v in self._compiled.items() if k[2] != name}
+            self._clauses[name] = clause
+        if dialect is not None:
+            self.compile(name, dialect)
+        return clause
+
+    def get(self, name: str) -> TextClause:
+        """返回已登记的 text() 语句，可用于 session.execute 等常规调用"""
+        try:
+            return self._clauses[name]
+        except KeyError:
+            raise KeyError(f"未登记的SQL语句: {name}") from None
+
+    def names(self):
+        return list(self._clauses.keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._clauses
+
+    def compile(self, name: str, dialect: Dialect) -> CompiledQuery:
+        """返回指定方言下的编译结果，首次调用时编译并缓存"""
+        key = (dialect.name, dialect.driver, name)
+        compiled = self._compiled.get(key)
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is None:
+                compiled = CompiledQuery(name, self.get(name), dialect)
+                self._compiled[key] = compiled
+                logger.debug(f"SQL语句 {name} 已编译({dialect.name}+{dialect.driver}): {compiled.sql}")
+            return compiled
+
+    def compile_all(self, dialect: Dialect) -> int:
+        """按方言预编译全部已登记语句，返回编译数量"""
+        for name in self.names():
+            self.compile(name, dialect)
+        return len(self._clauses)
+
+    def execute(self, conn: Union[Connection, Session], name: str, params: Optional[Dict[str, Any]] = None) -> CursorResult:
+        """
+        执行命名SQL。
+        :param conn: Connection 或 Session（使用其当前事务的连接）
+        :param name: 语句名称
+        :param params: 命名参数
+        :return: CursorResult，行对象与 session.execute(text(...)) 的结果一致
+        """
+        if isinstance(conn, Session):
+            conn = conn.connection()
+        compiled = self.compile(name, conn.dialect)
+        return conn.exec_driver_sql(compiled.sql, compiled.bind(params))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clauses.clear()
+            self._compiled.clear()
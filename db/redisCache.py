@@ -0,0 +1,275 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from redis import Redis, RedisError
+
+from db.redisClient import as_redis
+
+"""
+两级缓存：进程内 LRU/TTL 本地缓存 + Redis。
+
+本地缓存通过以下两种方式之一与 Redis 保持一致：
+    tracking  Redis 6 客户端缓存，CLIENT TRACKING ... BCAST PREFIX <namespace>:，
+              任何客户端修改命名空间下的 key 都会推送失效消息
+    pubsub    通过本 API 写入/删除时在 <namespace>:__invalidate__ 频道广播，适用于 Redis 6 以下
+
+Usage:
+    cache = TwoTierCache(app.client.redis, namespace="goods", local_ttl=30, ttl=300)
+    cache.set("sku:1", {"price": 100})
+    cache.get("sku:1")
+    cache.get_or_load("sku:2", lambda: load_sku(2))
+    cache.stats()
+    cache.close()
+"""
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LocalCache:
+    """线程安全的 LRU + TTL 本地缓存"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            if item[0] < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expire_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expire_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def delete_prefix(self, prefix: str) -> int:
+        """删除以 prefix 开头的 key，返回删除数量"""
+        with self._lock:
+            keys = [k for k in self._data if k.startswith(prefix)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+
+class TwoTierCache:
+    """
+    基于 RedisClient 的两级缓存
+    :param redis: RedisClient 或 redis.Redis（如 App.client.redis）
+    :param namespace: key 前缀，实际 Redis key 为 <namespace>:<key>
+    :param max_size: 本地缓存最大条目数
+    :param local_ttl: 本地缓存过期秒数，作为失效消息丢失时的兜底
+    :param ttl: Redis 中的默认过期秒数，None 表示不过期
+    :param invalidation: tracking / pubsub / none
+    值以 JSON 存入 Redis，本地缓存保存反序列化后的对象，调用方不应修改返回的对象。
+    """
+
+    def __init__(self, redis: Any, namespace: str = "cache", max_size: int = 10000, local_ttl: float = 30,
+                 ttl: Optional[int] = 300, invalidation: str = "tracking"):
+        if invalidation not in ("tracking", "pubsub", "none"):
+            raise ValueError(f"不支持的失效方式: {invalidation}")
+        self.redis: Redis = as_redis(redis)
+        if invalidation == "tracking" and not hasattr(self.redis, "connection_pool"):
+            # Redis Cluster 的追踪需要逐节点重定向，集群下使用 pubsub 方式
+            raise ValueError("tracking 失效方式不支持 Redis Cluster，请使用 invalidation='pubsub'")
+        self.namespace = namespace
+        self.ttl = ttl
+        self.invalidation = invalidation
+        self.local = LocalCache(max_size=max_size, ttl=local_ttl)
+        self.channel = f"{namespace}:__invalidate__"
+        self._stats = dict(local_hits=0, local_misses=0, redis_hits=0, redis_misses=0, invalidations=0)
+        # 每收到一次失效消息加一，用于丢弃与失效并发的回填
+        self._epoch = 0
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if invalidation != "none":
+            self.start()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    # ---------------- 读写接口 ----------------
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            self._stats["local_hits"] += 1
+            return value
+        self._stats["local_misses"] += 1
+        epoch = self._epoch
+        raw = self.redis.get(self._key(key))
+        if raw is None:
+            self._stats["redis_misses"] += 1
+            return default
+        self._stats["redis_hits"] += 1
+        value = json.loads(raw)
+        self._fill(key, value, epoch)
+        return value
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: Optional[int] = None) -> Any:
+        """两级都未命中时调用 loader 计算并写回（loader 返回 None 时不缓存）"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self.redis.set(self._key(key), json.dumps(value, ensure_ascii=False), ex=ttl)
+        # 本地不直接回填，等待失效消息后由下一次读取加载，避免与其他实例的写入乱序
+        self.local.delete(key)
+        self._publish(key)
+
+    def delete(self, key: str) -> None:
+        self.redis.delete(self._key(key))
+        self.local.delete(key)
+        self._publish(key)
+
+    def clear_local(self) -> None:
+        self._epoch += 1
+        self.local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """各级命中统计"""
+        s = dict(self._stats)
+        local_total = s["local_hits"] + s["local_misses"]
+        redis_total = s["redis_hits"] + s["redis_misses"]
+        s["local_hit_rate"] = s["local_hits"] / local_total if local_total else 0.0
+        s["redis_hit_rate"] = s["redis_hits"] / redis_total if redis_total else 0.0
+        s["local_size"] = len(self.local)
+        s["local_evictions"] = self.local.evictions
+        return s
+
+    def _fill(self, key: str, value: Any, epoch: int) -> None:
+        # 读取 Redis 期间收到过失效消息则不回填，避免把旧值写入本地
+        if epoch == self._epoch and (self._ready.is_set() or self.invalidation == "none"):
+            self.local.set(key, value)
+
+    def _publish(self, key: str) -> None:
+        if self.invalidation == "pubsub":
+            self.redis.publish(self.channel, key)
+
+    def _invalidate(self, keys: Any) -> None:
+        self._epoch += 1
+        self._stats["invalidations"] += 1
+        if keys is None:
+            # FLUSHDB/FLUSHALL 或连接重建
+            self.local.clear()
+            return
+        prefix_len = len(self.namespace) + 1
+        for k in keys if isinstance(keys, (list, tuple)) else (keys,):
+            if isinstance(k, bytes):
+                k = k.decode()
+            if self.invalidation == "tracking":
+                k = k[prefix_len:]
+            self.local.delete(k)
+
+    # ---------------- 失效监听 ----------------
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        target = self._run_tracking if self.invalidation == "tracking" else self._run_pubsub
+        self._thread = threading.Thread(target=target, name=f"cache-invalidate-{self.namespace}", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=3)
+            self._thread = None
+        self.local.clear()
+
+    def _lost(self, e: Exception) -> None:
+        # 失效通道中断期间可能漏掉消息，本地缓存整体作废
+        self._ready.clear()
+        self.clear_local()
+        logger.warning(f"缓存 {self.namespace} 失效通道中断，本地缓存已清空: {e}")
+        self._stop.wait(1)
+
+    def _run_tracking(self) -> None:
+        pool = self.redis.connection_pool
+        while not self._stop.is_set():
+            sub = ctrl = None
+            try:
+                sub = pool.get_connection()
+                ctrl = pool.get_connection()
+                sub.send_command("CLIENT", "ID")
+                client_id = sub.read_response()
+                sub.send_command("SUBSCRIBE", "__redis__:invalidate")
+                sub.read_response()
+                ctrl.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", "PREFIX", f"{self.namespace}:")
+                ctrl.read_response()
+                self._ready.set()
+                last_ping = time.monotonic()
+                while not self._stop.is_set():
+                    if sub.can_read(timeout=1):
+                        msg = sub.read_response()
+                        if msg and msg[0] in ("message", b"message"):
+                            self._invalidate(msg[2])
+                    if time.monotonic() - last_ping > 5:
+                        # 追踪状态绑定在 ctrl 连接上，定期确认其存活
+                        ctrl.send_command("PING")
+                        ctrl.read_response()
+                        last_ping = time.monotonic()
+            except (RedisError, OSError) as e:
+                self._lost(e)
+            finally:
+                self._ready.clear()
+                for conn in (sub, ctrl):
+                    if conn is not None:
+                        conn.disconnect()
+                        pool.release(conn)
+
+    def _run_pubsub(self) -> None:
+        while not self._stop.is_set():
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                self._ready.set()
+                while not self._stop.is_set():
+                    msg = pubsub.get_message(timeout=1)
+                    if msg:
+                        self._invalidate(msg["data"])
+            except (RedisError, OSError) as e:
+                self._lost(e)
+            finally:
+                self._ready.clear()
+                pubsub.close()
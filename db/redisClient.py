@@ -1,6 +1,12 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List, Mapping, Sequence, Iterator, Tuple, Union
+import copy
 import threading
-from redis import Redis, ConnectionPool, RedisError
+from redis import Redis, ConnectionPool, RedisError, RedisCluster, Sentinel
+from redis.cluster import ClusterNode
+from redis import asyncio as aioredis
+from redis.asyncio.cluster import ClusterNode as AsyncClusterNode
+from db.redisCodec import Codec, get_codec
+from utils import traceutil
 
 """
 Redis helper for connecting, checking, getting and closing Redis connections.
@@ -9,23 +15,61 @@ Usage:
     client = RedisClient(host='localhost', port=6379)
     r = client.get_connection()
     client.check()  # raises if unreachable
+    client.get("key")  # redis commands are forwarded to the underlying client
+    client.mget_many(keys)  # chunked + pipelined batch helpers
     client.close()
+
+    # Redis Cluster (slot-aware routing and pipelines) / Sentinel (master rediscovered on failover)
+    RedisClient(mode="cluster", cluster_nodes="10.0.0.1:7000,10.0.0.2:7000")
+    RedisClient(mode="sentinel", sentinels=["10.0.0.1:26379", "10.0.0.2:26379"], master_name="mymaster")
+
+    # typed values through per-namespace codecs (stored via a bytes-mode twin client)
+    client = RedisClient(codecs={"session": "msgpack", "report": "zlib+json"})
+    client.set_value("session:42", {"uid": 42}, ttl=3600)
+    client.get_value("session:42")
+
+    # client spans for every command / pipeline when utils.traceutil tracing is enabled before connect()
+
+    # asyncio handlers
+    aclient = AsyncRedisClient(host='localhost', port=6379)
+    r = aclient.get_connection()
+    await aclient.check()
+    await aclient.close()
 """
 
+MODES = ("standalone", "cluster", "sentinel")
 
 
+def parse_nodes(nodes: Union[None, str, Sequence[Any]]) -> List[Tuple[str, int]]:
+    """Parse "host:port,host:port" or a list of "host:port"/(host, port) into (host, port) tuples."""
+    if not nodes:
+        return []
+    if isinstance(nodes, str):
+        nodes = [n for n in nodes.split(",") if n.strip()]
+    parsed = []
+    for node in nodes:
+        if isinstance(node, (list, tuple)):
+            host, port = node
+        else:
+            host, _, port = str(node).strip().rpartition(":")
+        parsed.append((host, int(port)))
+    return parsed
 
-class RedisClient:
-    """
-    Simple Redis connection manager using a ConnectionPool.
 
-    Methods:
-    - connect(): establish pool and client
-    - get_connection(): return Redis instance (connects lazily)
-    - check(): ping Redis to verify connectivity
-    - close(): disconnect pool
-    - reconnect(): force reconnect
-    """
+def as_redis(client: Any) -> Redis:
+    """Accept a RedisClient/AsyncRedisClient or a ready redis client and return the redis client."""
+    if isinstance(client, _RedisConfig):
+        return client.get_connection()
+    return client
+
+
+def is_async_redis(client: Any) -> bool:
+    """True for redis.asyncio clients; asyncio RedisCluster does not subclass asyncio Redis, so check both."""
+    return isinstance(client, (aioredis.Redis, aioredis.RedisCluster))
+
+
+class _RedisConfig:
+    """Shared config surface of RedisClient and AsyncRedisClient."""
 
     def __init__(
         self,
@@ -37,8 +81,29 @@ class RedisClient:
         max_connections: Optional[int] = 10,
         decode_responses: bool = True,
         client_name: Optional[str] = None,
+        batch_size: int = 500,
+        mode: str = "standalone",
+        cluster_nodes: Union[None, str, Sequence[Any]] = None,
+        sentinels: Union[None, str, Sequence[Any]] = None,
+        master_name: str = "mymaster",
+        sentinel_password: Optional[str] = None,
+        codecs: Optional[Dict[str, Union[str, Codec]]] = None,
+        default_codec: Union[str, Codec] = "json",
         **kwargs: Any,
     ):
+        if mode not in MODES:
+            raise ValueError(f"unsupported redis mode: {mode}")
+        self.batch_size = batch_size
+        self.mode = mode
+        self.cluster_nodes = parse_nodes(cluster_nodes) or [(host, port)]
+        self.sentinels = parse_nodes(sentinels)
+        self.master_name = master_name
+        self.sentinel_password = sentinel_password
+        self._sentinel: Any = None
+        # key namespace (text before the first ':') -> codec used by set_value/get_value
+        self.codecs: Dict[str, Codec] = {ns: get_codec(c) for ns, c in (codecs or {}).items()}
+        self.default_codec: Codec = get_codec(default_codec)
+        self._binary: Optional["_RedisConfig"] = None
         self._conf: Dict[str, Any] = dict(
             host=host,
             port=port,
@@ -54,24 +119,153 @@ class RedisClient:
         self._client: Optional[Redis] = None
         self._lock = threading.RLock()
 
+    def _pool_kwargs(self) -> Dict[str, Any]:
+        pool_kwargs = {
+            "host": self._conf["host"],
+            "port": self._conf["port"],
+            "db": self._conf["db"],
+            "password": self._conf["password"],
+            "socket_timeout": self._conf["socket_timeout"],
+            "max_connections": self._conf["max_connections"],
+            "decode_responses": self._conf["decode_responses"],
+        }
+        # Remove None entries to avoid passing them to ConnectionPool if not supported
+        return {k: v for k, v in pool_kwargs.items() if v is not None}
+
+    def _create(self, redis_cls, pool_cls, cluster_cls, node_cls, sentinel_cls) -> Any:
+        """Build the client for the configured mode from the sync or asyncio redis classes."""
+        client_name = self._conf.get("client_name")
+        kwargs = self._pool_kwargs()
+        if self.mode == "cluster":
+            # cluster only has db 0; routing by hash slot is done by RedisCluster
+            for k in ("host", "port", "db"):
+                kwargs.pop(k, None)
+            nodes = [node_cls(host, port) for host, port in self.cluster_nodes]
+            return cluster_cls(startup_nodes=nodes, client_name=client_name, **kwargs)
+        if self.mode == "sentinel":
+            if not self.sentinels:
+                raise ValueError("sentinel mode requires sentinels")
+            kwargs.pop("host", None)
+            kwargs.pop("port", None)
+            sentinel_kwargs = {k: v for k, v in (("password", self.sentinel_password),
+                                                 ("socket_timeout", self._conf["socket_timeout"])) if v is not None}
+            self._sentinel = sentinel_cls(self.sentinels, sentinel_kwargs=sentinel_kwargs)
+            # SentinelConnectionPool asks the sentinels for the current master on every new connection
+            client = self._sentinel.master_for(self.master_name, redis_class=redis_cls, client_name=client_name, **kwargs)
+            self._pool = client.connection_pool
+            return client
+        self._pool = pool_cls(**kwargs)
+        return redis_cls(connection_pool=self._pool, client_name=client_name)
+
+    def codec_for(self, key: str) -> Codec:
+        return self.codecs.get(key.split(":", 1)[0], self.default_codec)
+
+    def binary(self):
+        """
+        Twin client with the same config but decode_responses=False, for binary payloads.
+        Returns self when this client already works in bytes mode.
+        """
+        if not self._conf["decode_responses"]:
+            return self
+        with self._lock:
+            if self._binary is None:
+                twin = copy.copy(self)
+                twin._conf = dict(self._conf, decode_responses=False)
+                twin._pool = twin._client = twin._sentinel = twin._binary = None
+                twin._lock = threading.RLock()
+                self._binary = twin
+            return self._binary
+
+    def __getattr__(self, name: str) -> Any:
+        # Forward redis commands (get/set/pipeline/...) to the underlying client,
+        # so the manager can be used wherever a redis client is expected.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get_connection(), name)
+
+
+def _trace_commands(client: Any, is_async: bool) -> Any:
+    """Wrap execute_command and pipeline().execute with client spans (only installed when tracing is enabled)."""
+    execute_command, pipeline = client.execute_command, client.pipeline
+    attrs = {"db.system": "redis"}
+
+    def command_span(args):
+        name = str(args[0]) if args else "?"
+        return traceutil.start_span(f"redis {name}", "client", dict(attrs, **{"db.operation": name}))
+
+    def pipeline_span(pipe):
+        return traceutil.start_span("redis PIPELINE", "client",
+                                    dict(attrs, **{"db.operation": "PIPELINE", "db.redis.commands": len(pipe)}))
+
+    if is_async:
+        async def traced_command(*args, **options):
+            with command_span(args):
+                return await execute_command(*args, **options)
+
+        def traced_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            async def traced_execute(*a, **kw):
+                with pipeline_span(pipe):
+                    return await execute(*a, **kw)
+
+            pipe.execute = traced_execute
+            return pipe
+    else:
+        def traced_command(*args, **options):
+            with command_span(args):
+                return execute_command(*args, **options)
+
+        def traced_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            def traced_execute(*a, **kw):
+                with pipeline_span(pipe):
+                    return execute(*a, **kw)
+
+            pipe.execute = traced_execute
+            return pipe
+
+    client.execute_command = traced_command
+    client.pipeline = traced_pipeline
+    return client
+
+
+def _chunks(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class RedisClient(_RedisConfig):
+    """
+    Simple Redis connection manager using a ConnectionPool.
+    mode selects standalone (host/port), cluster (cluster_nodes) or sentinel (sentinels + master_name).
+
+    Methods:
+    - connect(): establish pool and client
+    - get_connection(): return Redis instance (connects lazily)
+    - check(): ping Redis to verify connectivity
+    - close(): disconnect pool
+    - reconnect(): force reconnect
+    - mget_many / mset_many_with_ttl / hgetall_many / delete_many: chunked, pipelined batch operations
+    - lock(name): distributed lock; single_flight(key, fn, ttl): compute once across processes
+    - set_value / get_value / mset_values / mget_values: values encoded by per-namespace codecs
+    - binary(): bytes-mode twin client (decode_responses=False)
+    - publish_stream / subscribe_stream: Redis Streams consumer-group queue
+
+    The application instance is App.client.redis_client; App.client.redis is its connect() result.
+    """
+
     def connect(self) -> Redis:
         """Create connection pool and Redis client. Safe to call multiple times."""
         with self._lock:
             if self._client is not None:
                 return self._client
-            pool_kwargs = {
-                "host": self._conf["host"],
-                "port": self._conf["port"],
-                "db": self._conf["db"],
-                "password": self._conf["password"],
-                "socket_timeout": self._conf["socket_timeout"],
-                "max_connections": self._conf["max_connections"],
-                "decode_responses": self._conf["decode_responses"],
-            }
-            # Remove None entries to avoid passing them to ConnectionPool if not supported
-            pool_kwargs = {k: v for k, v in pool_kwargs.items() if v is not None}
-            self._pool = ConnectionPool(**pool_kwargs)
-            self._client = Redis(connection_pool=self._pool, client_name=self._conf.get("client_name"))
+            self._client = self._create(Redis, ConnectionPool, RedisCluster, ClusterNode, Sentinel)
+            if traceutil.enabled():
+                _trace_commands(self._client, is_async=False)
             return self._client
 
     def get_connection(self) -> Redis:
@@ -98,12 +292,19 @@ class RedisClient:
     def close(self) -> None:
         """Close the connection pool and drop client reference."""
         with self._lock:
-            if self._pool is not None:
-                try:
+            if self._binary is not None and self._binary is not self:
+                self._binary.close()
+                self._binary = None
+            try:
+                if self._pool is not None:
                     self._pool.disconnect()
-                finally:
-                    self._pool = None
-                    self._client = None
+                elif self._client is not None:
+                    # RedisCluster keeps one pool per node
+                    self._client.close()
+            finally:
+                self._pool = None
+                self._client = None
+                self._sentinel = None
 
     def reconnect(self) -> Redis:
         """Force close and create a new connection."""
@@ -111,6 +312,104 @@ class RedisClient:
             self.close()
             return self.connect()
 
+    # batch helpers
+    def _pipelined(self, items: Iterable[Any], add, batch_size: Optional[int], transaction: bool) -> List[Any]:
+        """
+        Queue one command per item with add(pipe, item) and flush every batch_size commands,
+        so N commands cost ceil(N / batch_size) round trips.
+        """
+        size = batch_size or self.batch_size
+        client = self.get_connection()
+        results: List[Any] = []
+        pipe = client.pipeline(transaction=transaction)
+        queued = 0
+        for item in items:
+            add(pipe, item)
+            queued += 1
+            if queued >= size:
+                results.extend(pipe.execute())
+                queued = 0
+        if queued:
+            results.extend(pipe.execute())
+        return results
+
+    def mget_many(self, keys: Iterable[str], batch_size: Optional[int] = None, transaction: bool = False) -> List[Any]:
+        """
+        MGET any number of keys; values are returned in key order (None for missing keys).
+        Keys are split into MGETs of batch_size keys so no single command blocks the server,
+        and the MGETs are sent in a single pipeline.
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        if self.mode == "cluster":
+            # cross-slot MGET is rejected by the cluster; the cluster pipeline groups GETs per node instead
+            return self._pipelined(keys, lambda pipe, key: pipe.get(key), batch_size, transaction)
+        size = batch_size or self.batch_size
+        parts = self._pipelined(_chunks(keys, size), lambda pipe, chunk: pipe.mget(chunk), len(keys), transaction)
+        values: List[Any] = []
+        for part in parts:
+            values.extend(part)
+        return values
+
+    def mset_many_with_ttl(self, mapping: Mapping[str, Any], ttl: Optional[int] = None,
+                           batch_size: Optional[int] = None, transaction: bool = False) -> int:
+        """SET every key with an optional TTL (seconds); returns the number of keys written."""
+        results = self._pipelined(mapping.items(), lambda pipe, kv: pipe.set(kv[0], kv[1], ex=ttl), batch_size, transaction)
+        return sum(1 for r in results if r)
+
+    def hgetall_many(self, keys: Iterable[str], batch_size: Optional[int] = None, transaction: bool = False) -> List[Dict[Any, Any]]:
+        """HGETALL for each key; hashes are returned in key order ({} for missing keys)."""
+        return self._pipelined(keys, lambda pipe, key: pipe.hgetall(key), batch_size, transaction)
+
+    def delete_many(self, keys: Iterable[str], batch_size: Optional[int] = None, transaction: bool = False) -> int:
+        """Delete keys in chunks of batch_size; returns the number of keys removed."""
+        keys = list(keys)
+        if self.mode == "cluster":
+            return sum(self._pipelined(keys, lambda pipe, key: pipe.delete(key), batch_size, transaction))
+        size = batch_size or self.batch_size
+        return sum(self._pipelined(_chunks(keys, size), lambda pipe, chunk: pipe.delete(*chunk), len(keys) or 1, transaction))
+
+    # typed values, see db.redisCodec
+    def set_value(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Encode value with the key's namespace codec and SET it (ttl in seconds)."""
+        return bool(self.binary().get_connection().set(key, self.codec_for(key).encode(value), ex=ttl))
+
+    def get_value(self, key: str, default: Any = None) -> Any:
+        raw = self.binary().get_connection().get(key)
+        return default if raw is None else self.codec_for(key).decode(raw)
+
+    def mset_values(self, mapping: Mapping[str, Any], ttl: Optional[int] = None, batch_size: Optional[int] = None) -> int:
+        encoded = {k: self.codec_for(k).encode(v) for k, v in mapping.items()}
+        return self.binary().mset_many_with_ttl(encoded, ttl=ttl, batch_size=batch_size)
+
+    def mget_values(self, keys: Iterable[str], default: Any = None, batch_size: Optional[int] = None) -> List[Any]:
+        keys = list(keys)
+        raws = self.binary().mget_many(keys, batch_size=batch_size)
+        return [default if raw is None else self.codec_for(k).decode(raw) for k, raw in zip(keys, raws)]
+
+    # coordination helpers, see db.redisLock
+    def lock(self, name: str, ttl: float = 10, **kwargs: Any):
+        """Return a RedisLock (SET NX PX + token, auto renewal, Lua release) bound to this client."""
+        from db.redisLock import RedisLock
+        return RedisLock(self.get_connection(), name, ttl=ttl, **kwargs)
+
+    def single_flight(self, key: str, fn, ttl: float = 0, **kwargs: Any) -> Any:
+        """Run fn once for key across processes; concurrent callers wait for its result (cached for ttl if > 0)."""
+        from db.redisLock import single_flight
+        return single_flight(self.get_connection(), key, fn, ttl=ttl, **kwargs)
+
+    # stream queues, see db.redisStream
+    def publish_stream(self, stream: str, body: Any, headers: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        """XADD a message; dict/list bodies are sent as JSON."""
+        from db.redisStream import publish
+        return publish(self.get_connection(), stream, body, headers=headers, **kwargs)
+
+    def subscribe_stream(self, stream: str, group: str, callback, **kwargs: Any):
+        """Start a consumer-group worker calling callback(body, properties, headers), like RabbitMQClient.subscribe."""
+        from db.redisStream import StreamConsumer
+        return StreamConsumer(self.get_connection(), stream, group, callback, **kwargs).start()
+
     # context manager support
     def __enter__(self) -> "RedisClient":
         self.connect()
@@ -120,6 +419,79 @@ class RedisClient:
         self.close()
 
 
+class AsyncRedisClient(_RedisConfig):
+    """
+    asyncio variant of RedisClient built on redis.asyncio, same config surface.
+
+    The pool is created without I/O, so connect() stays synchronous and can be
+    called at startup; sockets are opened lazily inside the running event loop.
+
+    Methods:
+    - connect(): create pool and client (no network I/O)
+    - get_connection(): return redis.asyncio.Redis instance (connects lazily)
+    - await check(): ping Redis to verify connectivity
+    - await close(): disconnect pool
+    - await reconnect(): force reconnect
+    """
+
+    def connect(self) -> aioredis.Redis:
+        """Create asyncio connection pool and Redis client. Safe to call multiple times."""
+        with self._lock:
+            if self._client is not None:
+                return self._client
+            self._client = self._create(aioredis.Redis, aioredis.ConnectionPool, aioredis.RedisCluster,
+                                        AsyncClusterNode, aioredis.Sentinel)
+            if traceutil.enabled():
+                _trace_commands(self._client, is_async=True)
+            return self._client
+
+    def get_connection(self) -> aioredis.Redis:
+        """Return an asyncio Redis client; connect lazily if needed."""
+        if self._client is None:
+            return self.connect()
+        return self._client
+
+    async def check(self, timeout: Optional[float] = None) -> bool:
+        """
+        Check connectivity by sending PING.
+        Raises RedisError on failure.
+        Returns True if PONG received.
+        """
+        client = self.get_connection()
+        pong = await client.ping()
+        return bool(pong)
+
+    async def close(self) -> None:
+        """Close the client and its connection pool."""
+        if self._binary is not None and self._binary is not self:
+            await self._binary.close()
+            self._binary = None
+        client, pool = self._client, self._pool
+        self._client = None
+        self._pool = None
+        self._sentinel = None
+        if pool is None:
+            if client is not None:
+                # RedisCluster keeps one pool per node
+                await client.aclose()
+            return
+        if client is not None:
+            await client.aclose(close_connection_pool=False)
+        await pool.disconnect()
+
+    async def reconnect(self) -> aioredis.Redis:
+        """Force close and create a new connection."""
+        await self.close()
+        return self.connect()
+
+    async def __aenter__(self) -> "AsyncRedisClient":
+        self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+
 # Example minimal usage (remove or adapt in production):
 if __name__ == "__main__":
     client = RedisClient()
@@ -0,0 +1,180 @@
+import io
+import json
+import pickle
+import zlib
+from typing import Any, Dict, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+try:
+    import msgpack
+except ImportError:  # 可选依赖
+    msgpack = None
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # 可选依赖
+    lz4_frame = None
+
+"""
+Redis 值编解码器，按名称选择，可组合压缩：
+
+    json          紧凑 JSON（有 orjson 时使用 orjson）
+    msgpack       MessagePack，需要安装 msgpack
+    pickle        受限反序列化的 pickle，只允许内置容器与常见标准库类型
+    zlib+json     超过阈值时 zlib 压缩，前缀字节标记是否压缩
+    lz4+msgpack   同上，使用 lz4，需要安装 lz4
+
+Usage:
+    codec = get_codec("zlib+json")
+    raw = codec.encode({"a": 1})
+    codec.decode(raw)
+"""
+
+
+class Codec:
+    """编解码器基类，encode 返回 bytes，decode 接受 bytes"""
+    name = "raw"
+
+    def encode(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    name = "json"
+
+    def encode(self, value: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(value)
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("msgpack 编解码器需要安装 msgpack")
+
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+# 受限 pickle 允许反序列化的类型
+SAFE_PICKLE_CLASSES = {
+    ("builtins", name) for name in (
+        "dict", "list", "tuple", "set", "frozenset", "str", "bytes", "bytearray",
+        "int", "float", "complex", "bool", "NoneType", "slice", "range",
+    )
+} | {
+    ("datetime", "datetime"), ("datetime", "date"), ("datetime", "time"),
+    ("datetime", "timedelta"), ("datetime", "timezone"),
+    ("decimal", "Decimal"), ("uuid", "UUID"),
+    ("collections", "OrderedDict"), ("collections", "defaultdict"),
+}
+
+
+class _SafeUnpickler(pickle.Unpickler):
+    def __init__(self, file, allowed):
+        super().__init__(file)
+        self.allowed = allowed
+
+    def find_class(self, module, name):
+        if (module, name) not in self.allowed:
+            raise pickle.UnpicklingError(f"禁止反序列化类型: {module}.{name}")
+        return super().find_class(module, name)
+
+
+class PickleCodec(Codec):
+    """pickle 编码，反序列化时只允许白名单中的类型，防止 Redis 中的数据执行任意代码"""
+    name = "pickle"
+
+    def __init__(self, allowed=None):
+        self.allowed = set(SAFE_PICKLE_CLASSES) | set(allowed or ())
+
+    def encode(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return _SafeUnpickler(io.BytesIO(data), self.allowed).load()
+
+
+class CompressedCodec(Codec):
+    """
+    压缩包装器，编码结果首字节为标记：0 未压缩，1 已压缩
+    :param inner: 内层编解码器
+    :param algorithm: zlib / lz4
+    :param threshold: 内层编码结果超过该字节数才压缩，小值压缩收益低于 CPU 开销
+    :param level: 压缩级别
+    """
+
+    def __init__(self, inner: Codec, algorithm: str = "zlib", threshold: int = 512, level: Optional[int] = None):
+        if algorithm == "lz4" and lz4_frame is None:
+            raise ImportError("lz4 压缩需要安装 lz4")
+        if algorithm not in ("zlib", "lz4"):
+            raise ValueError(f"不支持的压缩算法: {algorithm}")
+        self.inner = inner
+        self.algorithm = algorithm
+        self.threshold = threshold
+        self.level = level
+        self.name = f"{algorithm}+{inner.name}"
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.algorithm == "lz4":
+            return lz4_frame.compress(data, compression_level=self.level or 0)
+        return zlib.compress(data, 6 if self.level is None else self.level)
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self.algorithm == "lz4":
+            return lz4_frame.decompress(data)
+        return zlib.decompress(data)
+
+    def encode(self, value: Any) -> bytes:
+        data = self.inner.encode(value)
+        if len(data) >= self.threshold:
+            compressed = self._compress(data)
+            if len(compressed) < len(data):
+                return b"\x01" + compressed
+        return b"\x00" + data
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        body = data[1:]
+        if data[:1] == b"\x01":
+            body = self._decompress(body)
+        return self.inner.decode(body)
+
+
+_BASE_CODECS = {"json": JsonCodec, "msgpack": MsgpackCodec, "pickle": PickleCodec}
+_codecs: Dict[str, Codec] = {}
+
+
+def get_codec(codec: Union[str, Codec]) -> Codec:
+    """按名称获取编解码器实例，如 json / msgpack / pickle / zlib+json / lz4+msgpack"""
+    if isinstance(codec, Codec):
+        return codec
+    if codec not in _codecs:
+        algorithm, _, base = codec.rpartition("+")
+        if base not in _BASE_CODECS:
+            raise ValueError(f"未知的编解码器: {codec}")
+        inner = _BASE_CODECS[base]()
+        _codecs[codec] = CompressedCodec(inner, algorithm) if algorithm else inner
+    return _codecs[codec]
+
+
+def register_codec(name: str, codec: Codec) -> None:
+    """注册自定义编解码器"""
+    _codecs[name] = codec
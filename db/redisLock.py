@@ -0,0 +1,237 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from db.redisClient import as_redis
+
+"""
+Redis 分布式锁与 single-flight。
+
+RedisLock: SET key token NX PX 加锁，Lua 校验 token 后续期/释放，持有期间后台线程自动续期。
+single_flight: 同一 key 的并发计算在所有进程中只执行一次，其余调用方等待结果；
+               同进程内的并发调用直接等待本地线程的结果，不再访问 Redis。
+               默认只合并并发调用，计算结束后的调用会重新计算；ttl > 0 时结果额外缓存 ttl 秒，
+               期间的调用直接返回该结果（可能是 ttl 秒之前的值）。
+
+Usage:
+    with RedisLock(app.client.redis, "order:123", ttl=10):
+        ...
+    data = single_flight(app.client.redis, "report:2024", build_report)          # 只合并并发调用
+    data = single_flight(app.client.redis, "report:2024", build_report, ttl=60)  # 并缓存 60 秒
+"""
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]=锁 ARGV[1]=token
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# KEYS[1]=锁 ARGV[1]=token ARGV[2]=毫秒
+_RENEW_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# 计算结果交给等待方的保留毫秒数，key 中带有持有者的 token，不会被之后的调用读到
+_HANDOFF_MS = 5000
+
+
+class LockError(Exception):
+    """加锁超时或锁已丢失"""
+
+
+class RedisLock:
+    """
+    基于 Redis 的分布式互斥锁
+    :param redis: RedisClient 或 redis.Redis
+    :param name: 锁名称，实际 key 为 lock:<name>
+    :param ttl: 锁过期秒数，持有者崩溃后最多 ttl 秒自动释放
+    :param auto_renew: 持有期间每 ttl/3 秒续期一次
+    :param retry_interval: 阻塞加锁时的重试间隔秒数
+    """
+
+    def __init__(self, redis: Any, name: str, ttl: float = 10, auto_renew: bool = True, retry_interval: float = 0.05):
+        self.redis = as_redis(redis)
+        self.key = f"lock:{name}"
+        self.ttl = ttl
+        self.auto_renew = auto_renew
+        self.retry_interval = retry_interval
+        self.token: Optional[str] = None
+        self.lost = False
+        self._release_script = self.redis.register_script(_RELEASE_LUA)
+        self._renew_script = self.redis.register_script(_RENEW_LUA)
+        self._stop_renew = threading.Event()
+        self._renew_thread: Optional[threading.Thread] = None
+
+    @property
+    def ttl_ms(self) -> int:
+        return int(self.ttl * 1000)
+
+    def acquire(self, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        """加锁；blocking=False 时只尝试一次，timeout 为阻塞等待上限（None 表示一直等待）"""
+        token = uuid.uuid4().hex
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.redis.set(self.key, token, nx=True, px=self.ttl_ms):
+                self.token = token
+                self.lost = False
+                if self.auto_renew:
+                    self._start_renew()
+                return True
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                return False
+            time.sleep(self.retry_interval)
+
+    def renew(self) -> bool:
+        """续期；返回 False 表示锁已过期或被他人持有"""
+        if self.token is None:
+            return False
+        return bool(self._renew_script(keys=[self.key], args=[self.token, self.ttl_ms]))
+
+    def release(self) -> bool:
+        """释放锁，只会删除自己持有的锁"""
+        self._stop_renew.set()
+        if self._renew_thread is not None and self._renew_thread is not threading.current_thread():
+            self._renew_thread.join(timeout=1)
+        self._renew_thread = None
+        if self.token is None:
+            return False
+        token, self.token = self.token, None
+        return bool(self._release_script(keys=[self.key], args=[token]))
+
+    def locked(self) -> bool:
+        return bool(self.redis.exists(self.key))
+
+    def _start_renew(self) -> None:
+        self._stop_renew.clear()
+        self._renew_thread = threading.Thread(target=self._renew_loop, name=f"renew-{self.key}", daemon=True)
+        self._renew_thread.start()
+
+    def _renew_loop(self) -> None:
+        interval = max(self.ttl / 3, 0.01)
+        while not self._stop_renew.wait(interval):
+            try:
+                if not self.renew():
+                    self.lost = True
+                    logger.warning(f"锁 {self.key} 已丢失，停止续期")
+                    return
+            except Exception as e:
+                # 网络抖动时继续尝试，锁在 ttl 内仍然有效
+                logger.warning(f"锁 {self.key} 续期失败: {e}")
+
+    def __enter__(self) -> "RedisLock":
+        if not self.acquire():
+            raise LockError(f"加锁失败: {self.key}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_flights: Dict[str, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(redis: Any, key: str, fn: Callable[[], Any], ttl: float = 0, lock_ttl: float = 30,
+                  wait_timeout: float = 30, poll_interval: float = 0.02) -> Any:
+    """
+    跨进程合并同一 key 的计算
+    :param redis: RedisClient 或 redis.Redis
+    :param key: 计算的唯一标识
+    :param fn: 计算函数，返回值需可 JSON 序列化
+    :param ttl: 大于 0 时结果在 Redis 中缓存的秒数，期间的调用直接返回该结果；0 表示只合并并发调用
+    :param lock_ttl: 计算锁的过期秒数（持有期间自动续期）
+    :param wait_timeout: 等待其他进程计算结果的最长秒数，超时抛出 LockError
+    :param poll_interval: 等待其他进程时轮询结果的初始间隔
+    """
+    # 同进程已有线程在计算：直接等待本地结果
+    with _flights_lock:
+        flight = _flights.get(key)
+        owner = flight is None
+        if owner:
+            flight = _flights[key] = _Flight()
+    if not owner:
+        if not flight.done.wait(wait_timeout):
+            raise LockError(f"等待 {key} 计算结果超时")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = _distributed_flight(as_redis(redis), key, fn, ttl, lock_ttl, wait_timeout, poll_interval)
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _distributed_flight(redis: Any, key: str, fn: Callable[[], Any], ttl: float, lock_ttl: float,
+                        wait_timeout: float, poll_interval: float) -> Any:
+    cache_key = f"sf:result:{key}"
+    deadline = time.monotonic() + wait_timeout
+    interval = poll_interval
+    while True:
+        if ttl > 0:
+            raw = redis.get(cache_key)
+            if raw is not None:
+                return json.loads(raw)
+        lock = RedisLock(redis, f"sf:{key}", ttl=lock_ttl)
+        if lock.acquire(blocking=False):
+            try:
+                # 加锁前后可能已有其他进程写入结果
+                raw = redis.get(cache_key) if ttl > 0 else None
+                if raw is not None:
+                    return json.loads(raw)
+                value = fn()
+                data = json.dumps(value, ensure_ascii=False)
+                if ttl > 0:
+                    redis.set(cache_key, data, px=int(ttl * 1000))
+                redis.set(f"{cache_key}:{lock.token}", data, px=_HANDOFF_MS)
+                return value
+            finally:
+                lock.release()
+        # 等待当前持有者的结果；持有者释放锁但没有结果（计算失败）时重新竞争
+        holder = redis.get(lock.key)
+        if holder is not None:
+            handoff_key = f"{cache_key}:{_text(holder)}"
+            while True:
+                raw = redis.get(handoff_key)
+                if raw is not None:
+                    return json.loads(raw)
+                if redis.get(lock.key) != holder:
+                    raw = redis.get(handoff_key)
+                    if raw is not None:
+                        return json.loads(raw)
+                    break
+                if time.monotonic() >= deadline:
+                    raise LockError(f"等待 {key} 计算结果超时")
+                time.sleep(interval)
+                interval = min(interval * 2, 0.2)
+        if time.monotonic() >= deadline:
+            raise LockError(f"等待 {key} 计算结果超时")
@@ -0,0 +1,318 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from redis import RedisError, ResponseError
+
+from db.redisClient import as_redis
+
+"""
+基于 Redis Streams 消费组的轻量消息队列，回调方式与 RabbitMQClient.subscribe 一致。
+
+StreamConsumer:
+    XREADGROUP 批量拉取 -> 线程池并发执行回调 -> 成功的消息合并后一次 XACK
+    在途消息数达到 max_inflight 时暂停拉取（背压），避免处理慢时消息堆积在进程内存中
+    定期 XAUTOCLAIM 接管空闲超过 claim_idle_ms 的待确认消息（消费者崩溃或被下线），本进程正在处理的消息跳过
+    回调抛出异常的消息不确认，空闲 claim_idle_ms 后重新投递；投递次数超过 max_retries 后写入死信流
+    <stream>:dead 并确认，对应 RabbitMQ 的 nack(requeue=False)
+
+Usage:
+    publish(app.client.redis, "orders", {"id": 1})
+    def cb(body, properties, headers):
+        print("got", body, properties["id"])
+    consumer = StreamConsumer(app.client.redis, "orders", "billing", cb, concurrency=8)
+    consumer.start()
+    ...
+    consumer.stop()
+"""
+
+logger = logging.getLogger(__name__)
+
+JSON_CONTENT_TYPE = "application/json"
+
+
+def publish(redis: Any, stream: str, body: Any, headers: Optional[Dict[str, Any]] = None,
+            maxlen: Optional[int] = None, approximate: bool = True) -> str:
+    """
+    写入一条消息，返回消息 ID
+    body: bytes/str 或可 JSON 序列化的对象（会自动转换为 JSON 字符串）
+    headers: 附加字段，消费时作为 headers 传给回调
+    maxlen: 流的最大长度，超出后裁剪最旧的消息
+    """
+    fields: Dict[str, Any] = dict(headers or {})
+    if isinstance(body, (str, bytes)):
+        fields["body"] = body
+    else:
+        fields["body"] = json.dumps(body, ensure_ascii=False)
+        fields["content_type"] = JSON_CONTENT_TYPE
+    msg_id = as_redis(redis).xadd(stream, fields, maxlen=maxlen, approximate=approximate)
+    return msg_id.decode() if isinstance(msg_id, bytes) else msg_id
+
+
+def _text(value: Any) -> Any:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class StreamConsumer:
+    """
+    Redis Streams 消费组消费者（后台线程）
+    :param redis: RedisClient 或 redis.Redis
+    :param stream: 流名称
+    :param group: 消费组名称，不存在时自动创建（连同流）
+    :param callback: 回调 (body, properties, headers)
+        body: 消息体，content_type 为 application/json 时为解析后的对象
+        properties: {"id", "stream", "group", "consumer", "reclaimed"}
+        headers: 除 body/content_type 外的其余字段
+    :param consumer: 消费者名称，默认 <主机名>-<pid>；同名消费者重启后会先处理自己未确认的消息
+    :param batch_size: 每次 XREADGROUP / XAUTOCLAIM 拉取的最大条数
+    :param concurrency: 并发执行回调的线程数
+    :param max_inflight: 已拉取未完成的消息上限，默认 batch_size * concurrency
+    :param block_ms: XREADGROUP 阻塞等待毫秒数
+    :param ack_batch: 累积多少条确认后发送一次 XACK
+    :param ack_interval: 确认最长延迟秒数
+    :param claim_idle_ms: 待确认消息空闲超过该毫秒数视为原消费者失效，<=0 表示不接管
+    :param claim_interval: XAUTOCLAIM 检查间隔秒数
+    :param max_retries: 回调失败后的最多重试次数，0 表示失败即写入死信流
+    :param dead_letter: 死信流名称，默认 <stream>:dead，空字符串表示失败消息直接确认丢弃
+    :param auto_ack: 拉取即确认（NOACK），回调失败不会重试
+    :param start_id: 新建消费组的起始位置，$ 只消费之后的新消息，0 从头消费
+    """
+
+    def __init__(self, redis: Any, stream: str, group: str, callback: Callable[[Any, Dict[str, Any], Dict[str, Any]], None],
+                 consumer: Optional[str] = None, batch_size: int = 10, concurrency: int = 4,
+                 max_inflight: Optional[int] = None, block_ms: int = 1000, ack_batch: int = 50,
+                 ack_interval: float = 0.2, claim_idle_ms: int = 60000, claim_interval: float = 30,
+                 max_retries: int = 3, dead_letter: Optional[str] = None, auto_ack: bool = False,
+                 start_id: str = "$", reconnect_interval: float = 5):
+        self.redis = as_redis(redis)
+        self.stream = stream
+        self.group = group
+        self.callback = callback
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_inflight = max_inflight or batch_size * concurrency
+        self.block_ms = block_ms
+        self.ack_batch = ack_batch
+        self.ack_interval = ack_interval
+        self.claim_idle_ms = claim_idle_ms
+        self.claim_interval = claim_interval
+        self.max_retries = max_retries
+        self.dead_letter = f"{stream}:dead" if dead_letter is None else dead_letter
+        self.auto_ack = auto_ack
+        self.start_id = start_id
+        self.reconnect_interval = reconnect_interval
+        self.stats = dict(received=0, processed=0, failed=0, retried=0, dead=0, acked=0, reclaimed=0)
+        self._stats_lock = threading.Lock()
+        self._inflight = 0
+        self._cond = threading.Condition()
+        self._acks: List[str] = []
+        # 已拉取、尚未确认的消息 ID，XAUTOCLAIM 接管时跳过，避免同一条消息被本进程重复处理
+        self._handling: set = set()
+        self._acks_lock = threading.Lock()
+        self._last_flush = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += n
+
+    # ---------------- 生命周期 ----------------
+
+    def start(self) -> "StreamConsumer":
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError("consumer already running")
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"stream-{self.stream}")
+        self._thread = threading.Thread(target=self._run, name=f"stream-reader-{self.stream}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10) -> None:
+        """停止拉取，等待在途消息处理完成并提交确认"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        try:
+            self._flush_acks(force=True)
+        except RedisError as e:
+            logger.warning(f"消费者 {self.consumer} 退出时提交确认失败，消息将由其他消费者接管: {e}")
+        logger.info(f"Stream consumer stopped: stream={self.stream} group={self.group} consumer={self.consumer}")
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def ensure_group(self) -> None:
+        try:
+            self.redis.xgroup_create(self.stream, self.group, id=self.start_id, mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    # ---------------- 拉取循环 ----------------
+
+    def _run(self) -> None:
+        # 先处理本消费者名下遗留的待确认消息，再读取新消息
+        read_id = "0"
+        last_claim = 0.0
+        while not self._stop.is_set():
+            try:
+                self.ensure_group()
+                while not self._stop.is_set():
+                    free = self._wait_capacity()
+                    if free <= 0:
+                        continue
+                    if self.claim_idle_ms > 0 and time.monotonic() - last_claim >= self.claim_interval:
+                        last_claim = time.monotonic()
+                        self._reclaim(free)
+                        continue
+                    # 有待提交的确认时缩短阻塞时间，保证 ack_interval
+                    block = self.block_ms if not self._acks else int(self.ack_interval * 1000)
+                    reply = self.redis.xreadgroup(self.group, self.consumer, {self.stream: read_id},
+                                                  count=min(free, self.batch_size),
+                                                  block=None if read_id != ">" else max(block, 1),
+                                                  noack=self.auto_ack)
+                    entries = reply[0][1] if reply else []
+                    if read_id != ">":
+                        # 历史消息按 ID 向后翻页，读完后切换到新消息
+                        read_id = _text(entries[-1][0]) if entries else ">"
+                    self._dispatch(entries, reclaimed=False)
+                    self._flush_acks()
+            except RedisError as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"Stream consumer error: {e}. Reconnecting in {self.reconnect_interval}s...")
+                self._stop.wait(self.reconnect_interval)
+        logger.info(f"Stream reader exiting for stream={self.stream}")
+
+    def _wait_capacity(self) -> int:
+        """背压：在途消息达到上限时等待回调完成"""
+        with self._cond:
+            while self._inflight >= self.max_inflight and not self._stop.is_set():
+                if not self._cond.wait(timeout=self.ack_interval):
+                    self._flush_acks()
+            return self.max_inflight - self._inflight
+
+    def _reclaim(self, free: int) -> None:
+        reply = self.redis.xautoclaim(self.stream, self.group, self.consumer, self.claim_idle_ms,
+                                      start_id="0-0", count=min(free, self.batch_size))
+        # 被裁剪删除的消息字段为空，无法处理，直接确认
+        with self._acks_lock:
+            handling = set(self._handling)
+        entries = [e for e in reply[1] if e and e[1] and _text(e[0]) not in handling]
+        gone = [e[0] for e in reply[1] if e and not e[1]] + list(reply[2] if len(reply) > 2 else [])
+        if gone:
+            self._ack(gone)
+        if entries:
+            self._count("reclaimed", len(entries))
+            logger.info(f"Stream consumer {self.consumer} reclaimed {len(entries)} pending messages")
+            self._dispatch(entries, reclaimed=True)
+
+    def _dispatch(self, entries: List[Tuple[Any, Dict[Any, Any]]], reclaimed: bool) -> None:
+        for msg_id, fields in entries:
+            if not fields:
+                # XREADGROUP 0 读到已被删除的历史消息
+                self._ack([msg_id])
+                continue
+            msg_id = _text(msg_id)
+            if not self.auto_ack:
+                with self._acks_lock:
+                    if msg_id in self._handling:
+                        continue
+                    self._handling.add(msg_id)
+            self._count("received")
+            with self._cond:
+                self._inflight += 1
+            self._pool.submit(self._handle, msg_id, fields, reclaimed)
+
+    # ---------------- 回调与确认 ----------------
+
+    def _handle(self, msg_id: str, fields: Dict[Any, Any], reclaimed: bool) -> None:
+        try:
+            fields = {_text(k): v for k, v in fields.items()}
+            payload = fields.pop("body", None)
+            content_type = _text(fields.pop("content_type", ""))
+            if content_type == JSON_CONTENT_TYPE and payload is not None:
+                try:
+                    payload = json.loads(payload)
+                except ValueError:
+                    pass
+            properties = dict(id=msg_id, stream=self.stream, group=self.group, consumer=self.consumer, reclaimed=reclaimed)
+            try:
+                self.callback(payload, properties, {k: _text(v) for k, v in fields.items()})
+                self._count("processed")
+            except Exception as cb_exc:
+                self._count("failed")
+                logger.exception(f"Error in stream message callback: {cb_exc}")
+                if self._should_retry(msg_id):
+                    # 不确认，空闲 claim_idle_ms 后由 XAUTOCLAIM 重新投递
+                    self._count("retried")
+                    with self._acks_lock:
+                        self._handling.discard(msg_id)
+                    return
+                self._count("dead")
+                self._dead_letter(msg_id, fields, payload, content_type, cb_exc)
+            self._ack([msg_id])
+        finally:
+            with self._cond:
+                self._inflight -= 1
+                self._cond.notify()
+
+    def _should_retry(self, msg_id: str) -> bool:
+        """按消费组记录的投递次数判断是否还能重试"""
+        if self.auto_ack or self.max_retries <= 0 or self.claim_idle_ms <= 0:
+            return False
+        try:
+            pending = self.redis.xpending_range(self.stream, self.group, min=msg_id, max=msg_id, count=1)
+        except RedisError as e:
+            logger.warning(f"查询消息 {msg_id} 投递次数失败，按可重试处理: {e}")
+            return True
+        # 已不在待确认列表中（被其他消费者确认或流被裁剪），无需重试
+        return bool(pending) and pending[0]["times_delivered"] <= self.max_retries
+
+    def _dead_letter(self, msg_id: str, fields: Dict[str, Any], payload: Any, content_type: str, error: Exception) -> None:
+        if not self.dead_letter or self.auto_ack:
+            return
+        body = json.dumps(payload, ensure_ascii=False) if content_type == JSON_CONTENT_TYPE else payload
+        record = dict(fields, body=body if body is not None else "", source_id=msg_id, error=repr(error)[:500])
+        if content_type:
+            record["content_type"] = content_type
+        try:
+            self.redis.xadd(self.dead_letter, record)
+        except RedisError as e:
+            logger.warning(f"写入死信流 {self.dead_letter} 失败: {e}")
+
+    def _ack(self, ids: List[Any]) -> None:
+        if self.auto_ack:
+            return
+        with self._acks_lock:
+            self._acks.extend(_text(i) for i in ids)
+
+    def _flush_acks(self, force: bool = False) -> None:
+        with self._acks_lock:
+            if not self._acks or (not force and len(self._acks) < self.ack_batch and time.monotonic() - self._last_flush < self.ack_interval):
+                return
+            ids, self._acks = self._acks, []
+            self._last_flush = time.monotonic()
+        try:
+            self._count("acked", self.redis.xack(self.stream, self.group, *ids))
+            with self._acks_lock:
+                self._handling.difference_update(ids)
+        except RedisError:
+            # 放回队列，下次重试；进程退出时未确认的消息由其他消费者接管
+            with self._acks_lock:
+                self._acks[:0] = ids
+            raise
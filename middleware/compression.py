@@ -0,0 +1,223 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core import app as app_core
+from utils import ziputil
+
+"""
+响应压缩中间件（纯 ASGI），按 Accept-Encoding 协商 zstd / br / gzip（br、zstd 需安装 brotli、zstandard）。
+
+    - 小于 minimum_size 的响应、已带 Content-Encoding 的响应、图片/压缩包等非文本类型不压缩
+    - 206 与带 Content-Range 的响应不压缩，范围请求的偏移针对的是原始响应体
+    - 一次性响应整体压缩并重写 Content-Length；超过 threadpool_size 的响应体在线程池中压缩，不阻塞事件循环
+    - 流式响应（StreamingResponse / ResultStream）逐块压缩并同步刷新，去掉 Content-Length，客户端可以边收边解压
+    - 响应体超过 large_size 或为流式响应时使用 large_levels（更低的压缩级别，换取吞吐）
+    - 压缩后强 ETag 改为弱 ETag，If-None-Match 仍可匹配（ResponseCacheMiddleware 使用弱比较）
+
+应添加在其他中间件之后（最外层），ResponseCacheMiddleware 缓存的是未压缩的响应体。
+
+配置（应用配置文件 pmf.compression，构造参数优先）:
+    compression:
+      enabled: true
+      minimum_size: 500             # 字节
+      encodings: [zstd, br, gzip]   # 服务端优先顺序，未安装的编码自动忽略
+      levels: {gzip: 6, br: 4, zstd: 3}
+      large_size: 1048576
+      large_levels: {gzip: 1, br: 1, zstd: 1}
+      threadpool_size: 65536
+
+Usage:
+    myapp.app.add_middleware(CompressionMiddleware)
+"""
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "application/problem+json", "image/svg+xml")
+LARGE_LEVELS: Dict[str, int] = {"gzip": 1, "br": 1, "zstd": 1}
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """解析 Accept-Encoding，返回 {编码: q}，如 "gzip, br;q=0.8" -> {"gzip": 1.0, "br": 0.8}"""
+    result = {}
+    for item in value.split(","):
+        parts = item.strip().split(";")
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            name, _, raw = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        result[coding] = q
+    return result
+
+
+def select_encoding(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """按 q 值选择编码，q 相同时按服务端 encodings 顺序；不接受任何可用编码时返回 None"""
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in encodings:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件
+    :param minimum_size: 小于该字节数的响应不压缩
+    :param encodings: 服务端优先顺序，默认 zstd、br、gzip 中已安装的
+    :param levels: 各编码的压缩级别
+    :param threadpool_size: 单次压缩数据超过该字节数时放到线程池执行
+    :param config: compression 配置字典，默认读取应用配置 pmf.compression
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None, encodings: Optional[List[str]] = None,
+                 levels: Optional[Dict[str, int]] = None, large_size: Optional[int] = None,
+                 large_levels: Optional[Dict[str, int]] = None, threadpool_size: Optional[int] = None,
+                 config: Optional[Dict[str, Any]] = None):
+        self.app = app
+        self._args = {"minimum_size": minimum_size, "encodings": encodings, "levels": levels,
+                      "large_size": large_size, "large_levels": large_levels, "threadpool_size": threadpool_size}
+        self._config = config
+        self._loaded = False
+        self.enabled = True
+
+    def _load(self) -> None:
+        config = self._config
+        if config is None:
+            myapp = app_core.app
+            config = myapp.config.get_value("pmf.compression", {}) if myapp is not None else {}
+        config = dict(config or {})
+        config.update({k: v for k, v in self._args.items() if v is not None})
+        self.enabled = config.get("enabled", True)
+        self.minimum_size = int(config.get("minimum_size", 500))
+        available = ziputil.available_encodings()
+        self.encodings = [e for e in config.get("encodings") or available if e in available]
+        self.levels = dict(ziputil.DEFAULT_LEVELS, **(config.get("levels") or {}))
+        self.large_size = int(config.get("large_size", 1 << 20))
+        self.large_levels = dict(LARGE_LEVELS, **(config.get("large_levels") or {}))
+        self.threadpool_size = int(config.get("threadpool_size", 1 << 16))
+        self._loaded = True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if not self._loaded:
+            self._load()
+        encoding = None
+        if self.enabled and self.encodings and scope["method"] != "HEAD":
+            for name, value in scope["headers"]:
+                if name == b"accept-encoding":
+                    encoding = select_encoding(value.decode("latin-1"), self.encodings)
+                    break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self, encoding)(self.app, scope, receive, send)
+
+    async def compress(self, data: bytes, encoding: str, level: int) -> bytes:
+        if len(data) >= self.threadpool_size:
+            return await run_in_threadpool(ziputil.compress_as, data, encoding, level)
+        return ziputil.compress_as(data, encoding, level)
+
+
+def _compressible(headers: List[Tuple[bytes, bytes]]) -> bool:
+    content_type = b""
+    for name, value in headers:
+        if name in (b"content-encoding", b"content-range"):
+            return False
+        if name == b"content-type":
+            content_type = value
+    return content_type.decode("latin-1").lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class _CompressionResponder:
+    """单个请求的压缩状态：缓存 http.response.start，看到第一块响应体后决定是否压缩"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.start: Optional[Message] = None
+        self.compressor: Optional[ziputil.StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, app: ASGIApp, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await app(scope, receive, self.send_wrapper)
+
+    def _headers(self, content_length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = []
+        vary = None
+        for name, value in self.start.get("headers", []):
+            if name == b"content-length":
+                continue
+            if name == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            elif name == b"vary":
+                vary = value
+                continue
+            headers.append((name, value))
+        if vary is None:
+            vary = b"Accept-Encoding"
+        elif b"accept-encoding" not in vary.lower() and vary.strip() != b"*":
+            vary += b", Accept-Encoding"
+        headers.append((b"vary", vary))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return headers
+
+    async def _stream(self, chunk: bytes) -> bytes:
+        if len(chunk) >= self.middleware.threadpool_size:
+            return await run_in_threadpool(self.compressor.compress, chunk)
+        return self.compressor.compress(chunk)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            self.start = message
+            status = message["status"]
+            if status < 200 or status in (204, 206, 304) or not _compressible(message.get("headers", [])):
+                self.passthrough = True
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        middleware = self.middleware
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body:
+                # 一次性响应
+                if len(body) < middleware.minimum_size:
+                    self.passthrough = True
+                    await self.send(self.start)
+                    await self.send(message)
+                    return
+                levels = middleware.large_levels if len(body) >= middleware.large_size else middleware.levels
+                body = await middleware.compress(body, self.encoding, levels[self.encoding])
+                self.start["headers"] = self._headers(len(body))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            # 流式响应，总大小未知
+            self.compressor = ziputil.StreamCompressor(self.encoding, middleware.large_levels[self.encoding])
+            self.start["headers"] = self._headers(None)
+            await self.send(self.start)
+        data = await self._stream(body) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
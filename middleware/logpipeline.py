@@ -0,0 +1,172 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+"""
+请求日志异步管道。
+
+中间件只把日志记录放入有界内存队列（put_nowait，微秒级），后台线程按批写入 sink；
+队列满时直接丢弃并计数，日志写入变慢不会拖慢请求。
+
+sink:
+    MongoSink      insert_many(ordered=False) 写入集合
+    FileSink       追加写入 JSONL 文件
+    CallbackSink   自定义，如 lambda records: producer.send_batch(records) 写入 Kafka
+
+Usage:
+    pipeline = LogPipeline(MongoSink(app.client.mgo.client["jhlog"]["KmpReqLog"]), batch_size=500)
+    pipeline.submit({"uri": "/api", ...})
+    pipeline.stats()
+"""
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+TRUNCATED_MARKER = "...[truncated, {size} bytes]"
+
+
+def _decode_body(record: Dict[str, Any], name: str) -> None:
+    body = record.get(f"{name}_body")
+    is_json = record.pop(f"{name}_json", False)
+    if not isinstance(body, (bytes, bytearray)):
+        return
+    text = bytes(body).decode("utf-8", errors="replace")
+    size = record.get(f"{name}_size") or len(body)
+    if size > len(body):
+        # 只截取了前 N 字节，不再尝试解析 JSON
+        record[f"{name}_body"] = text + TRUNCATED_MARKER.format(size=size)
+        return
+    if is_json:
+        try:
+            record[f"{name}_body"] = json.loads(text)
+            return
+        except ValueError:
+            pass
+    record[f"{name}_body"] = text
+
+
+def prepare_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """在后台线程中完成的转换：请求/响应体解码、截断标记与 JSON 解析，避免占用请求路径"""
+    _decode_body(record, "request")
+    _decode_body(record, "response")
+    return record
+
+
+class MongoSink:
+    """写入 MongoDB 集合，无序批量插入，单条失败不影响其他记录"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __call__(self, records: List[Dict[str, Any]]) -> None:
+        self.collection.insert_many(records, ordered=False)
+
+
+class FileSink:
+    """追加写入 JSONL 文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, records: List[Dict[str, Any]]) -> None:
+        if orjson is not None:
+            data = b"".join(orjson.dumps(r, default=str, option=orjson.OPT_APPEND_NEWLINE) for r in records)
+        else:
+            data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records).encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+
+class CallbackSink:
+    """自定义 sink，fn 接收一批日志记录"""
+
+    def __init__(self, fn: Callable[[List[Dict[str, Any]]], Any]):
+        self.fn = fn
+
+    def __call__(self, records: List[Dict[str, Any]]) -> None:
+        self.fn(records)
+
+
+class LogPipeline:
+    """
+    :param sink: 接收一批记录的可调用对象
+    :param max_queue: 队列容量，满时丢弃新记录
+    :param batch_size: 每批写入的最大条数
+    :param flush_interval: 不足一批时最长等待秒数
+    """
+
+    def __init__(self, sink: Callable[[List[Dict[str, Any]]], Any], max_queue: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 1.0):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._stats = dict(submitted=0, dropped=0, written=0, failed=0, batches=0)
+        self._thread = threading.Thread(target=self._run, name="log-pipeline", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """放入队列，队列已满时丢弃并返回 False"""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._stats["dropped"] += 1
+            return False
+        self._stats["submitted"] += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self._stats)
+        s["queued"] = self._queue.qsize()
+        return s
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Dict[str, Any]] = []
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(timeout, 0)) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self.sink([prepare_record(r) for r in batch])
+            self._stats["written"] += len(batch)
+        except Exception as e:
+            self._stats["failed"] += len(batch)
+            logger.warning(f"请求日志写入失败，丢弃 {len(batch)} 条: {e}")
+        self._stats["batches"] += 1
+
+    def close(self, timeout: float = 5) -> None:
+        """写完队列中剩余的记录后停止后台线程"""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
@@ -0,0 +1,201 @@
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core import app as app_core
+
+"""
+HTTP 指标与 Prometheus 文本格式输出。
+
+MetricsMiddleware（纯 ASGI）按 方法/路由模板/状态码 记录耗时直方图与在途请求数，并在 /metrics 输出：
+    pmf_http_request_duration_seconds   直方图
+    pmf_http_requests_in_flight         按 方法/路由模板 的在途请求数
+    pmf_client_*                        App.client 中 Redis/MySQL 连接池、熔断器等状态（抓取时采集）
+
+计数只在事件循环线程中修改（ASGI 中间件运行在事件循环中），不加锁；路由使用模板（如 /items/{id}）
+而不是实际路径，未匹配的请求归入 <unmatched>，避免标签基数失控。
+路由在请求进入应用后才确定，在途请求只登记 scope，抓取时再按 scope 中的路由分组；
+尚未完成路由的请求计入 <unmatched>。
+
+Usage:
+    myapp.app.add_middleware(MetricsMiddleware)
+    registry.register(lambda: [("pmf_orders_pending", {}, queue.qsize())])   # 自定义指标
+"""
+
+# 直方图桶（秒），与 Prometheus 客户端默认值一致
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 采集函数返回 (指标名, 标签, 值) 列表，类型均为 gauge
+Sample = Tuple[str, Dict[str, Any], float]
+Collector = Callable[[], Iterable[Sample]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _route_path(scope: Scope) -> str:
+    return getattr(scope.get("route"), "path", "<unmatched>")
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class MetricsRegistry:
+    """HTTP 指标与自定义采集函数"""
+
+    def __init__(self, collectors: Optional[List[Collector]] = None):
+        self.http: Dict[Tuple[str, str, str], _Histogram] = {}
+        # id(scope) -> scope，处理中的请求
+        self.active: Dict[int, Scope] = {}
+        self.collectors: List[Collector] = list(collectors or [])
+
+    def register(self, collector: Collector) -> None:
+        self.collectors.append(collector)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self.active)
+
+    def in_flight_by_route(self) -> Dict[Tuple[str, str], int]:
+        """(方法, 路由模板) -> 在途请求数，已出现过的路由即使当前没有请求也输出 0"""
+        counts = {(method, route): 0 for method, route, _ in list(self.http)}
+        for scope in list(self.active.values()):
+            key = (scope["method"], _route_path(scope))
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, str(status))
+        hist = self.http.get(key)
+        if hist is None:
+            hist = self.http[key] = _Histogram()
+        hist.observe(seconds)
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        lines = ["# HELP pmf_http_request_duration_seconds HTTP request latency",
+                 "# TYPE pmf_http_request_duration_seconds histogram"]
+        for (method, route, status), hist in list(self.http.items()):
+            base = f'method="{method}",route="{_escape(route)}",status="{status}"'
+            cumulative = 0
+            for bound, n in zip(BUCKETS, hist.counts):
+                cumulative += n
+                lines.append(f'pmf_http_request_duration_seconds_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'pmf_http_request_duration_seconds_bucket{{{base},le="+Inf"}} {hist.count}')
+            lines.append(f"pmf_http_request_duration_seconds_sum{{{base}}} {hist.sum}")
+            lines.append(f"pmf_http_request_duration_seconds_count{{{base}}} {hist.count}")
+        lines += ["# HELP pmf_http_requests_in_flight HTTP requests being served",
+                  "# TYPE pmf_http_requests_in_flight gauge"]
+        for (method, route), n in self.in_flight_by_route().items():
+            lines.append(f'pmf_http_requests_in_flight{{method="{method}",route="{_escape(route)}"}} {n}')
+        typed = set()
+        for collector in self.collectors:
+            try:
+                samples = list(collector())
+            except Exception as e:
+                lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {e!r}".replace("\n", " "))
+                continue
+            for name, labels, value in samples:
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{_labels(labels)} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def client_metrics() -> List[Sample]:
+    """采集 App.client 中各客户端的连接池与熔断器状态"""
+    myapp = app_core.app
+    if myapp is None:
+        return []
+    samples: List[Sample] = []
+    client = myapp.client
+    redis = client.redis_client
+    pool = getattr(redis, "_pool", None)
+    if pool is not None and hasattr(pool, "_created_connections"):
+        samples += [("pmf_client_redis_pool_created", {}, pool._created_connections),
+                    ("pmf_client_redis_pool_available", {}, len(pool._available_connections)),
+                    ("pmf_client_redis_pool_in_use", {}, len(pool._in_use_connections)),
+                    ("pmf_client_redis_pool_max", {}, pool.max_connections)]
+    if getattr(client.mysql, "Engine", None) is not None:
+        mysql_pool = client.mysql.Engine.pool
+        if hasattr(mysql_pool, "checkedout"):
+            samples += [("pmf_client_mysql_pool_size", {}, mysql_pool.size()),
+                        ("pmf_client_mysql_pool_checked_out", {}, mysql_pool.checkedout()),
+                        ("pmf_client_mysql_pool_checked_in", {}, mysql_pool.checkedin()),
+                        ("pmf_client_mysql_pool_overflow", {}, mysql_pool.overflow())]
+    for name in ("mysql", "mgo", "amgo"):
+        breaker = getattr(getattr(client, name, None), "breaker", None)
+        if breaker is not None:
+            samples.append(("pmf_client_circuit_state", {"client": breaker.name}, _BREAKER_STATES.get(breaker.state, -1)))
+    return samples
+
+
+registry = MetricsRegistry([client_metrics])
+
+
+class MetricsMiddleware:
+    """
+    指标中间件（纯 ASGI）
+    :param registry: 默认使用模块级 registry
+    :param path: 指标输出路径，None 表示不输出（由其他方式暴露 registry.render()）
+    """
+
+    def __init__(self, app: ASGIApp, registry: Optional[MetricsRegistry] = None, path: Optional[str] = "/metrics"):
+        self.app = app
+        self.registry = registry or globals()["registry"]
+        self.path = path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["path"] == self.path:
+            await self._expose(send)
+            return
+        registry = self.registry
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.active[id(scope)] = scope
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            del registry.active[id(scope)]
+            registry.observe(scope["method"], _route_path(scope), status, time.perf_counter() - start)
+
+    async def _expose(self, send: Send) -> None:
+        body = self.registry.render().encode("utf-8")
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/plain; version=0.0.4; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
@@ -3,15 +3,19 @@ import logging
 from datetime import datetime
 import sys
 import os
-import json
 
 # 添加项目根目录到Python路径
 # project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # sys.path.insert(0, project_root)
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from core import app as app_core
+from middleware.logpipeline import LogPipeline, MongoSink, FileSink
 
 
 # 配置 logging
@@ -23,70 +27,193 @@ from core import app as app_core
 logger = logging.getLogger(__name__)
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-       
-    async def dispatch(self, request: Request, call_next):
+@dataclass
+class CapturePolicy:
+    """
+    请求/响应体采集策略（应用配置 pmf.log.capture）:
+        capture:
+          max_bytes: 4096               # 请求/响应体最多记录的字节数，超出部分以截断标记代替
+          content_types:                # 只记录这些类型（前缀匹配）的消息体，上传文件、下载流等不记录
+            - application/json
+            - application/x-www-form-urlencoded
+            - text/
+          sample: 1.0                   # 默认采样率
+          routes:                       # 按路径前缀设置采样率，最长匹配优先
+            - path: /api/v1/rustfs
+              sample: 0.1
+    """
+    max_bytes: int = 4096
+    content_types: Tuple[str, ...] = ("application/json", "application/x-www-form-urlencoded", "text/")
+    sample: float = 1.0
+    routes: Tuple[Tuple[str, float], ...] = ()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CapturePolicy":
+        routes = [(r["path"], float(r.get("sample", 1.0))) for r in data.get("routes") or []]
+        return cls(max_bytes=int(data.get("max_bytes", cls.max_bytes)),
+                   content_types=tuple(data.get("content_types") or cls.content_types),
+                   sample=float(data.get("sample", cls.sample)),
+                   routes=tuple(sorted(routes, key=lambda r: len(r[0]), reverse=True)))
+
+    def sample_rate(self, path: str) -> float:
+        for prefix, rate in self.routes:
+            if path.startswith(prefix):
+                return rate
+        return self.sample
+
+    def sampled(self, path: str) -> bool:
+        rate = self.sample_rate(path)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def allowed(self, content_type: Optional[str]) -> bool:
+        return bool(content_type) and content_type.startswith(self.content_types)
+
+
+def build_pipeline(myapp) -> Optional[LogPipeline]:
+    """
+    按应用配置 pmf.log 创建日志管道:
+        log:
+          req: KmpReqLog      # 请求日志集合
+          dbName: jhlog       # 日志库，默认使用 mongo 配置的库
+          sink: mongo         # mongo / file / none
+          file: logs/request.jsonl
+          queue: 10000        # 队列容量，满时丢弃
+          batch: 500          # 每批写入条数
+          interval: 1         # 最长攒批秒数
+    """
+    if myapp is None:
+        return None
+    conf: Dict[str, Any] = myapp.config.get_value("pmf.log", {})
+    sink_type = conf.get("sink", "mongo")
+    if sink_type == "mongo" and myapp.client.mgo is not None and conf.get("req"):
+        mgo = myapp.client.mgo
+        sink = MongoSink(mgo.client[conf.get("dbName") or mgo.db_name][conf["req"]])
+    elif sink_type == "file":
+        sink = FileSink(conf.get("file", "logs/request.jsonl"))
+    else:
+        return None
+    return LogPipeline(sink, max_queue=int(conf.get("queue", 10000)), batch_size=int(conf.get("batch", 500)),
+                       flush_interval=float(conf.get("interval", 1)))
+
+
+class _BodyTee:
+    """转发消息体的同时保留前 max_bytes 字节"""
+    __slots__ = ("head", "size", "max_bytes")
+
+    def __init__(self, max_bytes: int):
+        self.head = bytearray()
+        self.size = 0
+        self.max_bytes = max_bytes
+
+    def feed(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if len(self.head) < self.max_bytes:
+            self.head += chunk[:self.max_bytes - len(self.head)]
+
+
+class LoggingMiddleware:
+    """
+    请求日志中间件（纯 ASGI），日志记录放入 LogPipeline 队列后由后台线程批量写入，请求路径上不访问数据库
+    按 CapturePolicy 采样；包装 receive/send，消息体边转发边截取前 max_bytes 字节，
+    不缓冲请求与响应，流式响应、文件上传与下载原样透传
+    :param pipeline: 默认按应用配置 pmf.log 创建
+    :param capture: 默认按应用配置 pmf.log.capture 创建
+    """
+
+    def __init__(self, app: ASGIApp, pipeline: Optional[LogPipeline] = None, capture: Optional[CapturePolicy] = None):
+        self.app = app
+        self.pipeline = pipeline
+        self.capture = capture
+        self._disabled = False
+
+    def _get_pipeline(self) -> Optional[LogPipeline]:
+        if self.pipeline is None and not self._disabled:
+            self.pipeline = build_pipeline(app_core.app)
+            self._disabled = self.pipeline is None
+        return self.pipeline
+
+    def _get_capture(self) -> CapturePolicy:
+        if self.capture is None:
+            myapp = app_core.app
+            conf = myapp.config.get_value("pmf.log.capture", {}) if myapp is not None else {}
+            self.capture = CapturePolicy.from_dict(conf)
+        return self.capture
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        pipeline = self._get_pipeline()
+        capture = self._get_capture()
+        path = scope["path"]
+        if (pipeline is None and not logger.isEnabledFor(logging.DEBUG)) or not capture.sampled(path):
+            await self.app(scope, receive, send)
+            return
         start_time = time.time()
         start_dt = datetime.utcnow()
 
-        # 请求信息
-        request_info = {
-            "uri": str(request.url.path),
-            "method": request.method,
-            "headers": dict(request.headers),
+        headers = Headers(scope=scope)
+        record: Dict[str, Any] = {
+            "uri": path,
+            "method": scope["method"],
+            "headers": dict(headers),
+            "query": dict(QueryParams(scope["query_string"])),
         }
-        request_params: dict = {}
-        if request.method == "GET":
-            request_params = dict(request.query_params)
-        elif request.method == "POST":
-            if request.headers.get("Content-Type").startswith("application/json"):
-                request_params = await request.json()
-            elif request.headers.get("Content-Type").startswith("application/x-www-form-urlencoded") or  request.headers.get("Content-Type").startswith("multipart/form-data"):
-                request_params = await request.form()
-        request_params.update(dict(request.query_params))
-        request_info["body"] = request_params
-        # 输出日志
-        logger.debug(f"{request_info['method']}|接口地址:{request_info['uri']} | 请求参数:{request_params}")
-
-        # 执行请求
-        response: Response = await call_next(request)
-
-        # 响应信息
-        process_time = (time.time() - start_time) * (10 ^ 6)
-        end_dt = datetime.utcnow()
+        content_type = headers.get("content-type")
+        request_tee = _BodyTee(capture.max_bytes) if capture.allowed(content_type) else None
+        response_tee: Optional[_BodyTee] = None
+        response_type: Optional[str] = None
+        finished = False
+        logger.debug(f"{record['method']}|接口地址:{path} | 请求参数:{record['query']}")
 
-        try:
-            # 读取响应体（同样需还原，避免响应异常）
-            response_body = b""
-            async for chunk in response.body_iterator:
-                response_body += chunk
-            # 还原响应体流
-            async def async_iter():
-                yield response_body
-            response.body_iterator = async_iter()
-            response_text = response_body.decode("utf-8")
-        except Exception:
-            response_text = None
-        logger.debug(f"{request_info['method']}|接口地址:{request_info['uri']} | 响应参数:{response_text}")
-
-        log_data = {
-            "uri": request_info["uri"],
-            "method": request_info["method"],
-            "headers": request_info["headers"],
-            "request_body": request_info["body"],
-            "response_body": json.loads(response_text) if response_text else None,
-            "start_time": time.strftime("%Y-%m-%d %H:%M:%S",start_dt.timetuple()),
-            "end_time": time.strftime("%Y-%m-%d %H:%M:%S",end_dt.timetuple()),
-            "ttl": process_time,
-        }
+        def finish(status: int) -> None:
+            end_dt = datetime.utcnow()
+            record["status"] = status
+            if request_tee is not None:
+                record["request_body"] = bytes(request_tee.head)
+                record["request_size"] = request_tee.size
+                record["request_json"] = content_type.startswith("application/json")
+            elif content_type:
+                record["request_body"] = f"[{content_type} body not captured]"
+            if response_tee is not None:
+                record["response_body"] = bytes(response_tee.head)
+                record["response_size"] = response_tee.size
+                record["response_json"] = response_type.startswith("application/json")
+            record["start_time"] = time.strftime("%Y-%m-%d %H:%M:%S", start_dt.timetuple())
+            record["end_time"] = time.strftime("%Y-%m-%d %H:%M:%S", end_dt.timetuple())
+            record["ttl"] = round((time.time() - start_time) * 10 ** 6)  # 微秒
+            if logger.isEnabledFor(logging.DEBUG):
+                body = bytes(response_tee.head) if response_tee is not None else b""
+                logger.debug(f"{record['method']}|接口地址:{path} | 响应参数:{body.decode('utf-8', errors='replace')}")
+            if pipeline is not None:
+                pipeline.submit(record)
 
-        # 保存到 MongoDB
-        # myapp = app.get_app()
-        print(f"myapp:{app_core.app}")
-        # if myapp.client.mgo is not None:
-        #     logger.debug("开始写入mongodb日志")
-        #     myapp.client.mgo.get_collection(myapp.config.pmf.log.req.to_primitive()).insert_one(log_data)
-
-        return response
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                request_tee.feed(message.get("body", b""))
+            return message
 
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_tee, response_type, finished, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_type = Headers(raw=message.get("headers", [])).get("content-type")
+                if capture.allowed(response_type):
+                    response_tee = _BodyTee(capture.max_bytes)
+            elif message["type"] == "http.response.body":
+                if response_tee is not None:
+                    response_tee.feed(message.get("body", b""))
+                if not message.get("more_body", False) and not finished:
+                    finished = True
+                    finish(status)
+            await send(message)
 
+        status = 500
+        try:
+            await self.app(scope, receive_wrapper if request_tee is not None else receive, send_wrapper)
+        finally:
+            if not finished:
+                # 异常或客户端断开时同样记录
+                finished = True
+                finish(status)
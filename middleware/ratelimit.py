@@ -0,0 +1,298 @@
+import ipaddress
+import math
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
+from redis import RedisError
+
+from core import app as app_core
+from db.redisClient import as_redis, is_async_redis
+from db.redisCache import LocalCache
+from models import Result
+from utils.urlutil import path_matches
+
+"""
+基于 Redis 的 GCRA 限流中间件。
+
+每个实例按批次向 Redis 预取令牌（一次 Lua 调用领取多个），令牌在本地消耗完之前不再访问 Redis，
+预取的令牌只在其代表的时间窗口内有效，因此各实例合计不会超过配置的速率与突发量。
+每个 key 首次只领取 1 个令牌，在上一批令牌过期前用完时才翻倍预取（最多 lease 个），
+冷门 key（如单个 IP）不会在 Redis 中占用用不到的令牌。
+
+key: ip 默认使用连接的对端地址；只有对端在 trusted_proxies 中时才读取 X-Forwarded-For，
+取从右往左第一个不属于 trusted_proxies 的地址。
+
+配置（应用配置文件 pmf.ratelimit）:
+    ratelimit:
+      enabled: true
+      lease: 10                 # 每次预取的令牌数上限，1 表示每个请求都访问 Redis
+      trusted_proxies:          # 反向代理地址或网段，省略则忽略 X-Forwarded-For
+        - 10.0.0.0/8
+      default:                  # 未匹配任何路由时使用，省略则不限流
+        rate: 100               # period 秒内允许的请求数
+        period: 1
+        burst: 100              # 允许的突发量，默认等于 rate
+        key: ip                 # ip / global / header:<名称> / query:<参数名>
+      routes:
+        - path: /api/v1/paychannel   # 路径前缀（按路径段匹配），最长匹配优先
+          rate: 10
+          period: 1
+          key: header:X-User-Id
+
+Usage:
+    myapp.app.add_middleware(RateLimitMiddleware, redis=myapp.client.redis)
+"""
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]=限流key ARGV[1]=每个令牌的毫秒间隔 ARGV[2]=突发量 ARGV[3]=申请令牌数
+# 返回 {授予数量, 建议重试毫秒}
+_GCRA_LEASE_LUA = """
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local want = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local avail = math.floor((now + burst * interval - tat) / interval)
+local grant = math.min(want, avail)
+if grant <= 0 then
+    return {0, math.ceil(tat + interval - now - burst * interval)}
+end
+tat = tat + grant * interval
+redis.call('SET', KEYS[1], tat, 'PX', math.ceil(tat - now) + 1000)
+return {grant, 0}
+"""
+
+
+@dataclass
+class RatePolicy:
+    name: str
+    rate: int
+    period: float = 1.0
+    burst: Optional[int] = None
+    key: str = "ip"
+    path: str = ""
+
+    def __post_init__(self):
+        if self.rate <= 0 or self.period <= 0:
+            raise ValueError(f"限流策略 {self.name} 的 rate 与 period 必须大于 0")
+
+    @property
+    def interval_ms(self) -> float:
+        return self.period * 1000 / self.rate
+
+    @property
+    def max_burst(self) -> int:
+        return self.burst or self.rate
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict[str, Any]) -> "RatePolicy":
+        return cls(name=name, rate=int(data["rate"]), period=float(data.get("period", 1)),
+                   burst=data.get("burst"), key=data.get("key", "ip"), path=data.get("path", ""))
+
+
+class RateLimiter:
+    """
+    令牌预取 + Redis GCRA 限流器
+    :param redis: RedisClient / redis.Redis / redis.asyncio.Redis
+    :param lease: 每次向 Redis 预取的令牌数上限
+    :param fail_open: Redis 不可用时是否放行
+    :param trusted_proxies: 可信反向代理的地址或网段，key 为 ip 时只信任这些代理添加的 X-Forwarded-For
+    """
+
+    def __init__(self, redis: Any, policies: List[RatePolicy], default: Optional[RatePolicy] = None,
+                 lease: int = 10, fail_open: bool = True, max_keys: int = 100000,
+                 trusted_proxies: Iterable[str] = ()):
+        self.redis = as_redis(redis)
+        self.is_async = is_async_redis(self.redis)
+        self.script = self.redis.register_script(_GCRA_LEASE_LUA)
+        # 路径越长越优先
+        self.policies = sorted(policies, key=lambda p: len(p.path), reverse=True)
+        self.default = default
+        self.lease = max(1, lease)
+        self.fail_open = fail_open
+        self.trusted_proxies = parse_networks(trusted_proxies)
+        # key -> [剩余令牌数, 本批领取数]，过期时间等于这批令牌代表的时间窗口
+        self._leases = LocalCache(max_size=max_keys)
+        self._lock = threading.Lock()
+        self.stats = dict(local=0, remote=0, rejected=0, errors=0)
+
+    @classmethod
+    def from_config(cls, redis: Any, config: Dict[str, Any]) -> "RateLimiter":
+        routes = [RatePolicy.from_dict(f"route{i}", r) for i, r in enumerate(config.get("routes") or [])]
+        default = RatePolicy.from_dict("default", config["default"]) if config.get("default") else None
+        return cls(redis, routes, default=default, lease=int(config.get("lease", 10)),
+                   fail_open=bool(config.get("fail_open", True)),
+                   trusted_proxies=config.get("trusted_proxies") or ())
+
+    def match(self, path: str) -> Optional[RatePolicy]:
+        for policy in self.policies:
+            if path_matches(path, policy.path):
+                return policy
+        return self.default
+
+    def _take_local(self, key: str) -> bool:
+        with self._lock:
+            tokens = self._leases.get(key)
+            if tokens and tokens[0] > 0:
+                tokens[0] -= 1
+                return True
+        return False
+
+    def _store(self, key: str, policy: RatePolicy, granted: int) -> None:
+        # 第一个令牌立即使用，其余留在本地；用完后记录仍保留到窗口结束，用于判断是否为热点 key
+        self._leases.set(key, [granted - 1, granted], ttl=granted * policy.interval_ms / 1000)
+
+    def _want(self, policy: RatePolicy, key: str) -> int:
+        """上一批令牌在窗口内已用完（热点 key）时翻倍预取，否则只领取 1 个"""
+        tokens = self._leases.get(key)
+        if tokens is None:
+            return 1
+        return max(1, min(tokens[1] * 2, self.lease, policy.max_burst))
+
+    def _args(self, policy: RatePolicy, key: str) -> List[Any]:
+        return [policy.interval_ms, policy.max_burst, self._want(policy, key)]
+
+    def _result(self, key: str, policy: RatePolicy, reply: Any) -> Tuple[bool, float]:
+        granted, retry_ms = int(reply[0]), int(reply[1])
+        if granted <= 0:
+            self.stats["rejected"] += 1
+            return False, retry_ms / 1000
+        self._store(key, policy, granted)
+        return True, 0.0
+
+    def _on_error(self, e: Exception) -> Tuple[bool, float]:
+        self.stats["errors"] += 1
+        logger.warning(f"限流器访问Redis失败: {e}")
+        return self.fail_open, 1.0
+
+    def acquire(self, policy: RatePolicy, key: str) -> Tuple[bool, float]:
+        """申请一个令牌，返回 (是否放行, 建议重试秒数)"""
+        if self._take_local(key):
+            self.stats["local"] += 1
+            return True, 0.0
+        return self._acquire_remote(policy, key)
+
+    def _acquire_remote(self, policy: RatePolicy, key: str) -> Tuple[bool, float]:
+        self.stats["remote"] += 1
+        try:
+            reply = self.script(keys=[key], args=self._args(policy, key))
+        except RedisError as e:
+            return self._on_error(e)
+        return self._result(key, policy, reply)
+
+    async def acquire_async(self, policy: RatePolicy, key: str) -> Tuple[bool, float]:
+        """acquire 的协程版本；同步 Redis 客户端在线程池中执行，本地令牌命中时不切换线程"""
+        if self._take_local(key):
+            self.stats["local"] += 1
+            return True, 0.0
+        if not self.is_async:
+            return await run_in_threadpool(self._acquire_remote, policy, key)
+        self.stats["remote"] += 1
+        try:
+            reply = await self.script(keys=[key], args=self._args(policy, key))
+        except RedisError as e:
+            return self._on_error(e)
+        return self._result(key, policy, reply)
+
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(values: Iterable[str]) -> List[Network]:
+    return [ipaddress.ip_network(str(v).strip(), strict=False) for v in values]
+
+
+def _trusted(host: str, networks: List[Network]) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+def client_ip(request: Request, trusted_proxies: List[Network] = ()) -> str:
+    """客户端地址：对端为可信代理时，取 X-Forwarded-For 中从右往左第一个不可信的地址"""
+    host = request.client.host if request.client else ""
+    if not trusted_proxies or not _trusted(host, trusted_proxies):
+        return host
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded:
+        return host
+    hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+    for hop in reversed(hops):
+        if not _trusted(hop, trusted_proxies):
+            return hop
+    # 整条链路都是可信代理，取最左侧的地址
+    return hops[0] if hops else host
+
+
+def request_key(request: Request, policy: RatePolicy, trusted_proxies: List[Network] = ()) -> str:
+    """按策略提取限流维度"""
+    kind, _, name = policy.key.partition(":")
+    if kind == "global":
+        value = "-"
+    elif kind == "header":
+        value = request.headers.get(name, "")
+    elif kind == "query":
+        value = request.query_params.get(name, "")
+    else:
+        value = client_ip(request, trusted_proxies)
+    return f"rl:{policy.name}:{value}"
+
+
+class RateLimitMiddleware:
+    """
+    限流中间件（纯 ASGI），超限返回 429 与 Retry-After
+    :param redis: 默认使用 App.client.aredis 或 App.client.redis
+    :param config: ratelimit 配置字典，默认读取应用配置 pmf.ratelimit
+    """
+
+    def __init__(self, app: ASGIApp, redis: Any = None, config: Optional[Dict[str, Any]] = None,
+                 limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self._redis = redis
+        self._config = config
+        self.limiter = limiter
+        self._disabled = False
+
+    def _get_limiter(self) -> Optional[RateLimiter]:
+        if self.limiter is None and not self._disabled:
+            myapp = app_core.app
+            config = self._config
+            if config is None and myapp is not None:
+                config = myapp.config.get_value("pmf.ratelimit", {})
+            if not config or not config.get("enabled", True):
+                self._disabled = True
+                return None
+            redis = self._redis or (myapp.client.aredis or myapp.client.redis if myapp is not None else None)
+            if redis is None:
+                logger.warning("限流中间件未找到Redis客户端，限流未启用")
+                self._disabled = True
+                return None
+            self.limiter = RateLimiter.from_config(redis, config)
+        return self.limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self._get_limiter() if scope["type"] == "http" else None
+        policy = limiter.match(scope["path"]) if limiter is not None else None
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+        key = request_key(Request(scope), policy, limiter.trusted_proxies)
+        allowed, retry_after = await limiter.acquire_async(policy, key)
+        if not allowed:
+            response = JSONResponse(status_code=429,
+                                    content=Result.error(code=429, msg="请求过于频繁，请稍后重试").to_dict(),
+                                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,352 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from redis import RedisError
+
+from core import app as app_core
+from db.redisClient import _RedisConfig, is_async_redis
+from db.redisCache import LocalCache
+from utils.urlutil import path_matches
+
+"""
+GET 响应缓存中间件，支持 ETag / If-None-Match 304。
+
+缓存 key 由 方法、路径、排序后的查询参数与 vary 中列出的请求头组成；只缓存 200 且不带 Set-Cookie、
+Cache-Control 不含 no-store/private 的响应。
+请求带有 Authorization 或 Cookie 时不使用缓存，除非该头已列入 vary（按用户分别缓存）或路由配置了 shared: true
+（明确声明响应与用户无关）。ETag 为响应体哈希，请求带有匹配的 If-None-Match 时返回 304。
+同一进程内相同 key 的并发未命中只执行一次 handler，其他请求等待并复用其结果。
+
+存储：local 进程内 LRU；redis 多实例共享；both 先查本地再查 Redis。Redis 不可用时按未命中处理。
+
+配置（应用配置文件 pmf.httpcache）:
+    httpcache:
+      enabled: true
+      store: local              # local / redis / both
+      max_size: 10000           # 本地缓存条数
+      max_body: 1048576         # 超过该字节数的响应不缓存
+      default:                  # 未匹配任何路由时使用，省略则只缓存 routes 中的路径
+        ttl: 5
+      routes:
+        - path: /api/v1/paychannel   # 路径前缀（按路径段匹配），最长匹配优先
+          ttl: 30
+          vary: [X-User-Id]          # 参与缓存 key 的请求头
+        - path: /api/v1/region
+          ttl: 60
+          shared: true               # 带 Authorization/Cookie 的请求也共用同一份缓存
+        - path: /api/v1/order
+          ttl: 0                     # 0 表示不缓存
+
+Usage:
+    myapp.app.add_middleware(ResponseCacheMiddleware, redis=myapp.client.redis_client)
+    cache.invalidate("/api/v1/paychannel")     # 数据变更后删除该路径下的缓存
+"""
+
+logger = logging.getLogger(__name__)
+
+STORES = ("local", "redis", "both")
+# 命中时不返回的响应头（由服务器重新生成）
+_SKIP_HEADERS = {b"date", b"server"}
+# 带有这些请求头时默认不缓存
+_CREDENTIAL_HEADERS = {b"authorization", b"cookie"}
+# 304 响应保留的响应头
+_NOT_MODIFIED_HEADERS = {b"etag", b"cache-control", b"vary", b"expires", b"x-cache"}
+
+
+@dataclass
+class CachePolicy:
+    name: str
+    ttl: float
+    path: str = ""
+    vary: Tuple[str, ...] = ()
+    shared: bool = False
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict[str, Any]) -> "CachePolicy":
+        return cls(name=name, ttl=float(data.get("ttl", 5)), path=data.get("path", ""),
+                   vary=tuple(h.lower() for h in data.get("vary") or ()), shared=bool(data.get("shared", False)))
+
+    def bypass(self, scope: Scope) -> bool:
+        """请求带有未列入 vary 的 Authorization/Cookie 时不缓存，避免把一个用户的响应返回给其他用户"""
+        if self.shared:
+            return False
+        return any(name in _CREDENTIAL_HEADERS and name.decode("latin-1") not in self.vary
+                   for name, _ in scope["headers"])
+
+
+class CacheEntry(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    etag: bytes
+    expires_at: float
+
+    def dumps(self) -> bytes:
+        head = {"s": self.status, "h": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in self.headers],
+                "e": self.etag.decode("latin-1"), "x": self.expires_at}
+        return json.dumps(head, separators=(",", ":")).encode("utf-8") + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, data: bytes) -> "CacheEntry":
+        head, _, body = data.partition(b"\n")
+        h = json.loads(head)
+        return cls(h["s"], [(k.encode("latin-1"), v.encode("latin-1")) for k, v in h["h"]], body,
+                   h["e"].encode("latin-1"), h["x"])
+
+
+def compute_etag(body: bytes) -> bytes:
+    return b'"' + hashlib.blake2b(body, digest_size=16).hexdigest().encode() + b'"'
+
+
+def etag_matches(if_none_match: Optional[bytes], etag: bytes) -> bool:
+    """If-None-Match 弱比较"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == b"*":
+        return True
+    return any(tag.strip().removeprefix(b"W/") == etag for tag in if_none_match.split(b","))
+
+
+class ResponseCache:
+    """
+    :param redis: RedisClient / AsyncRedisClient / bytes 模式的 redis 客户端，store 为 redis/both 时使用
+    :param store: local / redis / both
+    :param max_body: 超过该字节数的响应不缓存
+    """
+
+    def __init__(self, policies: List[CachePolicy], default: Optional[CachePolicy] = None, redis: Any = None,
+                 store: str = "local", max_size: int = 10000, max_body: int = 1024 * 1024, prefix: str = "rc"):
+        if store not in STORES:
+            raise ValueError(f"不支持的 store: {store}")
+        if store != "local" and redis is None:
+            raise ValueError(f"store={store} 需要 redis 客户端")
+        # 路径越长越优先
+        self.policies = sorted(policies, key=lambda p: len(p.path), reverse=True)
+        self.default = default
+        self.store = store
+        self.max_body = max_body
+        self.prefix = prefix
+        self.local = LocalCache(max_size=max_size) if store != "redis" else None
+        self.redis = None
+        if store != "local":
+            # 缓存内容为二进制，RedisClient 使用 decode_responses=False 的孪生客户端
+            self.redis = redis.binary().get_connection() if isinstance(redis, _RedisConfig) else redis
+        self.is_async = is_async_redis(self.redis)
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        self.stats = dict(hits=0, misses=0, coalesced=0, not_modified=0, stored=0, bypassed=0, errors=0)
+
+    @classmethod
+    def from_config(cls, redis: Any, config: Dict[str, Any]) -> "ResponseCache":
+        routes = [CachePolicy.from_dict(f"route{i}", r) for i, r in enumerate(config.get("routes") or [])]
+        default = CachePolicy.from_dict("default", config["default"]) if config.get("default") else None
+        return cls(routes, default=default, redis=redis, store=config.get("store", "local"),
+                   max_size=int(config.get("max_size", 10000)), max_body=int(config.get("max_body", 1024 * 1024)))
+
+    def match(self, path: str) -> Optional[CachePolicy]:
+        for policy in self.policies:
+            if path_matches(path, policy.path):
+                return policy if policy.ttl > 0 else None
+        return self.default if self.default is not None and self.default.ttl > 0 else None
+
+    def key(self, scope: Scope, policy: CachePolicy) -> str:
+        query = urlencode(sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)))
+        parts = [scope["method"], query]
+        if policy.vary:
+            headers = dict(scope["headers"])
+            parts += [headers.get(h.encode("latin-1"), b"").decode("latin-1") for h in policy.vary]
+        digest = hashlib.blake2b("\n".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+        return f"{self.prefix}:{scope['path']}:{digest}"
+
+    async def _redis_call(self, fn, *args):
+        if self.is_async:
+            return await fn(*args)
+        return await run_in_threadpool(fn, *args)
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        if self.local is not None:
+            entry = self.local.get(key)
+            if entry is not None:
+                return entry
+        if self.redis is None:
+            return None
+        try:
+            data = await self._redis_call(self.redis.get, key)
+        except RedisError as e:
+            self.stats["errors"] += 1
+            logger.warning(f"响应缓存读取Redis失败: {e}")
+            return None
+        if data is None:
+            return None
+        entry = CacheEntry.loads(data)
+        if self.local is not None:
+            self.local.set(key, entry, ttl=max(0.0, entry.expires_at - time.time()))
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry, ttl: float) -> None:
+        self.stats["stored"] += 1
+        if self.local is not None:
+            self.local.set(key, entry, ttl=ttl)
+        if self.redis is None:
+            return
+        try:
+            await self._redis_call(self.redis.set, key, entry.dumps(), None, max(1, int(ttl * 1000)))
+        except RedisError as e:
+            self.stats["errors"] += 1
+            logger.warning(f"响应缓存写入Redis失败: {e}")
+
+    def invalidate(self, path: str = "") -> int:
+        """
+        删除路径（前缀匹配）下的缓存，返回删除的本地条数
+        Redis 中的条目通过 SCAN 删除；使用 redis.asyncio 客户端时只删除本地缓存，Redis 条目等待过期
+        """
+        prefix = f"{self.prefix}:{path}"
+        count = self.local.delete_prefix(prefix) if self.local is not None else 0
+        if self.redis is not None and not self.is_async:
+            keys = list(self.redis.scan_iter(match=prefix + "*", count=500))
+            if keys:
+                self.redis.delete(*keys)
+        return count
+
+
+class ResponseCacheMiddleware:
+    """
+    响应缓存中间件（纯 ASGI）
+    :param redis: store 为 redis/both 时使用，默认 App.client.aredis_client 或 App.client.redis_client
+    :param config: httpcache 配置字典，默认读取应用配置 pmf.httpcache
+    """
+
+    def __init__(self, app: ASGIApp, redis: Any = None, config: Optional[Dict[str, Any]] = None,
+                 cache: Optional[ResponseCache] = None):
+        self.app = app
+        self._redis = redis
+        self._config = config
+        self.cache = cache
+        self._disabled = False
+
+    def _get_cache(self) -> Optional[ResponseCache]:
+        if self.cache is None and not self._disabled:
+            myapp = app_core.app
+            config = self._config
+            if config is None and myapp is not None:
+                config = myapp.config.get_value("pmf.httpcache", {})
+            if not config or not config.get("enabled", True):
+                self._disabled = True
+                return None
+            redis = self._redis
+            if redis is None and config.get("store", "local") != "local" and myapp is not None:
+                # 使用客户端管理器，缓存内容通过其 decode_responses=False 的孪生客户端读写
+                redis = myapp.client.aredis_client or myapp.client.redis_client
+            self.cache = ResponseCache.from_config(redis, config)
+        return self.cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        cache = self._get_cache() if scope["type"] == "http" and scope["method"] == "GET" else None
+        policy = cache.match(scope["path"]) if cache is not None else None
+        if policy is not None and policy.bypass(scope):
+            cache.stats["bypassed"] += 1
+            policy = None
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+        if_none_match = no_cache = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value
+            elif name == b"cache-control" and b"no-cache" in value:
+                no_cache = True
+        key = cache.key(scope, policy)
+        entry = None if no_cache else await cache.get(key)
+        if entry is None and not no_cache and key in cache._inflight:
+            # 相同请求正在执行，等待其结果
+            cache.stats["coalesced"] += 1
+            entry = await asyncio.shield(cache._inflight[key])
+        if entry is not None:
+            await self._respond(cache, entry, if_none_match, b"HIT", send)
+            return
+        cache.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future() if key not in cache._inflight else None
+        if future is not None:
+            cache._inflight[key] = future
+        entry = None
+        try:
+            entry = await self._call_and_capture(cache, policy, scope, receive, send, if_none_match)
+            if entry is not None:
+                await cache.set(key, entry, policy.ttl)
+        finally:
+            if future is not None:
+                cache._inflight.pop(key, None)
+                future.set_result(entry)
+
+    async def _respond(self, cache: ResponseCache, entry: CacheEntry, if_none_match: Optional[bytes],
+                       state: bytes, send: Send) -> None:
+        headers = [(k, v) for k, v in entry.headers if k not in _SKIP_HEADERS] + [(b"x-cache", state)]
+        if etag_matches(if_none_match, entry.etag):
+            cache.stats["not_modified"] += 1
+            headers = [(k, v) for k, v in headers if k in _NOT_MODIFIED_HEADERS]
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if state == b"HIT":
+            cache.stats["hits"] += 1
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+    async def _call_and_capture(self, cache: ResponseCache, policy: CachePolicy, scope: Scope, receive: Receive,
+                                send: Send, if_none_match: Optional[bytes]) -> Optional[CacheEntry]:
+        """执行 handler；可缓存的响应先完整缓冲再发送，不可缓存或超过 max_body 时原样转发"""
+        start_message: Optional[Message] = None
+        chunks: List[bytes] = []
+        size = 0
+        passthrough = False
+        captured: Optional[CacheEntry] = None
+
+        async def flush() -> None:
+            nonlocal passthrough
+            passthrough = True
+            await send(start_message)
+            if chunks:
+                await send({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+                chunks.clear()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, size, captured
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = message.get("headers", [])
+                cacheable = message["status"] == 200 and not any(
+                    k == b"set-cookie" or (k == b"cache-control" and (b"no-store" in v or b"private" in v))
+                    for k, v in headers)
+                if not cacheable:
+                    await flush()
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            size += len(body)
+            if size > cache.max_body:
+                await flush()
+                await send(message)
+                return
+            chunks.append(body)
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            etag = compute_etag(body)
+            headers = [(k, v) for k, v in start_message.get("headers", []) if k != b"etag"] + [(b"etag", etag)]
+            captured = CacheEntry(start_message["status"], headers, body, etag, time.time() + policy.ttl)
+            await self._respond(cache, captured, if_none_match, b"MISS", send)
+
+        await self.app(scope, receive, send_wrapper)
+        return captured
@@ -0,0 +1,57 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils import traceutil
+
+"""
+请求追踪中间件（纯 ASGI）。
+
+读取上游的 traceparent 头继续同一条链路，没有时新建根 span 并按采样率决定是否记录；
+请求处理期间该 span 为当前 span，handler 中 Redis/MySQL/MongoDB/RabbitMQ/MQTT/S3 的调用自动成为其子 span。
+span 名称使用路由模板（如 GET /items/{id}），响应头返回 traceparent 便于排查。
+
+Usage:
+    traceutil.from_config(myapp.config.get_value("pmf.trace", {}))   # App 初始化时已按配置完成
+    myapp.app.add_middleware(TracingMiddleware)
+"""
+
+
+class TracingMiddleware:
+
+    def __init__(self, app: ASGIApp, exclude_paths=("/metrics", "/health")):
+        self.app = app
+        self.exclude_paths = set(exclude_paths or ())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not traceutil.enabled() or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = traceutil.parse_traceparent(value)
+                break
+        method = scope["method"]
+        span = traceutil.start_span(f"{method} {scope['path']}", kind="server", parent=parent, attributes={
+            "http.request.method": method, "url.path": scope["path"], "url.scheme": scope.get("scheme", "http"),
+            "client.address": (scope.get("client") or ("",))[0],
+        })
+        traceparent = traceutil.format_traceparent(span.context).encode() if span.context is not None else None
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                span.set_attribute("http.response.status_code", status)
+                if status >= 500:
+                    span.set_error(f"HTTP {status}")
+                if traceparent is not None:
+                    message["headers"] = list(message.get("headers", [])) + [(b"traceparent", traceparent)]
+            await send(message)
+
+        with span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if span.recording and route is not None:
+                    span.name = f"{method} {route.path}"
+                    span.set_attribute("http.route", route.path)
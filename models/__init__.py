@@ -1,3 +1,3 @@
 from . import result
 
-from .result import Result
\ No newline at end of file
+from .result import Result, ResultResponse, ResultStream
\ No newline at end of file
@@ -1,5 +1,12 @@
-from typing import Any, Union, List, Dict
+from typing import Any, Union, List, Dict, Optional, Mapping, Iterable, AsyncIterable, Iterator, AsyncIterator
 import json
+import logging
+from starlette.responses import Response, StreamingResponse
+
+from utils.jsonutil import dumps, json_default
+
+logger = logging.getLogger(__name__)
+
 
 class Result:
     def __init__(self, code: int = 200, msg: str = "success", data: Any = None):
@@ -23,6 +30,24 @@ class Result:
         """
         return cls(code=200, msg=msg, data=data)
 
+    @classmethod
+    def success_rows(cls, rows: Any, msg: str = "success", orient: str = "records") -> 'Result':
+        """
+        使用数据库查询结果创建成功响应，整体转换而非逐行 row._asdict()
+        :param rows: SQLAlchemy Result 或 Row 列表
+        :param msg: 成功消息
+        :param orient: records 为字典列表，columns 为按列组织的数组，split 为列名与行数组，其他值抛出 ValueError
+        :return: Result对象
+        """
+        from db.mysqlClient import rows_to_dicts, rows_to_columns, rows_to_split
+        if orient == "records":
+            return cls(code=200, msg=msg, data=rows_to_dicts(rows))
+        if orient == "columns":
+            return cls(code=200, msg=msg, data=rows_to_columns(rows))
+        if orient == "split":
+            return cls(code=200, msg=msg, data=rows_to_split(rows))
+        raise ValueError(f"不支持的 orient: {orient}")
+
     @classmethod
     def success_page(cls, data: Any = None,  page_index: int = 1, page_size: int = 10, total: int = 0) -> 'Result':
         """
@@ -39,6 +64,44 @@ class Result:
         } 
         return res
 
+    @classmethod
+    def success_cursor(cls, data: Any = None, next_cursor: Optional[str] = None, page_size: Optional[int] = None,
+                       total: Optional[int] = None, msg: str = "success") -> 'Result':
+        """
+        创建键集分页响应，page 为 {"size", "next_cursor", "total"}，最后一页 next_cursor 为 None
+        :param data: 当前页数据，或 db.pagination.Page（此时忽略其余分页参数）
+        :param next_cursor: 下一页游标
+        :param total: 总数，未统计时为 None
+        :return: Result对象
+        """
+        if hasattr(data, "next_cursor") and hasattr(data, "items"):
+            data, next_cursor, page_size, total = data.items, data.next_cursor, data.size, data.total
+        res = cls(code=200, msg=msg, data=data)
+        res.page = {
+            "size": page_size,
+            "next_cursor": next_cursor,
+            "total": total
+        }
+        return res
+
+    @classmethod
+    def success_stream(cls, rows: Union[Iterable[Any], AsyncIterable[Any]], msg: str = "success",
+                       page_index: Optional[int] = None, page_size: Optional[int] = None, total: Optional[int] = None,
+                       ndjson: bool = False, batch_size: int = 500, batched: bool = False) -> 'ResultStream':
+        """
+        以流式响应返回大量数据，逐批序列化写出，内存占用与数据量无关
+        :param rows: 行的迭代器或异步迭代器，如 SQLAlchemy Result、pymongo 游标、AsyncMongoClient 游标
+        :param page_index: 传入时在 data 之后输出 page
+        :param total: 总数，未传入时使用实际输出的行数
+        :param ndjson: True 时每行一个 JSON（application/x-ndjson），不输出 code/msg/page
+        :param batched: rows 的每个元素是一批行（如 db.mongoExport.iter_batches）
+        :return: ResultStream对象
+        """
+        page = None
+        if page_index is not None:
+            page = {"index": page_index, "size": page_size, "total": total}
+        return ResultStream(rows, code=200, msg=msg, page=page, ndjson=ndjson, batch_size=batch_size, batched=batched)
+
     @classmethod
     def error(cls, code: int = 400, msg: str = "error", data: Any = None) -> 'Result':
         """
@@ -55,14 +118,28 @@ class Result:
         将Result对象转换为JSON字符串
         :return: JSON字符串
         """
-        return json.dumps(self.to_dict(), indent=2, ensure_ascii=False)
+        return json.dumps(self.to_dict(), indent=2, ensure_ascii=False, default=json_default)
+
+    def to_bytes(self) -> bytes:
+        """
+        将Result对象直接序列化为紧凑的JSON字节串（orjson，缺失时使用标准库 json）
+        :return: JSON字节串
+        """
+        return dumps(self.to_dict())
+
+    def response(self, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> 'ResultResponse':
+        """
+        转换为 ResultResponse，路由直接返回时跳过 FastAPI 的 jsonable_encoder
+        :return: ResultResponse对象
+        """
+        return ResultResponse(self, status_code=status_code, headers=headers)
 
     def to_dict(self) -> Dict:
         """
         将Result对象转换为字典
         :return: 字典
         """
-        if hasattr(self, 'page') and self.page['total'] > 0:
+        if hasattr(self, 'page') and ('next_cursor' in self.page or (self.page['total'] or 0) > 0):
             return {
                 'code': self.code,
                 'msg': self.msg,
@@ -79,6 +156,129 @@ class Result:
     def __str__(self) -> str:
         return self.to_json()
 
+class ResultResponse(Response):
+    """
+    直接把 Result（或任意可序列化对象）序列化为紧凑 JSON 的响应类，不经过 jsonable_encoder
+    用法：
+        @app.get("/orders", response_class=ResultResponse)
+        def orders():
+            return Result.success_rows(rows).response()
+    注意：只有路由直接返回 Response 时 FastAPI 才会跳过 jsonable_encoder，仅设置 response_class 不够
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, Result):
+            return content.to_bytes()
+        return dumps(content)
+
+
+class ResultStream(StreamingResponse):
+    """
+    流式输出 {"code":..,"msg":..,"data":[...],"page":{..}}，每 batch_size 行序列化为一个分块
+    同步迭代器每批在线程池中读取一次（数据库阻塞调用不占用事件循环），异步迭代器直接在事件循环中读取；
+    page 输出在 data 之后，total 未知时填入实际行数。输出中途出错时记录日志并中断连接，客户端得到不完整的 JSON。
+    用法：
+        @app.get("/orders/export")
+        def export():
+            rows = session.execute(select(Order).execution_options(yield_per=1000)).scalars()
+            return Result.success_stream(rows, page_index=1, page_size=0)
+    """
+
+    def __init__(self, rows: Union[Iterable[Any], AsyncIterable[Any]], code: int = 200, msg: str = "success",
+                 page: Optional[Dict[str, Any]] = None, ndjson: bool = False, batch_size: int = 500,
+                 batched: bool = False, status_code: int = 200, headers: Optional[Mapping[str, str]] = None):
+        self.code = code
+        self.msg = msg
+        self.page = page
+        self.ndjson = ndjson
+        self.batch_size = batch_size
+        self.batched = batched
+        self.rows_sent = 0
+        if hasattr(rows, "__aiter__"):
+            content = self._aiter_chunks(rows)
+        else:
+            content = self._iter_chunks(rows)
+        super().__init__(content, status_code=status_code, headers=headers,
+                         media_type="application/x-ndjson" if ndjson else "application/json")
+
+    def _head(self) -> bytes:
+        if self.ndjson:
+            return b""
+        return b'{"code":' + dumps(self.code) + b',"msg":' + dumps(self.msg) + b',"data":['
+
+    def _tail(self) -> bytes:
+        if self.ndjson:
+            return b""
+        tail = b"]"
+        if self.page is not None:
+            page = dict(self.page)
+            if page.get("total") is None:
+                page["total"] = self.rows_sent
+            # 与 Result.to_dict 一致，total 为 0 时不输出 page
+            if page["total"] > 0:
+                tail += b',"page":' + dumps(page)
+        return tail + b"}"
+
+    def _encode(self, batch: List[Any]) -> bytes:
+        if self.ndjson:
+            chunk = b"\n".join(dumps(row) for row in batch) + b"\n"
+        else:
+            chunk = b",".join(dumps(row) for row in batch)
+            if self.rows_sent:
+                chunk = b"," + chunk
+        self.rows_sent += len(batch)
+        return chunk
+
+    def _batches(self, rows: Iterable[Any]) -> Iterator[List[Any]]:
+        if self.batched:
+            yield from rows
+            return
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _abatches(self, rows: AsyncIterable[Any]) -> AsyncIterator[List[Any]]:
+        batch = []
+        async for row in rows:
+            if self.batched:
+                yield row
+                continue
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _iter_chunks(self, rows: Iterable[Any]) -> Iterator[bytes]:
+        yield self._head()
+        try:
+            for batch in self._batches(rows):
+                if batch:
+                    yield self._encode(batch)
+        except Exception:
+            logger.exception(f"流式响应在输出 {self.rows_sent} 行后中断")
+            raise
+        yield self._tail()
+
+    async def _aiter_chunks(self, rows: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+        yield self._head()
+        try:
+            async for batch in self._abatches(rows):
+                if batch:
+                    yield self._encode(batch)
+        except Exception:
+            logger.exception(f"流式响应在输出 {self.rows_sent} 行后中断")
+            raise
+        yield self._tail()
+
+
 # 使用示例
 if __name__ == "__main__":
     # 成功示例 - 返回字典
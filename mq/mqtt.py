@@ -1,13 +1,24 @@
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 import logging
 import time
+from utils import traceutil
+
+"""
+MQTT 客户端（paho-mqtt）
+启用 utils.traceutil 追踪时，发布与消息处理各记录一个 span；MQTT 3.1.1 没有消息头，
+只有 protocol=mqtt.MQTTv5 时追踪上下文才通过 User Property traceparent 传递到订阅方。
+"""
 
 class MQTTClient:
-    def __init__(self, broker:str, port: int=1883, client_id: str=None, username: str=None, password: str=None, first_reconnect_delay: int=1, reconnect_rate: int=2, max_reconnect_count: int=12, max_reconnect_delay: int=60):
+    def __init__(self, broker:str, port: int=1883, client_id: str=None, username: str=None, password: str=None, first_reconnect_delay: int=1, reconnect_rate: int=2, max_reconnect_count: int=12, max_reconnect_delay: int=60, protocol: int=mqtt.MQTTv311):
         self.client = mqtt.Client(
             client_id=client_id,
-            callback_api_version=mqtt.CallbackAPIVersion.VERSION2
+            callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+            protocol=protocol
         )
+        self.protocol = protocol
         if username and password:
             self.client.username_pw_set(username, password)
         self.broker = broker
@@ -20,13 +31,32 @@ class MQTTClient:
         self.client.loop_start()
 
     def publish(self, topic, payload, qos=0, retain=False):
-        self.client.publish(topic, payload, qos, retain)
+        span = traceutil.start_span(f"mqtt publish {topic}", "producer", {
+            "messaging.system": "mqtt", "messaging.destination.name": topic, "messaging.mqtt.qos": qos,
+        })
+        properties = None
+        if span.context is not None and self.protocol == mqtt.MQTTv5:
+            properties = Properties(PacketTypes.PUBLISH)
+            properties.UserProperty = [("traceparent", traceutil.format_traceparent(span.context))]
+        with span:
+            self.client.publish(topic, payload, qos, retain, properties)
 
     def subscribe(self, topic, qos=0, on_message=None):
         if on_message:
-            self.client.on_message = on_message
+            self.client.on_message = self._traced(on_message) if traceutil.enabled() else on_message
         self.client.subscribe(topic, qos)
 
+    @staticmethod
+    def _traced(on_message):
+        def handler(client, userdata, message):
+            user_properties = getattr(message.properties, "UserProperty", None) or []
+            with traceutil.start_span(f"mqtt process {message.topic}", "consumer", {
+                "messaging.system": "mqtt", "messaging.destination.name": message.topic,
+                "messaging.message.body.size": len(message.payload),
+            }, parent=traceutil.extract(dict(user_properties))):
+                on_message(client, userdata, message)
+        return handler
+
     def disconnect(self):
         self.client.loop_stop()
         self.client.disconnect()
@@ -1,14 +1,17 @@
 from typing import Callable, Optional, Any, Dict
+import copy
 import threading
 import time
 import json
 import logging
 import pika
+from utils import traceutil
 
 # /d:/Projects/python/pmgin/mq/rabbit.py
 """
 轻量级 RabbitMQ (AMQP) 客户端封装（同步，基于 pika）
 包含：创建连接、发布消息、订阅消息（后台线程消费）、关闭连接
+启用 utils.traceutil 追踪时，发布与消费各记录一个 span，追踪上下文通过消息头 traceparent 传递
 """
 
 
@@ -146,31 +149,42 @@ class RabbitMQClient:
             if properties is None:
                 properties = pika.BasicProperties(content_type="application/json")
 
+        span = traceutil.start_span(f"rabbitmq publish {exchange or self.exchange}", "producer", {
+            "messaging.system": "rabbitmq", "messaging.destination.name": exchange or self.exchange,
+            "messaging.rabbitmq.destination.routing_key": routing_key or self.routing_key,
+            "messaging.message.body.size": len(payload),
+        })
+        if span.context is not None:
+            # 复制一份再写入 traceparent，不修改调用方传入的 properties
+            properties = copy.copy(properties) if properties is not None else pika.BasicProperties()
+            properties.headers = traceutil.inject(dict(properties.headers or {}), span.context)
+
         attempt = 0
         last_exc = None
-        while attempt <= retry:
-            try:
-                self._ensure_connected()
-                if declare_exchange and exchange:
-                    self._channel.exchange_declare(exchange=exchange, exchange_type=exchange_type, durable=durable)
-                self._channel.basic_publish(exchange=exchange or self.exchange, routing_key=routing_key or self.routing_key, body=payload, properties=properties)
-                return
-            except Exception as e:
-                last_exc = e
-                logger.warning("Publish failed (attempt %d): %s", attempt + 1, e)
-                # try to reconnect
+        with span:
+            while attempt <= retry:
                 try:
-                    self.close()
-                except Exception:
-                    pass
-                time.sleep(self._reconnect_interval)
-                try:
-                    self.connect()
-                except Exception:
-                    pass
-                attempt += 1
-        logger.error("Publish failed after %d attempts", retry + 1)
-        raise last_exc
+                    self._ensure_connected()
+                    if declare_exchange and exchange:
+                        self._channel.exchange_declare(exchange=exchange, exchange_type=exchange_type, durable=durable)
+                    self._channel.basic_publish(exchange=exchange or self.exchange, routing_key=routing_key or self.routing_key, body=payload, properties=properties)
+                    return
+                except Exception as e:
+                    last_exc = e
+                    logger.warning("Publish failed (attempt %d): %s", attempt + 1, e)
+                    # try to reconnect
+                    try:
+                        self.close()
+                    except Exception:
+                        pass
+                    time.sleep(self._reconnect_interval)
+                    try:
+                        self.connect()
+                    except Exception:
+                        pass
+                    attempt += 1
+            logger.error("Publish failed after %d attempts", retry + 1)
+            raise last_exc
 
     def subscribe(
         self,
@@ -222,7 +236,12 @@ class RabbitMQClient:
                                     payload = json.loads(body.decode("utf-8"))
                                 except Exception:
                                     pass
-                            callback(payload, properties, getattr(properties, "headers", {}) or {})
+                            headers = getattr(properties, "headers", {}) or {}
+                            with traceutil.start_span(f"rabbitmq process {queue}", "consumer", {
+                                "messaging.system": "rabbitmq", "messaging.destination.name": queue,
+                                "messaging.message.body.size": len(body),
+                            }, parent=traceutil.extract(headers)):
+                                callback(payload, properties, headers)
                             if not auto_ack:
                                 ch_inner.basic_ack(delivery_tag=method.delivery_tag)
                         except Exception as cb_exc:
@@ -3,8 +3,30 @@ from botocore.exceptions import ClientError
 from typing import List, Optional
 from datetime import timedelta
 import logging
+from utils import traceutil
 
 logger = logging.getLogger(__name__)
+
+
+def _trace_start(model, context, **kwargs):
+    context["trace_span"] = traceutil.start_span(f"s3 {model.name}", "client", {
+        "rpc.system": "aws-api", "rpc.service": "S3", "rpc.method": model.name,
+    })
+
+
+def _trace_end(context, http_response=None, exception=None, **kwargs):
+    span = context.pop("trace_span", None)
+    if span is None:
+        return
+    if http_response is not None:
+        span.set_attribute("http.response.status_code", http_response.status_code)
+        if http_response.status_code >= 400:
+            span.set_error(f"HTTP {http_response.status_code}")
+    if exception is not None:
+        span.set_error(exception)
+    span.end()
+
+
 class S3Manager:
     def __init__(self, access_key: str, secret_key: str, endpoint_url: str = None, region_name: str = 'us-east-1', bucket: str = 'default'):
         """初始化S3连接"""
@@ -15,6 +37,12 @@ class S3Manager:
             endpoint_url=endpoint_url,
             region_name=region_name
         )
+        if traceutil.enabled():
+            # 每次 API 调用（含分片上传的每个分片）记录为一个 client span
+            events = self.client.meta.events
+            events.register("before-call.s3.*", _trace_start)
+            events.register("after-call.s3.*", _trace_end)
+            events.register("after-call-error.s3.*", _trace_end)
         self.endpoint_url = endpoint_url
         self.region_name = region_name
         self.bucket = bucket
@@ -0,0 +1,119 @@
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from types import SimpleNamespace
+from db.circuitBreaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from db.mongoClient import _BreakerListener, mongo
+
+
+def test_open_and_fail_fast():
+    breaker = CircuitBreaker(name="test", failure_threshold=2, base_delay=10)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    try:
+        breaker.check()
+        assert False, "熔断期间应抛出 CircuitOpenError"
+    except CircuitOpenError as e:
+        assert e.retry_after > 0
+
+
+def test_half_open_single_probe():
+    breaker = CircuitBreaker(name="test", failure_threshold=1, base_delay=0.05, jitter=0)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    # 探测进行中，其余调用继续快速失败
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_probe_failure_doubles_backoff():
+    breaker = CircuitBreaker(name="test", failure_threshold=1, base_delay=0.05, max_delay=1, jitter=0)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert 0.05 < breaker.retry_after() <= 0.1
+
+
+def _topology(readable):
+    return SimpleNamespace(has_readable_server=lambda: readable)
+
+
+def _changed(listener, previous, new):
+    listener.description_changed(SimpleNamespace(previous_description=_topology(previous),
+                                                 new_description=_topology(new)))
+
+
+def test_mongo_listener_dead_secondary():
+    breaker = CircuitBreaker(name="mongo", failure_threshold=3, base_delay=10)
+    listener = _BreakerListener(breaker)
+    _changed(listener, False, True)
+    # 主节点健康，一个从节点持续心跳失败，不应熔断
+    for _ in range(10):
+        listener.succeeded(SimpleNamespace(connection_id=("primary", 27017)))
+        listener.failed(SimpleNamespace(connection_id=("secondary", 27017)))
+    assert breaker.state == CLOSED
+    # 所有可读节点都不可用时立即熔断
+    _changed(listener, True, False)
+    assert breaker.state == OPEN
+    _changed(listener, False, True)
+    assert breaker.state == CLOSED
+
+
+def test_mongo_listener_unreachable_at_start():
+    breaker = CircuitBreaker(name="mongo", failure_threshold=3, base_delay=10)
+    listener = _BreakerListener(breaker)
+    for _ in range(3):
+        listener.failed(SimpleNamespace(connection_id=("primary", 27017)))
+    assert breaker.state == OPEN
+
+
+def test_mongo_half_open_probe():
+    class FakeDb:
+        ok = False
+
+        def command(self, name):
+            if not self.ok:
+                raise ConnectionError("unreachable")
+
+        def __getitem__(self, name):
+            return name
+
+    client = mongo.__new__(mongo)
+    client.breaker = CircuitBreaker(name="mongo", failure_threshold=1, base_delay=0.05, jitter=0)
+    client.db = FakeDb()
+    client.breaker.record_failure()
+    time.sleep(0.06)
+    # 探测失败：重新熔断
+    try:
+        client.get_collection("log")
+        assert False, "探测失败应抛出 CircuitOpenError"
+    except CircuitOpenError:
+        pass
+    assert client.breaker.state == OPEN
+    time.sleep(0.11)
+    client.db.ok = True
+    assert client.get_collection("log") == "log"
+    assert client.breaker.state == CLOSED
+
+
+if __name__ == "__main__":
+    test_open_and_fail_fast()
+    test_half_open_single_probe()
+    test_probe_failure_doubles_backoff()
+    test_mongo_listener_dead_secondary()
+    test_mongo_listener_unreachable_at_start()
+    test_mongo_half_open_probe()
+    print("ok")
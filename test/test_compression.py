@@ -0,0 +1,154 @@
+import sys
+import os
+import asyncio
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from middleware.compression import CompressionMiddleware, parse_accept_encoding, select_encoding
+from models import Result
+from utils import ziputil
+
+ROWS = [{"id": i, "name": f"商品{i}", "price": i * 1.5} for i in range(200)]
+
+
+def make_app(**kwargs):
+    api = FastAPI()
+    api.add_middleware(CompressionMiddleware, config={}, **kwargs)
+
+    @api.get("/rows")
+    def rows():
+        return Result.success(data=ROWS).response(headers={"ETag": '"abc"'})
+
+    @api.get("/small")
+    def small():
+        return Result.success(data="ok").response()
+
+    @api.get("/png")
+    def png():
+        return Response(b"\x89PNG" + b"\0" * 2000, media_type="image/png")
+
+    @api.get("/range")
+    def partial():
+        body = Result.success(data=ROWS).to_bytes()[:1000]
+        return Response(body, status_code=206, media_type="application/json",
+                        headers={"Content-Range": f"bytes 0-999/{len(body) * 10}"})
+
+    @api.get("/range-header")
+    def range_header():
+        # 非 206 但带 Content-Range（如 416 或上游透传）同样不压缩
+        return Response(b"x" * 1000, media_type="text/plain", headers={"Content-Range": "bytes */1000"})
+
+    @api.get("/export")
+    def export():
+        return Result.success_stream(iter(ROWS), batch_size=50, page_index=1, page_size=0)
+
+    return api
+
+
+def test_select_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.8, zstd;q=0") == {"gzip": 1.0, "br": 0.8, "zstd": 0.0}
+    assert select_encoding("gzip, deflate, br, zstd", ["zstd", "br", "gzip"]) == "zstd"
+    assert select_encoding("gzip;q=1, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert select_encoding("*", ["gzip"]) == "gzip"
+    assert select_encoding("gzip;q=0, identity", ["gzip"]) is None
+    assert select_encoding("deflate", ["gzip"]) is None
+
+
+def test_ziputil_roundtrip():
+    data = Result.success(data=ROWS).to_bytes()
+    for encoding in ziputil.available_encodings():
+        assert ziputil.decompress_as(ziputil.compress_as(data, encoding), encoding) == data
+        stream = ziputil.StreamCompressor(encoding, 1)
+        out = b"".join(stream.compress(data[i:i + 1000]) for i in range(0, len(data), 1000)) + stream.finish()
+        assert ziputil.decompress_as(out, encoding) == data
+    assert ziputil.decompress(ziputil.compress(data, level=1)) == data
+
+
+def test_compress_response():
+    client = TestClient(make_app())
+    plain = Result.success(data=ROWS).to_bytes()
+    resp = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["vary"] == "Accept-Encoding"
+    assert resp.headers["etag"] == 'W/"abc"'
+    assert int(resp.headers["content-length"]) < len(plain) // 3
+    assert resp.content == plain
+    # 不接受压缩
+    resp = client.get("/rows", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers and resp.headers["etag"] == '"abc"'
+
+
+def test_skip_small_and_binary():
+    client = TestClient(make_app())
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/png", headers={"Accept-Encoding": "gzip"}).headers
+    # 阈值可配置
+    client = TestClient(make_app(minimum_size=10))
+    assert client.get("/small", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+
+
+def test_skip_partial_content():
+    client = TestClient(make_app())
+    resp = client.get("/range", headers={"Accept-Encoding": "gzip", "Range": "bytes=0-999"})
+    assert resp.status_code == 206 and "content-encoding" not in resp.headers
+    assert resp.headers["content-length"] == "1000" and resp.headers["content-range"].startswith("bytes 0-999/")
+    resp = client.get("/range-header", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers and resp.content == b"x" * 1000
+
+
+def test_compress_stream():
+    client = TestClient(make_app())
+    resp = client.get("/export", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip" and "content-length" not in resp.headers
+    assert resp.json()["data"] == ROWS and resp.json()["page"]["total"] == len(ROWS)
+
+
+def test_threadpool_and_large_levels():
+    client = TestClient(make_app(threadpool_size=100, large_size=100))
+    resp = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+    assert resp.content == Result.success(data=ROWS).to_bytes()
+
+
+if __name__ == "__main__":
+    # 各编码、级别的压缩率与耗时，以及中间件对单请求的开销
+    data = Result.success(data=ROWS * 50).to_bytes()
+    print(f"原始大小: {len(data)} 字节")
+    for encoding in ziputil.available_encodings():
+        for level in sorted({1, ziputil.DEFAULT_LEVELS[encoding], 9}):
+            start = time.perf_counter()
+            for _ in range(20):
+                out = ziputil.compress_as(data, encoding, level)
+            ms = (time.perf_counter() - start) / 20 * 1000
+            print(f"{encoding:<4} level {level}: {len(out):7d} 字节 ({len(out) / len(data):.1%}) {ms:6.2f} ms")
+
+    async def call(api, path, count):
+        # spec_version 2.4：StreamingResponse 不再监听断开，避免空转的 receive 阻塞事件循环
+        scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+                 "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+                 "query_string": b"",
+                 "headers": [(b"host", b"bench"), (b"accept-encoding", b"gzip, br, zstd")],
+                 "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        await api(dict(scope), receive, send)
+        start = time.perf_counter()
+        for _ in range(count):
+            await api(dict(scope), receive, send)
+        return (time.perf_counter() - start) / count * 1e6
+
+    plain = FastAPI()
+    plain.get("/rows")(lambda: Result.success(data=ROWS).response())
+    for name, api in (("无中间件", plain), ("压缩中间件", make_app())):
+        for path in ("/small", "/rows", "/export"):
+            if api is plain and path != "/rows":
+                continue
+            print(f"{name} {path}: {asyncio.run(call(api, path, 1000)):7.1f} us/请求")
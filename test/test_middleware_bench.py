@@ -0,0 +1,82 @@
+import sys
+import os
+import asyncio
+import logging
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from middleware.logpipeline import LogPipeline, CallbackSink
+from middleware.postlog import LoggingMiddleware, CapturePolicy
+
+"""
+中间件单请求开销基准：直接以 ASGI 方式调用应用，不经过网络与 HTTP 客户端
+"""
+
+
+class PassThroughMiddleware(BaseHTTPMiddleware):
+    """BaseHTTPMiddleware 对照组：什么都不做"""
+
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def make_app(*middlewares):
+    api = FastAPI()
+    for cls, kwargs in middlewares:
+        api.add_middleware(cls, **kwargs)
+
+    @api.get("/ping")
+    async def ping():
+        return {"code": 200, "msg": "success", "data": "pong"}
+
+    return api
+
+
+async def call(api, count):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"a=1",
+             "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await api(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(count):
+        await api(dict(scope), receive, send)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def test_logging_middleware_overhead():
+    # 冒烟：能够以纯 ASGI 方式完成请求
+    pipeline = LogPipeline(CallbackSink(lambda records: None))
+    api = make_app((LoggingMiddleware, dict(pipeline=pipeline, capture=CapturePolicy())))
+    assert asyncio.run(call(api, 10)) > 0
+    pipeline.close()
+    assert pipeline.stats()["written"] == 11
+
+
+if __name__ == "__main__":
+    # 部分模块以 DEBUG 级别配置了 root logger，基准只测量日志管道本身
+    logging.getLogger("middleware.postlog").setLevel(logging.INFO)
+    count = 5000
+    pipeline = LogPipeline(CallbackSink(lambda records: None), max_queue=count * 10)
+    cases = [
+        ("无中间件", make_app()),
+        ("BaseHTTPMiddleware 空实现", make_app((PassThroughMiddleware, {}))),
+        ("LoggingMiddleware (ASGI)", make_app((LoggingMiddleware, dict(pipeline=pipeline, capture=CapturePolicy())))),
+        ("LoggingMiddleware 采样 0", make_app((LoggingMiddleware, dict(pipeline=pipeline, capture=CapturePolicy(sample=0))))),
+    ]
+    base = None
+    for name, api in cases:
+        us = asyncio.run(call(api, count))
+        base = us if base is None else base
+        print(f"{name:<28}: {us:7.1f} us/请求 (+{us - base:.1f} us)")
+    pipeline.close()
@@ -0,0 +1,145 @@
+import sys
+import os
+import asyncio
+import time
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from pymongo import InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+from db.circuitBreaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN
+from db.mongoBulk import AsyncBulkWriter, BulkWriter
+from db.mongoClient import amongo, mongo
+
+
+class FakeCollection:
+    """记录 bulk_write 调用，error 为下一次调用要抛出的异常"""
+
+    name = "log"
+
+    def __init__(self):
+        self.batches = []
+        self.error = None
+
+    def with_options(self, write_concern=None):
+        self.write_concern = write_concern
+        return self
+
+    def _write(self, ops, ordered):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        self.batches.append((list(ops), ordered))
+        inserted = sum(isinstance(op, InsertOne) for op in ops)
+        return SimpleNamespace(acknowledged=True, inserted_count=inserted, upserted_count=len(ops) - inserted,
+                               modified_count=0)
+
+    def bulk_write(self, ops, ordered=True):
+        return self._write(ops, ordered)
+
+
+class AsyncFakeCollection(FakeCollection):
+    async def bulk_write(self, ops, ordered=True):
+        return self._write(ops, ordered)
+
+
+def test_flush_on_max_ops():
+    coll = FakeCollection()
+    writer = BulkWriter(coll, max_ops=3, max_age=60, w=1)
+    for i in range(7):
+        writer.insert({"n": i})
+    assert [len(ops) for ops, _ in coll.batches] == [3, 3]
+    assert coll.batches[0][1] is False
+    assert coll.write_concern.document == {"w": 1}
+    writer.close()
+    assert [len(ops) for ops, _ in coll.batches] == [3, 3, 1]
+    stats = writer.stats()
+    assert stats["written"] == stats["inserted"] == 7 and stats["pending"] == 0 and stats["flushes"] == 3
+
+
+def test_flush_on_max_age():
+    coll = FakeCollection()
+    with BulkWriter(coll, max_ops=1000, max_age=0.05) as writer:
+        writer.insert({"n": 1})
+        writer.upsert({"_id": "u1"}, {"$inc": {"hits": 1}})
+        writer.upsert({"_id": "u2"}, {"hits": 1})
+        time.sleep(0.2)
+        assert len(coll.batches) == 1
+    ops = coll.batches[0][0]
+    assert isinstance(ops[0], InsertOne) and isinstance(ops[1], UpdateOne) and isinstance(ops[2], ReplaceOne)
+
+
+def test_write_errors():
+    coll = FakeCollection()
+    writer = BulkWriter(coll, max_ops=1000, max_age=60)
+    for i in range(3):
+        writer.insert({"_id": i})
+    coll.error = BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "duplicate key"}], "nInserted": 2})
+    writer.flush()
+    writer.insert({"_id": 9})
+    coll.error = AutoReconnect("connection reset")
+    writer.flush()
+    stats = writer.stats()
+    assert stats["written"] == 2 and stats["write_errors"] == 1
+    assert stats["failed_batches"] == 1 and stats["lost"] == 1
+    writer.close()
+
+
+def test_async_writer():
+    coll = AsyncFakeCollection()
+
+    async def run():
+        writer = AsyncBulkWriter(coll, max_ops=2, max_age=0.05)
+        for i in range(3):
+            await writer.insert({"n": i})
+        assert len(coll.batches) == 1
+        await asyncio.sleep(0.2)
+        assert len(coll.batches) == 2
+        await writer.insert({"n": 3})
+        await writer.close()
+        return writer.stats()
+
+    stats = asyncio.run(run())
+    assert stats["written"] == 4 and len(coll.batches) == 3
+
+
+def test_client_closes_writers():
+    client = mongo.__new__(mongo)
+    client.breaker = CircuitBreaker(name="mongo")
+    client._writers = set()
+    client.db = {"log": FakeCollection()}
+    writer = client.bulk_writer("log", max_age=60)
+    writer.insert({"n": 1})
+    # 应用关闭时提交剩余数据
+    client.close_writers()
+    assert writer.stats()["written"] == 1 and not writer._thread.is_alive()
+
+
+def test_async_half_open_probe():
+    class FakeClient:
+        readable = False
+
+        @property
+        def topology_description(self):
+            return SimpleNamespace(has_readable_server=lambda: self.readable)
+
+        def __getitem__(self, name):
+            return {"log": AsyncFakeCollection()}
+
+    client = amongo("mongodb://127.0.0.1:1", "test", breaker=CircuitBreaker("amongo", 1, base_delay=0.01, jitter=0))
+    client._client = FakeClient()
+    client.breaker.record_failure()
+    time.sleep(0.02)
+    # 拓扑中没有可读节点：探测失败，重新熔断
+    try:
+        client.get_collection("log")
+        assert False, "探测失败应抛出 CircuitOpenError"
+    except CircuitOpenError:
+        pass
+    assert client.breaker.state == OPEN
+    time.sleep(0.03)
+    client._client.readable = True
+    assert isinstance(client.get_collection("log"), AsyncFakeCollection)
+    assert client.breaker.state == CLOSED
@@ -0,0 +1,45 @@
+import sys
+import os
+import json
+import time
+import datetime
+from decimal import Decimal
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from bson import ObjectId, Decimal128
+from db.mongoExport import dumps_line
+
+
+def test_dumps_line():
+    oid = ObjectId()
+    line = dumps_line({"_id": oid, "at": datetime.datetime(2024, 1, 2, 3, 4, 5), "price": Decimal128("9.90"),
+                       "qty": Decimal("3"), "name": "测试"})
+    assert line.endswith(b"\n")
+    assert json.loads(line) == {"_id": str(oid), "at": "2024-01-02T03:04:05", "price": 9.9, "qty": 3, "name": "测试"}
+
+
+if __name__ == "__main__":
+    test_dumps_line()
+    # 需要本地 MongoDB
+    from db.mongoClient import mongo
+    mgo = mongo("mongodb://127.0.0.1:27017", "test")
+    coll = mgo.get_collection("export_bench")
+    coll.drop()
+    for _ in range(20):
+        coll.insert_many([{"n": i, "payload": "x" * 512, "tags": list(range(20))} for i in range(10000)])
+    total = coll.count_documents({})
+
+    start = time.perf_counter()
+    assert len(list(coll.find())) == total
+    print(f"find() 全字段         : {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    assert sum(len(b) for b in mgo.iter_batches("export_bench", projection={"n": 1}, batch_size=5000)) == total
+    print(f"iter_batches 投影     : {time.perf_counter() - start:.2f}s")
+    for partitions in (1, 4):
+        start = time.perf_counter()
+        assert mgo.export("export_bench", "/tmp/export_bench.jsonl", partitions=partitions, batch_size=2000) == total
+        print(f"export 分区 {partitions}          : {time.perf_counter() - start:.2f}s")
+    coll.drop()
+    mgo.close()
@@ -0,0 +1,53 @@
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from db.mongoProfiler import query_shape, suggest_index, _plan_stages, _Stats
+
+
+def test_query_shape():
+    a = query_shape({"status": 1, "shop": "s1", "ts": {"$gte": 10}, "$or": [{"a": 1}, {"b": 2}]})
+    b = query_shape({"ts": {"$gte": 99}, "shop": "s2", "status": 3, "$or": [{"a": 5}, {"b": 6}]})
+    assert a == b
+    assert a["ts"] == {"$gte": "?"} and query_shape({"id": {"$in": [1, 2]}}) == {"id": {"$in": "?"}}
+
+
+def test_suggest_index():
+    keys = suggest_index({"ts": {"$gte": 1}, "shop": "s1", "status": 1}, sort={"created": -1})
+    assert keys == [("shop", 1), ("status", 1), ("created", -1), ("ts", 1)]
+
+
+def test_plan_and_histogram():
+    plan = {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "COLLSCAN"}},
+                             "rejectedPlans": [{"stage": "IXSCAN", "indexName": "a_1"}]}}
+    found = _plan_stages(plan, dict(stages=[], indexes=[]))
+    assert found == {"stages": ["FETCH", "COLLSCAN"], "indexes": []}
+    stats = _Stats({}, None)
+    for ms in [0.5] * 90 + [30] * 9 + [700]:
+        stats.add(ms)
+    assert stats.percentile(0.5) == 1 and stats.percentile(0.95) == 50 and stats.percentile(0.999) == 700
+
+
+if __name__ == "__main__":
+    test_query_shape()
+    test_suggest_index()
+    test_plan_and_histogram()
+    # 需要本地 MongoDB
+    import json
+    from db.mongoClient import mongo
+    from db.mongoProfiler import QueryProfiler
+    profiler = QueryProfiler(slow_ms=50, sample_rate=1)
+    mgo = mongo("mongodb://127.0.0.1:27017", "test", profiler=profiler)
+    coll = mgo.get_collection("profiler_test")
+    coll.drop()
+    coll.insert_many([{"shop": f"s{i % 50}", "status": i % 3, "ts": i} for i in range(50000)])
+    for i in range(20):
+        list(coll.find({"shop": f"s{i}", "status": 1}).sort("ts", -1).limit(10))
+    import time
+    time.sleep(1)
+    print(json.dumps(profiler.report(5), indent=2, ensure_ascii=False))
+    print(profiler.suggestions())
+    coll.drop()
+    mgo.close()
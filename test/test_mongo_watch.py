@@ -0,0 +1,119 @@
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from types import SimpleNamespace
+import fakeredis
+from pymongo.errors import OperationFailure
+from db.mongoWatch import ChangeStreamListener, MaterializedView
+from db.redisCache import LocalCache
+
+
+def test_materialized_view():
+    view = MaterializedView("stock_by_shop", group_by="shop", sums={"stock": "stock"})
+    view.rebuild([{"_id": 1, "shop": "a", "stock": 3}, {"_id": 2, "shop": "a", "stock": 4}, {"_id": 3, "shop": "b", "stock": 1}])
+    assert view.get("a") == {"count": 2, "stock": 7}
+    # 更新：文档从 a 移到 b
+    view.upsert(2, {"_id": 2, "shop": "b", "stock": 5})
+    assert view.get("a") == {"count": 1, "stock": 3}
+    assert view.get("b") == {"count": 2, "stock": 6}
+    # 删除后空组被移除，重复删除无影响
+    view.upsert(1, None)
+    view.upsert(1, None)
+    assert view.get("a") is None
+    assert view.rows() == {"b": {"count": 2, "stock": 6}}
+
+
+def test_materialized_view_match():
+    view = MaterializedView("paid", group_by="user.id", sums={"amount": "amount"}, match=lambda d: d.get("paid"))
+    view.upsert("o1", {"user": {"id": 7}, "amount": 10, "paid": False})
+    assert view.get(7) is None
+    view.upsert("o1", {"user": {"id": 7}, "amount": 10, "paid": True})
+    assert view.get(7) == {"count": 1, "amount": 10}
+
+
+class FakeCollection:
+    """watch() 依次抛出 errors 中的异常，全部抛出后停止监听"""
+
+    name = "goods"
+    database = SimpleNamespace(name="test")
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.listener = None
+
+    def watch(self, *args, **kwargs):
+        if len(self.errors) == 1:
+            self.listener._stop.set()
+        raise self.errors.pop(0)
+
+
+def make_listener(*errors):
+    coll = FakeCollection(*errors)
+    listener = coll.listener = ChangeStreamListener(coll, reconnect_interval=0)
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    for i in range(1200):
+        redis.set(f"goods:{i}", i)
+    redis.set("goods:*:detail", 1)
+    redis.set("orders:1", 1)
+    cache = LocalCache()
+    cache.set("1", {"stale": True})
+    listener.invalidate(cache).invalidate_redis(redis, "goods:{_id}")
+    return listener, redis, cache
+
+
+def test_redis_keys_invalidated_on_drop():
+    listener, redis, cache = make_listener()
+    listener._dispatch({"operationType": "update", "documentKey": {"_id": 7}})
+    assert redis.get("goods:7") is None and redis.get("goods:8") == "8"
+    listener._dispatch({"operationType": "drop"})
+    # 模板中 {_id} 以外的部分按字面匹配
+    assert redis.keys("goods:*") == [] and redis.get("orders:1") == "1"
+    assert "1" not in cache
+
+
+def test_resync_by_error_code():
+    listener, redis, cache = make_listener(OperationFailure("history lost", code=286),
+                                           OperationFailure("resume token not usable", code=260),
+                                           OperationFailure("resume point may no longer be in the oplog", code=2))
+    listener._run()
+    # 只按错误码判断，消息中含 resume 的其他错误按普通中断重连
+    assert listener.stats["resyncs"] == 2 and listener.stats["errors"] == 1
+    assert redis.dbsize() == 1 and "1" not in cache
+
+
+def test_redis_pattern_escapes_literals():
+    listener, redis, cache = make_listener()
+    redis.set("shop[1]:9:detail", 1)
+    redis.set("shop1:9:detail", 1)
+    listener.invalidate_redis(redis, "shop[1]:{_id}:detail")
+    listener._resync(RuntimeError("test"))
+    assert redis.get("shop[1]:9:detail") is None and redis.get("shop1:9:detail") == "1"
+
+
+if __name__ == "__main__":
+    test_materialized_view()
+    test_materialized_view_match()
+    # 需要 MongoDB 副本集
+    from db.mongoClient import mongo
+    from db.redisCache import LocalCache
+    mgo = mongo("mongodb://127.0.0.1:27017/?replicaSet=rs0", "test")
+    coll = mgo.get_collection("watch_test")
+    coll.drop()
+    coll.insert_many([{"_id": i, "shop": f"s{i % 3}", "stock": i} for i in range(30)])
+    cache = LocalCache()
+    cache.set("1", {"stale": True})
+    listener = mgo.watch("watch_test", resume_dir="/tmp/pmf-resume")
+    listener.invalidate(cache)
+    view = listener.materialize("stock_by_shop", group_by="shop", sums={"stock": "stock"})
+    listener.start(wait=10)
+    coll.update_one({"_id": 1}, {"$set": {"shop": "s0", "stock": 100}})
+    time.sleep(1)
+    assert "1" not in cache
+    print(view.rows(), listener.stats)
+    listener.stop()
+    coll.drop()
+    mgo.close()
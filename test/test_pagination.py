@@ -0,0 +1,150 @@
+import sys
+import os
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+import pytest
+from bson import ObjectId
+from sqlalchemy import Column, DateTime, Integer, Numeric, String, create_engine, func, insert, select
+from sqlalchemy.orm import Session, declarative_base
+from db.pagination import CursorError, decode_cursor, encode_cursor, paginate_sql, _mongo_keys, _mongo_seek, _seek_clause
+from db.redisCache import LocalCache
+from models import Result
+
+Base = declarative_base()
+
+
+class Order(Base):
+    __tablename__ = "orders"
+    id = Column(Integer, primary_key=True)
+    shop_id = Column(Integer, index=True)
+    amount = Column(Numeric(10, 2))
+    created_at = Column(DateTime)
+    name = Column(String(32))
+
+
+def make_engine(n):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Order), [dict(id=i, shop_id=i % 3, amount=Decimal(i % 7), name=f"o{i}",
+                                          created_at=start + timedelta(minutes=i // 2)) for i in range(1, n + 1)])
+    return engine
+
+
+def walk(executor, stmt, order_by, size, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page = paginate_sql(executor, stmt, order_by, size=size, cursor=cursor, **kwargs)
+        pages.append(page)
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    values = [datetime(2025, 1, 2, 3, 4, 5), Decimal("1.50"), ObjectId(), 7, "a", None]
+    assert decode_cursor(encode_cursor(values), len(values)) == values
+    with pytest.raises(CursorError):
+        decode_cursor("not-a-cursor!", 1)
+    with pytest.raises(CursorError):
+        decode_cursor(encode_cursor([1, 2]), 3)
+
+
+def test_sql_keyset_pages():
+    engine = make_engine(25)
+    stmt = select(Order.id, Order.created_at).where(Order.shop_id != 0)
+    expected = [r.id for r in engine.connect().execute(stmt.order_by(Order.created_at.desc(), Order.id.desc()))]
+    with engine.connect() as conn:
+        # 方向一致；重复的 created_at 由 id 区分
+        pages = walk(conn, stmt, [Order.created_at.desc(), (Order.id, "desc")], size=4, total="exact")
+        assert [r.id for p in pages for r in p.items] == expected
+        assert all(p.total == len(expected) for p in pages) and pages[-1].next_cursor is None
+        # 方向混合：OR 展开
+        pages = walk(conn, select(Order.id, Order.amount), [(Order.amount, "desc"), Order.id], size=6)
+        ids = [r.id for p in pages for r in p.items]
+        assert ids == [r.id for r in conn.execute(select(Order.id).order_by(Order.amount.desc(), Order.id))]
+        assert pages[0].total is None
+
+
+def test_sql_orm_entities_and_cached_total():
+    engine = make_engine(10)
+    cache = LocalCache()
+    with Session(engine) as session:
+        page = paginate_sql(session, select(Order), [Order.id], size=4, total="cached", cache=cache)
+        assert [o.id for o in page.items] == [1, 2, 3, 4] and page.total == 10
+        session.add(Order(id=11, shop_id=1))
+        session.flush()
+        page = paginate_sql(session, select(Order), [Order.id], size=4, cursor=page.next_cursor,
+                            total="cached", cache=cache)
+        # 总数来自缓存
+        assert [o.id for o in page.items] == [5, 6, 7, 8] and page.total == 10
+        body = json.loads(Result.success_cursor(page).to_bytes())
+        assert body["page"] == {"size": 4, "next_cursor": page.next_cursor, "total": 10}
+        assert body["data"][0]["name"] == "o5"
+
+
+def test_mongo_seek_filter():
+    keys = _mongo_keys([("created_at", -1)])
+    assert keys == [("created_at", -1), ("_id", -1)]
+    oid = ObjectId()
+    # 降序时 null/缺失字段排在最后
+    assert _mongo_seek(keys, [1, oid]) == {"$or": [{"$or": [{"created_at": {"$lt": 1}}, {"created_at": None}]},
+                                                   {"created_at": 1, "_id": {"$lt": oid}}]}
+    assert _mongo_seek(keys, [None, oid]) == {"created_at": None, "_id": {"$lt": oid}}
+    assert _mongo_seek(_mongo_keys(None), [oid]) == {"_id": {"$gt": oid}}
+    # 升序时 null 排在最前
+    keys = _mongo_keys([("created_at", 1)])
+    assert _mongo_seek(keys, [None, oid]) == {"$or": [{"created_at": {"$ne": None}},
+                                                      {"created_at": None, "_id": {"$gt": oid}}]}
+    assert _mongo_seek(keys, [1, oid]) == {"$or": [{"created_at": {"$gt": 1}}, {"created_at": 1, "_id": {"$gt": oid}}]}
+
+
+def test_sql_null_sort_values():
+    engine = make_engine(30)
+    with engine.begin() as conn:
+        conn.execute(Order.__table__.update().where(Order.id % 4 == 0).values(created_at=None))
+        conn.execute(Order.__table__.update().where(Order.id % 5 == 0).values(amount=None))
+    stmt = select(Order.id, Order.created_at, Order.amount)
+    with engine.connect() as conn:
+        # SQLite 与 MySQL 一样把 NULL 视为最小值
+        for order_by in ([Order.created_at.asc(), Order.id.asc()], [Order.created_at.desc(), Order.id.desc()],
+                         [Order.amount.desc(), Order.id.asc()], [Order.amount.asc(), Order.id.desc()]):
+            expected = [r.id for r in conn.execute(stmt.order_by(*order_by))]
+            for size in (1, 3, 7):
+                pages = walk(conn, stmt, order_by, size=size)
+                assert [r.id for p in pages for r in p.items] == expected
+
+
+def test_sql_row_value_only_for_not_null():
+    clause = str(_seek_clause([(Order.id, True)], [5]).compile())
+    assert "IS NULL" not in clause
+    # 可空列降序时 NULL 排在最后，需要额外的 IS NULL 条件
+    clause = str(_seek_clause([(Order.created_at, True), (Order.id, True)], [datetime(2025, 1, 1), 5]).compile())
+    assert "orders.created_at IS NULL" in clause
+    clause = str(_seek_clause([(Order.created_at, True), (Order.id, True)], [None, 5]).compile())
+    assert clause == "orders.created_at IS NULL AND orders.id < :id_1"
+
+
+if __name__ == "__main__":
+    # 深分页：OFFSET + COUNT(*) 与键集分页对比（SQLite，结论与 MySQL 一致）
+    n, size = 200000, 20
+    engine = make_engine(n)
+    stmt = select(Order.id, Order.name)
+    with engine.connect() as conn:
+        for page_no in (1, 100, 5000, 9999):
+            start = time.perf_counter()
+            conn.execute(stmt.order_by(Order.id).limit(size).offset((page_no - 1) * size)).all()
+            conn.execute(select(func.count()).select_from(Order)).scalar_one()
+            t_offset = (time.perf_counter() - start) * 1000
+            cursor = encode_cursor([(page_no - 1) * size])
+            start = time.perf_counter()
+            paginate_sql(conn, stmt, [Order.id], size=size, cursor=cursor if page_no > 1 else None)
+            t_keyset = (time.perf_counter() - start) * 1000
+            print(f"第 {page_no:>5} 页: OFFSET+COUNT {t_offset:7.2f} ms, 键集 {t_keyset:6.2f} ms")
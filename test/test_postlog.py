@@ -0,0 +1,94 @@
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from middleware.logpipeline import LogPipeline, CallbackSink
+from middleware.postlog import LoggingMiddleware, CapturePolicy
+from models import Result
+
+
+def make_app(pipeline, capture=None):
+    api = FastAPI()
+    api.add_middleware(LoggingMiddleware, pipeline=pipeline, capture=capture or CapturePolicy())
+
+    @api.get("/echo")
+    def echo(q: str = ""):
+        return Result.success(data={"q": q}).to_dict()
+
+    @api.post("/echo")
+    def echo_body(body: dict):
+        return Result.success(data=body).to_dict()
+
+    @api.get("/stream")
+    def stream():
+        return StreamingResponse((b"x" * 1000 for _ in range(100)), media_type="text/plain")
+
+    @api.get("/download")
+    def download():
+        return StreamingResponse((b"\0" * 1000 for _ in range(100)), media_type="application/octet-stream")
+
+    return api
+
+
+def test_pipeline_batches_and_drops():
+    batches = []
+    pipeline = LogPipeline(CallbackSink(batches.append), max_queue=5, batch_size=2, flush_interval=0.05)
+    # 先占满队列，sink 线程来不及消费的部分被丢弃
+    results = [pipeline.submit({"i": i}) for i in range(100)]
+    pipeline.close()
+    stats = pipeline.stats()
+    assert stats["submitted"] + stats["dropped"] == 100
+    assert stats["written"] == stats["submitted"] == sum(results)
+    assert all(len(b) <= 2 for b in batches)
+
+
+def test_middleware_submits_record():
+    records = []
+    pipeline = LogPipeline(CallbackSink(records.extend), flush_interval=0.05)
+    with TestClient(make_app(pipeline)) as client:
+        assert client.get("/echo", params={"q": "hi"}).json()["data"] == {"q": "hi"}
+    pipeline.close()
+    assert len(records) == 1
+    record = records[0]
+    assert record["uri"] == "/echo" and record["status"] == 200
+    assert record["query"] == {"q": "hi"}
+    assert record["response_body"]["data"] == {"q": "hi"}
+
+
+def test_capture_caps_and_sampling():
+    records = []
+    pipeline = LogPipeline(CallbackSink(records.extend), flush_interval=0.05)
+    capture = CapturePolicy(max_bytes=64, routes=(("/download", 0.0),))
+    with TestClient(make_app(pipeline, capture)) as client:
+        assert client.post("/echo", json={"k": "v"}).json()["data"] == {"k": "v"}
+        assert len(client.post("/echo", json={"k": "v" * 200}).content) > 200
+        assert len(client.get("/stream").content) == 100000
+        assert len(client.get("/download").content) == 100000
+    pipeline.close()
+    small, large, streamed = records
+    assert small["request_body"] == {"k": "v"} and small["response_body"]["data"] == {"k": "v"}
+    assert large["request_body"].endswith("bytes]") and large["request_size"] > 200
+    assert large["response_body"].endswith("bytes]")
+    # 流式响应完整透传，日志只保留前 64 字节
+    assert streamed["response_size"] == 100000
+    assert streamed["response_body"] == "x" * 64 + "...[truncated, 100000 bytes]"
+
+
+if __name__ == "__main__":
+    test_pipeline_batches_and_drops()
+    test_middleware_submits_record()
+    test_capture_caps_and_sampling()
+    pipeline = LogPipeline(CallbackSink(lambda records: None), max_queue=100000)
+    count = 100000
+    start = time.perf_counter()
+    for i in range(count):
+        pipeline.submit({"uri": "/api", "i": i})
+    elapsed = time.perf_counter() - start
+    print(f"submit: {elapsed / count * 1e6:.2f} us/条, 统计 {pipeline.stats()}")
+    pipeline.close()
@@ -0,0 +1,78 @@
+import sys
+import os
+import tempfile
+import timeit
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from sqlalchemy import text
+from db.mysqlClient import mysql, rows_to_dicts, rows_to_columns, rows_to_json
+
+SQL = "SELECT id, channel_id, channel_name FROM pay_channel WHERE channel_id = :channel_id AND type = :type"
+
+
+def new_client() -> mysql:
+    # 使用 SQLite 文件库代替 MySQL，只比较 pmf 侧的语句处理开销
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    client = mysql(uri=f"sqlite:///{path}", pool_size=2, max_overflow=2)
+    with client.get_engine().begin() as conn:
+        conn.execute(text("CREATE TABLE pay_channel (id INTEGER PRIMARY KEY, channel_id TEXT, channel_name TEXT, type TEXT)"))
+        conn.execute(text("INSERT INTO pay_channel (channel_id, channel_name, type) VALUES ('wx', '微信', 'online'), ('ali', '支付宝', 'online')"))
+    client.register_query("channel_by_id", SQL)
+    return client
+
+
+def test_registry_matches_text():
+    client = new_client()
+    params = {"channel_id": "wx", "type": "online"}
+    session = client.get_session()
+    try:
+        expected = session.execute(text(SQL), params).first()
+        actual = client.query("channel_by_id", params, session=session).first()
+    finally:
+        session.close()
+    assert actual._asdict() == expected._asdict()
+    assert client.query("channel_by_id", params).first()._asdict() == expected._asdict()
+    client.close()
+
+
+def test_registry_missing_param():
+    client = new_client()
+    try:
+        client.query("channel_by_id", {"channel_id": "wx"})
+        assert False, "缺少参数时应抛出 KeyError"
+    except KeyError:
+        pass
+    client.close()
+
+
+if __name__ == "__main__":
+    client = new_client()
+    params = {"channel_id": "wx", "type": "online"}
+    number = 20000
+    with client.get_engine().connect() as conn:
+        t_text = timeit.timeit(lambda: conn.execute(text(SQL), params).first(), number=number)
+        t_registry = timeit.timeit(lambda: client.queries.execute(conn, "channel_by_id", params).first(), number=number)
+    print(f"text() 每次构造: {t_text / number * 1e6:.2f} us/次")
+    print(f"QueryRegistry : {t_registry / number * 1e6:.2f} us/次")
+    print(f"每次调用节省  : {(t_text - t_registry) / number * 1e6:.2f} us ({(1 - t_registry / t_text) * 100:.1f}%)")
+
+    # 整体转换 vs 逐行 _asdict()
+    rows = [(i, f"ch{i}", f"渠道{i}", "online") for i in range(5000)]
+    with client.get_engine().begin() as conn:
+        conn.exec_driver_sql("INSERT INTO pay_channel (id, channel_id, channel_name, type) VALUES (?, ?, ?, ?)", [(i + 10, *r[1:]) for i, r in enumerate(rows)])
+    with client.get_engine().connect() as conn:
+        fetched = conn.execute(text("SELECT * FROM pay_channel")).all()
+    number = 200
+    t_asdict = timeit.timeit(lambda: [row._asdict() for row in fetched], number=number)
+    t_dicts = timeit.timeit(lambda: rows_to_dicts(fetched), number=number)
+    t_columns = timeit.timeit(lambda: rows_to_columns(fetched), number=number)
+    print(f"row._asdict() : {t_asdict / number * 1e3:.2f} ms/{len(fetched)}行")
+    print(f"rows_to_dicts : {t_dicts / number * 1e3:.2f} ms/{len(fetched)}行")
+    print(f"rows_to_columns: {t_columns / number * 1e3:.2f} ms/{len(fetched)}行")
+    t_json = timeit.timeit(lambda: rows_to_json(fetched), number=number)
+    t_split = timeit.timeit(lambda: rows_to_json(fetched, orient="split"), number=number)
+    print(f"rows_to_json records: {t_json / number * 1e3:.2f} ms/{len(fetched)}行")
+    print(f"rows_to_json split  : {t_split / number * 1e3:.2f} ms/{len(fetched)}行")
+    client.close()
@@ -0,0 +1,159 @@
+import sys
+import os
+import asyncio
+import math
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from redis import Redis, RedisError
+from db.redisClient import AsyncRedisClient
+from middleware.ratelimit import (_GCRA_LEASE_LUA, RateLimiter, RateLimitMiddleware, RatePolicy, client_ip,
+                                  parse_networks, request_key)
+
+
+class FakeScript:
+    """与 _GCRA_LEASE_LUA 相同的计算，时间由测试控制"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.tat = {}
+        self.wants = []
+
+    def __call__(self, keys, args):
+        interval, burst, want = float(args[0]), int(args[1]), int(args[2])
+        self.wants.append(want)
+        tat = max(self.tat.get(keys[0], self.now), self.now)
+        grant = min(want, math.floor((self.now + burst * interval - tat) / interval))
+        if grant <= 0:
+            return [0, math.ceil(tat + interval - self.now - burst * interval)]
+        self.tat[keys[0]] = tat + grant * interval
+        return [grant, 0]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.script = FakeScript()
+
+    def register_script(self, script):
+        return self.script
+
+
+def make_limiter(policies=(), default=None, **kwargs):
+    return RateLimiter(FakeRedis(), list(policies), default=default, **kwargs)
+
+
+def make_request(host, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "client": (host, 1234),
+                    "query_string": b""})
+
+
+def test_gcra_script():
+    # 需要本地 Redis，不可用时跳过
+    redis = Redis(socket_connect_timeout=0.2)
+    try:
+        redis.ping()
+    except RedisError:
+        pytest.skip("本地 Redis 不可用")
+    redis.delete("rl:test:gcra")
+    script = redis.register_script(_GCRA_LEASE_LUA)
+    # 每 100 毫秒一个令牌，突发量 5：申请 10 个只授予 5 个
+    assert script(keys=["rl:test:gcra"], args=[100, 5, 10]) == [5, 0]
+    granted, retry_ms = script(keys=["rl:test:gcra"], args=[100, 5, 1])
+    assert granted == 0 and 0 < retry_ms <= 100
+    assert 0 < redis.pttl("rl:test:gcra") <= 1500
+    redis.delete("rl:test:gcra")
+    redis.close()
+
+
+def test_async_cluster_client():
+    # redis.asyncio.RedisCluster 不是 redis.asyncio.Redis 的子类，仍需按协程调用脚本
+    client = AsyncRedisClient(mode="cluster", cluster_nodes="127.0.0.1:1")
+    limiter = RateLimiter(client, [], default=RatePolicy("default", rate=1, period=1, burst=2))
+    assert limiter.is_async
+    script = FakeScript()
+
+    async def run_script(keys, args):
+        return script(keys, args)
+
+    limiter.script = run_script
+    policy = limiter.default
+    results = asyncio.run(_acquire_many(limiter, policy, 3))
+    assert [allowed for allowed, _ in results] == [True, True, False]
+    assert limiter.stats["remote"] >= 2
+
+
+async def _acquire_many(limiter, policy, n):
+    return [await limiter.acquire_async(policy, "k") for _ in range(n)]
+
+
+def test_policy_validation():
+    with pytest.raises(ValueError):
+        RatePolicy.from_dict("bad", {"rate": 0})
+    with pytest.raises(ValueError):
+        RatePolicy("bad", rate=10, period=0)
+
+
+def test_match_path_segment():
+    order = RatePolicy("order", rate=10, path="/api/v1/order")
+    limiter = make_limiter([order, RatePolicy("api", rate=100, path="/api/")])
+    assert limiter.match("/api/v1/order") is order
+    assert limiter.match("/api/v1/order/1") is order
+    assert limiter.match("/api/v1/orders_export").name == "api"
+    assert limiter.match("/health") is None
+
+
+def test_lease_grows_for_hot_keys():
+    limiter = make_limiter(lease=8)
+    policy = RatePolicy("hot", rate=1000, period=60)
+    for _ in range(15):
+        assert limiter.acquire(policy, "rl:hot:-")[0]
+    # 首次只领取 1 个，每批用完后翻倍，不超过 lease
+    assert limiter.redis.script.wants == [1, 2, 4, 8]
+    assert limiter.stats["local"] == 15 - 4
+
+
+def test_lease_resets_for_cold_keys():
+    limiter = make_limiter(lease=8)
+    policy = RatePolicy("cold", rate=100, period=1)
+    limiter.acquire(policy, "rl:cold:1.2.3.4")
+    time.sleep(0.02)
+    # 上一批令牌的窗口已过，仍然只领取 1 个，不在 Redis 中占用整个突发量
+    limiter.acquire(policy, "rl:cold:1.2.3.4")
+    assert limiter.redis.script.wants == [1, 1]
+
+
+def test_client_ip_trusted_proxies():
+    proxies = parse_networks(["10.0.0.0/8"])
+    # 不可信的对端伪造 X-Forwarded-For 无效
+    assert client_ip(make_request("1.2.3.4", "6.6.6.6"), proxies) == "1.2.3.4"
+    assert client_ip(make_request("10.0.0.2", "1.2.3.4")) == "10.0.0.2"
+    # 可信代理：取从右往左第一个不可信的地址，客户端自带的值被忽略
+    assert client_ip(make_request("10.0.0.2", "6.6.6.6, 1.2.3.4, 10.0.0.9"), proxies) == "1.2.3.4"
+    policy = RatePolicy("default", rate=10)
+    assert request_key(make_request("10.0.0.2", "1.2.3.4"), policy, proxies) == "rl:default:1.2.3.4"
+    assert request_key(make_request("10.0.0.2"), RatePolicy("g", rate=10, key="global")) == "rl:g:-"
+
+
+def test_middleware_429():
+    limiter = make_limiter(default=RatePolicy("default", rate=1, period=60, burst=2))
+    api = FastAPI()
+    api.add_middleware(RateLimitMiddleware, limiter=limiter)
+
+    @api.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    client = TestClient(api)
+    assert client.get("/ping").status_code == 200
+    assert client.get("/ping").status_code == 200
+    resp = client.get("/ping")
+    assert resp.status_code == 429
+    assert resp.headers["retry-after"] == "60"
+    assert resp.json()["code"] == 429
+    assert limiter.stats["rejected"] == 1
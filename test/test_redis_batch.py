@@ -0,0 +1,106 @@
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+import fakeredis
+from db.redisClient import RedisClient
+
+
+class RecordingRedis(fakeredis.FakeRedis):
+    """记录每次 pipeline 提交的命令名，用于检查批次划分"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction=transaction, shard_hint=shard_hint)
+        execute = pipe.execute
+
+        def recorded_execute(*args, **kwargs):
+            self.batches.append([c[0][0] for c in pipe.command_stack])
+            return execute(*args, **kwargs)
+
+        pipe.execute = recorded_execute
+        return pipe
+
+
+def make_client(mode="standalone", batch_size=3):
+    client = RedisClient(batch_size=batch_size, mode=mode)
+    client._client = RecordingRedis(decode_responses=True)
+    return client
+
+
+def test_mget_many_keeps_order():
+    client = make_client()
+    data = {f"k:{i}": f"v{i}" for i in range(7)}
+    assert client.mset_many_with_ttl(data, ttl=60) == 7
+    assert client.ttl("k:0") > 0
+    keys = ["k:6", "missing", "k:0", "k:3", "k:1", "k:2", "k:4", "k:5"]
+    assert client.mget_many(keys) == ["v6", None, "v0", "v3", "v1", "v2", "v4", "v5"]
+    # 8 个 key 拆为 3 个 MGET，在同一个 pipeline 中一次提交
+    assert client._client.batches[-1] == ["MGET", "MGET", "MGET"]
+    assert client.mget_many([]) == []
+
+
+def test_pipeline_flushes_every_batch_size():
+    client = make_client(batch_size=2)
+    client.mset_many_with_ttl({f"k:{i}": i for i in range(5)})
+    assert [len(b) for b in client._client.batches] == [2, 2, 1]
+    assert client.mget_many(["k:0", "k:4"], batch_size=10) == ["0", "4"]
+
+
+def test_hgetall_and_delete_many():
+    client = make_client()
+    for i in range(4):
+        client.hset(f"h:{i}", mapping={"id": i})
+    assert client.hgetall_many(["h:0", "none", "h:3"]) == [{"id": "0"}, {}, {"id": "3"}]
+    assert client.delete_many([f"h:{i}" for i in range(4)] + ["none"]) == 4
+    assert client.delete_many([]) == 0
+    assert client.exists("h:0") == 0
+
+
+def test_cluster_uses_per_key_commands():
+    client = make_client(mode="cluster", batch_size=2)
+    client.mset_many_with_ttl({"a": "1", "b": "2", "c": "3"})
+    client._client.batches.clear()
+    # 集群拒绝跨 slot 的 MGET/DEL，逐 key 排入 pipeline，由集群 pipeline 按节点分组
+    assert client.mget_many(["c", "x", "a"]) == ["3", None, "1"]
+    assert client._client.batches == [["GET", "GET"], ["GET"]]
+    assert client.delete_many(["a", "b", "x"]) == 2
+    assert client._client.batches[-2:] == [["DEL", "DEL"], ["DEL"]]
+
+
+def bench(name, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28}: {elapsed * 1e3:8.2f} ms ({elapsed / count * 1e6:.2f} us/key)")
+    return elapsed
+
+
+if __name__ == "__main__":
+    # 需要本地 Redis
+    client = RedisClient(host="localhost", port=6379, batch_size=500)
+    count = 5000
+    data = {f"batch:{i}": f"value-{i}" for i in range(count)}
+    keys = list(data.keys())
+
+    t_set = bench("sequential set", lambda: [client.set(k, v, ex=60) for k, v in data.items()], count)
+    t_mset = bench("mset_many_with_ttl", lambda: client.mset_many_with_ttl(data, ttl=60), count)
+    t_get = bench("sequential get", lambda: [client.get(k) for k in keys], count)
+    t_mget = bench("mget_many", lambda: client.mget_many(keys), count)
+    assert client.mget_many(keys) == list(data.values())
+
+    for i in range(count):
+        client.hset(f"batch:h:{i}", mapping={"id": i, "name": f"n{i}"})
+    hkeys = [f"batch:h:{i}" for i in range(count)]
+    t_hget = bench("sequential hgetall", lambda: [client.hgetall(k) for k in hkeys], count)
+    t_hmany = bench("hgetall_many", lambda: client.hgetall_many(hkeys), count)
+
+    print(f"set 提速 {t_set / t_mset:.1f}x, get 提速 {t_get / t_mget:.1f}x, hgetall 提速 {t_hget / t_hmany:.1f}x")
+    client.delete_many(keys + hkeys)
+    client.close()
@@ -0,0 +1,153 @@
+import sys
+import os
+import time
+import timeit
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+import fakeredis
+import pytest
+from redis import Redis, RedisError
+from db.redisCache import LocalCache, TwoTierCache
+from db.redisClient import RedisClient
+
+
+def test_local_cache_lru():
+    cache = LocalCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # b 最久未使用，被淘汰
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_local_cache_ttl():
+    cache = LocalCache(max_size=10, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def wait_until(predicate, timeout=3):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_invalidate_handler():
+    cache = TwoTierCache(fakeredis.FakeRedis(decode_responses=True), namespace="goods", invalidation="none")
+    for k in ("a", "b", "c"):
+        cache.local.set(k, k)
+    # pubsub 消息内容为业务 key
+    cache._invalidate("a")
+    assert "a" not in cache.local and "b" in cache.local
+    # tracking 推送的是带命名空间前缀的 Redis key，可能为 bytes 列表
+    cache.invalidation = "tracking"
+    cache._invalidate([b"goods:b"])
+    assert "b" not in cache.local and "c" in cache.local
+    # None 表示 FLUSHDB 或连接重建，清空本地缓存
+    cache._invalidate(None)
+    assert len(cache.local) == 0
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_epoch_guard_drops_stale_fill():
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    cache = TwoTierCache(redis, namespace="goods", invalidation="none")
+    cache.set("sku", {"price": 1})
+    get = redis.get
+
+    def racing_get(key):
+        # 读取 Redis 期间其他实例修改了该 key，失效消息先于回填到达
+        value = get(key)
+        cache._invalidate("sku")
+        return value
+
+    cache.redis.get = racing_get
+    assert cache.get("sku") == {"price": 1}
+    assert "sku" not in cache.local
+    cache.redis.get = get
+    assert cache.get("sku") == {"price": 1}
+    assert cache.local.get("sku") == {"price": 1}
+
+
+def test_no_fill_until_channel_ready():
+    cache = TwoTierCache(fakeredis.FakeRedis(decode_responses=True), namespace="goods", invalidation="none")
+    cache.invalidation = "pubsub"
+    cache.set("sku", 1)
+    # 失效通道尚未就绪（或已中断）时只读 Redis，不写本地
+    assert cache.get("sku") == 1 and "sku" not in cache.local
+    cache._ready.set()
+    assert cache.get("sku") == 1 and "sku" in cache.local
+    cache._stop.set()
+    cache._lost(RedisError("connection reset"))
+    assert len(cache.local) == 0 and not cache._ready.is_set()
+
+
+def test_pubsub_invalidation_across_instances():
+    server = fakeredis.FakeServer()
+    writer = TwoTierCache(fakeredis.FakeRedis(server=server, decode_responses=True), namespace="goods",
+                          invalidation="pubsub")
+    reader = TwoTierCache(fakeredis.FakeRedis(server=server, decode_responses=True), namespace="goods",
+                          invalidation="pubsub")
+    try:
+        assert wait_until(lambda: writer._ready.is_set() and reader._ready.is_set())
+        writer.set("sku", {"price": 1})
+        assert reader.get("sku") == {"price": 1} and "sku" in reader.local
+        writer.set("sku", {"price": 2})
+        assert wait_until(lambda: "sku" not in reader.local)
+        assert reader.get("sku") == {"price": 2}
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_tracking_invalidation():
+    # 需要本地 Redis 6+，不可用时跳过
+    redis = Redis(socket_connect_timeout=0.2, decode_responses=True)
+    try:
+        redis.ping()
+    except RedisError:
+        pytest.skip("本地 Redis 不可用")
+    cache = TwoTierCache(redis, namespace="test:tracking", invalidation="tracking")
+    try:
+        assert wait_until(cache._ready.is_set)
+        cache.set("sku", 1)
+        # BCAST 模式下自己的写入同样会推送失效，等其到达后再回填
+        assert wait_until(lambda: cache.stats()["invalidations"] >= 1)
+        assert cache.get("sku") == 1 and "sku" in cache.local
+        # 其他客户端直接修改 Redis，由 CLIENT TRACKING 推送失效
+        redis.set("test:tracking:sku", 2)
+        assert wait_until(lambda: "sku" not in cache.local)
+        assert cache.get("sku") == 2
+    finally:
+        cache.close()
+        redis.delete("test:tracking:sku")
+
+
+if __name__ == "__main__":
+    # 需要本地 Redis 6+
+    redis_client = RedisClient(host="localhost", port=6379)
+    cache = TwoTierCache(redis_client, namespace="bench", invalidation="tracking")
+    time.sleep(0.2)
+    cache.set("hot", {"id": 1, "name": "热点数据"})
+    cache.get("hot")
+    r = redis_client.get_connection()
+    number = 20000
+    t_redis = timeit.timeit(lambda: r.get("bench:hot"), number=number)
+    t_local = timeit.timeit(lambda: cache.get("hot"), number=number)
+    print(f"Redis GET     : {t_redis / number * 1e6:.2f} us/次")
+    print(f"TwoTierCache  : {t_local / number * 1e6:.2f} us/次")
+    r.set("bench:hot", '{"id": 1, "name": "已修改"}')
+    time.sleep(0.05)
+    print("其他客户端修改后:", cache.get("hot"))
+    print(cache.stats())
+    cache.close()
+    redis_client.close()
@@ -0,0 +1,155 @@
+import sys
+import os
+import asyncio
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+import fakeredis
+from redis import asyncio as aioredis
+from db.redisClient import AsyncRedisClient, RedisClient, as_redis, parse_nodes
+
+
+def test_async_connect_without_io():
+    # 端口不可达也能创建客户端，连接在事件循环内按需建立
+    client = AsyncRedisClient(host="127.0.0.1", port=1, client_name="pmf")
+    conn = client.connect()
+    assert isinstance(conn, aioredis.Redis)
+    assert client.connect() is conn and client.get_connection() is conn
+    assert client._pool.connection_kwargs["port"] == 1
+    assert client._pool.connection_kwargs["decode_responses"] is True
+    asyncio.run(client.close())
+    assert client._client is None and client._pool is None
+
+
+def test_async_check_and_forwarding():
+    async def run():
+        client = AsyncRedisClient()
+        client._client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        assert await client.check()
+        # 未定义的属性转发给 redis.asyncio 客户端
+        await client.set("k", "v")
+        assert await client.get("k") == "v"
+        assert as_redis(client) is client._client
+        await client.close()
+        return client
+
+    client = asyncio.run(run())
+    assert client._client is None
+
+
+def test_async_binary_twin():
+    async def run():
+        client = AsyncRedisClient()
+        twin = client.binary()
+        assert twin is client.binary() and twin._conf["decode_responses"] is False
+        assert isinstance(twin.get_connection(), aioredis.Redis)
+        assert client._client is None
+        await client.close()
+        return client, twin
+
+    client, twin = asyncio.run(run())
+    assert client._binary is None and twin._client is None
+
+
+def test_sync_and_async_share_config():
+    kwargs = dict(host="10.0.0.1", port=6380, db=2, password="secret", socket_timeout=1.5, max_connections=20)
+    sync_client, async_client = RedisClient(**kwargs), AsyncRedisClient(**kwargs)
+    assert sync_client._pool_kwargs() == async_client._pool_kwargs()
+    # 值为 None 的参数不传给连接池
+    assert "socket_timeout" not in RedisClient()._pool_kwargs()
+
+
+class FakeNode:
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+
+
+class FakeCluster:
+    def __init__(self, startup_nodes, **kwargs):
+        self.startup_nodes, self.kwargs = startup_nodes, kwargs
+
+
+class FakeSentinel:
+    def __init__(self, sentinels, sentinel_kwargs=None):
+        self.sentinels, self.sentinel_kwargs = sentinels, sentinel_kwargs
+
+    def master_for(self, name, redis_class=None, **kwargs):
+        return type("Master", (), dict(name=name, redis_class=redis_class, kwargs=kwargs, connection_pool="sentinel-pool"))()
+
+
+class FakePool:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+
+class FakeRedis:
+    def __init__(self, connection_pool=None, client_name=None):
+        self.connection_pool, self.client_name = connection_pool, client_name
+
+
+def create(client):
+    return client._create(FakeRedis, FakePool, FakeCluster, FakeNode, FakeSentinel)
+
+
+def test_parse_nodes():
+    assert parse_nodes(None) == [] and parse_nodes("") == []
+    assert parse_nodes("10.0.0.1:7000, 10.0.0.2:7001,") == [("10.0.0.1", 7000), ("10.0.0.2", 7001)]
+    assert parse_nodes(["a:1", ("b", "2")]) == [("a", 1), ("b", 2)]
+    # IPv6 地址按最后一个冒号拆分端口
+    assert parse_nodes(["::1:7000"]) == [("::1", 7000)]
+
+
+def test_mode_resolution():
+    try:
+        RedisClient(mode="replica")
+        assert False, "不支持的 mode 应抛出 ValueError"
+    except ValueError:
+        pass
+    client = RedisClient(host="r1", port=6380)
+    assert client.mode == "standalone" and client.cluster_nodes == [("r1", 6380)] and client.sentinels == []
+    client = AsyncRedisClient(mode="cluster", cluster_nodes="c1:7000,c2:7000")
+    assert client.cluster_nodes == [("c1", 7000), ("c2", 7000)]
+
+
+def test_create_standalone():
+    conn = create(RedisClient(host="r1", port=6380, db=3, client_name="pmf"))
+    assert conn.client_name == "pmf"
+    assert conn.connection_pool.kwargs == dict(host="r1", port=6380, db=3, max_connections=10, decode_responses=True)
+
+
+def test_create_cluster():
+    client = RedisClient(mode="cluster", cluster_nodes=["c1:7000", "c2:7001"], db=3, password="pw", client_name="pmf")
+    conn = create(client)
+    assert isinstance(conn, FakeCluster)
+    assert [(n.host, n.port) for n in conn.startup_nodes] == [("c1", 7000), ("c2", 7001)]
+    # 集群只有 db 0，host/port 由 startup_nodes 给出
+    assert conn.kwargs == dict(client_name="pmf", password="pw", max_connections=10, decode_responses=True)
+    assert client._pool is None
+
+
+def test_create_sentinel():
+    try:
+        create(RedisClient(mode="sentinel"))
+        assert False, "没有 sentinels 时应抛出 ValueError"
+    except ValueError:
+        pass
+    client = RedisClient(mode="sentinel", sentinels="s1:26379,s2:26379", master_name="main", db=1,
+                         password="pw", sentinel_password="spw", socket_timeout=2)
+    conn = create(client)
+    assert client._sentinel.sentinels == [("s1", 26379), ("s2", 26379)]
+    assert client._sentinel.sentinel_kwargs == dict(password="spw", socket_timeout=2)
+    assert conn.name == "main" and conn.redis_class is FakeRedis
+    assert conn.kwargs == dict(client_name=None, db=1, password="pw", socket_timeout=2, max_connections=10,
+                               decode_responses=True)
+    assert client._pool == "sentinel-pool"
+
+
+def test_async_cluster_connect():
+    # redis.asyncio 的 RedisCluster 在首次执行命令时才连接节点
+    client = AsyncRedisClient(mode="cluster", cluster_nodes="127.0.0.1:1")
+    conn = client.connect()
+    assert isinstance(conn, aioredis.RedisCluster)
+    assert [(n.host, n.port) for n in conn.startup_nodes] == [("127.0.0.1", 1)]
+    asyncio.run(client.close())
+    assert client._client is None
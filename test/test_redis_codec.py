@@ -0,0 +1,71 @@
+import sys
+import os
+import time
+import pickle
+import datetime
+from decimal import Decimal
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from db.redisCodec import get_codec, msgpack, lz4_frame
+
+SAMPLE = {
+    "id": 10086, "name": "测试商品", "price": 99.5, "tags": ["a", "b", "c"],
+    "skus": [{"sku": f"SKU-{i}", "stock": i * 3, "enabled": i % 2 == 0} for i in range(50)],
+}
+
+
+def available_codecs():
+    names = ["json", "pickle", "zlib+json", "zlib+pickle"]
+    if msgpack is not None:
+        names += ["msgpack", "zlib+msgpack"]
+    if msgpack is not None and lz4_frame is not None:
+        names.append("lz4+msgpack")
+    return names
+
+
+def test_round_trip():
+    for name in available_codecs():
+        codec = get_codec(name)
+        assert codec.decode(codec.encode(SAMPLE)) == SAMPLE, name
+        assert codec.decode(codec.encode("短值")) == "短值", name
+
+
+def test_compression_threshold():
+    codec = get_codec("zlib+json")
+    assert codec.encode({"a": 1})[:1] == b"\x00"
+    raw = codec.encode(SAMPLE)
+    assert raw[:1] == b"\x01" and len(raw) < len(get_codec("json").encode(SAMPLE))
+
+
+def test_pickle_whitelist():
+    codec = get_codec("pickle")
+    value = {"at": datetime.datetime(2024, 1, 1), "amount": Decimal("1.10")}
+    assert codec.decode(codec.encode(value)) == value
+    try:
+        codec.decode(pickle.dumps(os.system))
+    except pickle.UnpicklingError:
+        pass
+    else:
+        raise AssertionError("不在白名单中的类型应被拒绝")
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_compression_threshold()
+    test_pickle_whitelist()
+    count = 20000
+    print(f"{'codec':<14}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    for name in available_codecs():
+        codec = get_codec(name)
+        raw = codec.encode(SAMPLE)
+        start = time.perf_counter()
+        for _ in range(count):
+            codec.encode(SAMPLE)
+        enc = (time.perf_counter() - start) / count * 1e6
+        start = time.perf_counter()
+        for _ in range(count):
+            codec.decode(raw)
+        dec = (time.perf_counter() - start) / count * 1e6
+        print(f"{name:<14}{len(raw):>8}{enc:>12.2f}{dec:>12.2f}")
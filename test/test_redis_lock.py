@@ -0,0 +1,177 @@
+import sys
+import os
+import threading
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from db import redisLock
+from db.redisLock import RedisLock, single_flight
+
+
+class StubRedis:
+    """只实现锁用到的命令，两段 Lua 脚本以 Python 实现，过期按 time.monotonic 计算"""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, key):
+        item = self.data.get(key)
+        if item is not None and item[1] is not None and time.monotonic() >= item[1]:
+            del self.data[key]
+            return None
+        return item
+
+    def get(self, key):
+        with self.lock:
+            item = self._alive(key)
+            return item[0] if item else None
+
+    def set(self, key, value, nx=False, px=None):
+        with self.lock:
+            if nx and self._alive(key) is not None:
+                return None
+            self.data[key] = (value, time.monotonic() + px / 1000 if px else None)
+            return True
+
+    def exists(self, key):
+        with self.lock:
+            return int(self._alive(key) is not None)
+
+    def delete(self, key):
+        with self.lock:
+            return int(self.data.pop(key, None) is not None)
+
+    def register_script(self, script):
+        def run(keys, args):
+            with self.lock:
+                item = self._alive(keys[0])
+                if item is None or item[0] != args[0]:
+                    return 0
+                if script == redisLock._RELEASE_LUA:
+                    del self.data[keys[0]]
+                else:
+                    self.data[keys[0]] = (item[0], time.monotonic() + int(args[1]) / 1000)
+                return 1
+        return run
+
+
+def test_lock_exclusive_and_timeout():
+    redis = StubRedis()
+    lock = RedisLock(redis, "order:1", ttl=5)
+    assert lock.acquire(blocking=False)
+    other = RedisLock(redis, "order:1", ttl=5)
+    assert not other.acquire(blocking=False)
+    start = time.monotonic()
+    assert not other.acquire(timeout=0.1)
+    assert time.monotonic() - start >= 0.1
+    assert lock.release()
+    assert other.acquire(blocking=False)
+    other.release()
+
+
+def test_release_only_own_lock():
+    redis = StubRedis()
+    first = RedisLock(redis, "order:1", ttl=0.05, auto_renew=False)
+    assert first.acquire()
+    time.sleep(0.06)
+    # 第一个持有者的锁已过期，被其他进程获得
+    second = RedisLock(redis, "order:1", ttl=5, auto_renew=False)
+    assert second.acquire(blocking=False)
+    assert not first.release()
+    assert second.locked()
+    assert second.release()
+    assert not second.locked()
+
+
+def test_auto_renew_and_lost():
+    redis = StubRedis()
+    lock = RedisLock(redis, "job", ttl=0.15)
+    assert lock.acquire()
+    time.sleep(0.4)
+    # 续期线程保持锁有效
+    assert lock.locked() and not lock.lost
+    # 锁被其他人覆盖后停止续期并标记丢失
+    redis.set(lock.key, "other", px=5000)
+    time.sleep(0.15)
+    assert lock.lost
+    assert not lock.release()
+    assert redis.get(lock.key) == "other"
+
+
+def test_single_flight_coalesces_across_processes():
+    redis = StubRedis()
+    calls = []
+
+    def build():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"total": 42}
+
+    results = []
+    # 直接调用 _distributed_flight，模拟多个进程同时计算（不经过进程内合并）
+    threads = [threading.Thread(target=lambda: results.append(
+        redisLock._distributed_flight(redis, "report", build, 0, 5, 2, 0.01))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"total": 42}] * 5
+
+
+def test_single_flight_local_waiters():
+    redis = StubRedis()
+    calls = []
+
+    def build():
+        calls.append(1)
+        time.sleep(0.1)
+        return [1, 2, 3]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(single_flight(redis, "rows", build)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == [[1, 2, 3]] * 5
+
+
+def test_single_flight_cache_is_optional():
+    redis = StubRedis()
+    counter = iter(range(100))
+    # 默认只合并并发调用，之后的调用重新计算
+    assert single_flight(redis, "n", lambda: next(counter)) == 0
+    assert single_flight(redis, "n", lambda: next(counter)) == 1
+    # ttl > 0 时缓存结果
+    assert single_flight(redis, "m", lambda: next(counter), ttl=60) == 2
+    assert single_flight(redis, "m", lambda: next(counter), ttl=60) == 2
+
+
+def test_single_flight_owner_failure():
+    redis = StubRedis()
+
+    def fail():
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def run():
+        try:
+            single_flight(redis, "bad", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 进程内等待方得到同一个异常，锁已释放
+    assert len(errors) == 3
+    assert redis.get("lock:sf:bad") is None
@@ -0,0 +1,146 @@
+import sys
+import os
+import time
+import threading
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+import fakeredis
+from db.redisClient import RedisClient
+from db.redisStream import StreamConsumer, publish
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def make_consumer(redis, callback, **kwargs):
+    options = dict(consumer="c1", start_id="0", block_ms=20, ack_interval=0.02, claim_idle_ms=50,
+                   claim_interval=0.05)
+    options.update(kwargs)
+    return StreamConsumer(redis, "orders", "billing", callback, **options).start()
+
+
+def test_consume_and_ack():
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    for i in range(20):
+        publish(redis, "orders", {"i": i}, headers={"source": "test"})
+    got = []
+    consumer = make_consumer(redis, lambda body, props, headers: got.append((body["i"], headers["source"])))
+    assert wait_until(lambda: consumer.stats["acked"] == 20)
+    consumer.stop()
+    assert sorted(got) == [(i, "test") for i in range(20)]
+    assert redis.xpending("orders", "billing")["pending"] == 0
+
+
+def test_retry_then_dead_letter():
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    publish(redis, "orders", {"i": 1})
+    calls = []
+
+    def fail(body, props, headers):
+        calls.append(props["reclaimed"])
+        raise ValueError("模拟处理失败")
+
+    consumer = make_consumer(redis, fail, max_retries=2)
+    assert wait_until(lambda: redis.xlen("orders:dead") == 1)
+    consumer.stop()
+    # 首次投递 + 2 次重试，之后写入死信流并确认
+    assert calls == [False, True, True]
+    assert consumer.stats["retried"] == 2 and consumer.stats["dead"] == 1
+    assert redis.xpending("orders", "billing")["pending"] == 0
+    dead = redis.xrange("orders:dead")[0][1]
+    assert dead["body"] == '{"i": 1}' and "模拟处理失败" in dead["error"]
+
+
+def test_retry_then_success():
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    publish(redis, "orders", {"i": 1})
+    calls = []
+
+    def flaky(body, props, headers):
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("临时错误")
+
+    consumer = make_consumer(redis, flaky)
+    assert wait_until(lambda: consumer.stats["processed"] == 1)
+    assert wait_until(lambda: consumer.stats["acked"] == 1)
+    consumer.stop()
+    assert len(calls) == 2 and redis.xlen("orders:dead") == 0
+
+
+def test_no_self_reclaim_while_handling():
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    publish(redis, "orders", {"i": 1})
+    calls = []
+
+    def slow(body, props, headers):
+        calls.append(1)
+        # 处理时间远超 claim_idle_ms，不应被本消费者再次接管
+        time.sleep(0.3)
+
+    consumer = make_consumer(redis, slow)
+    assert wait_until(lambda: consumer.stats["acked"] == 1)
+    time.sleep(0.1)
+    consumer.stop()
+    assert len(calls) == 1 and consumer.stats["reclaimed"] == 0
+
+
+def test_reclaim_from_crashed_consumer():
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    redis.xgroup_create("orders", "billing", id="0", mkstream=True)
+    publish(redis, "orders", {"i": 1})
+    redis.xreadgroup("billing", "crashed", {"orders": ">"}, count=1)
+    time.sleep(0.06)
+    got = []
+    consumer = make_consumer(redis, lambda body, props, headers: got.append(props["reclaimed"]))
+    assert wait_until(lambda: consumer.stats["acked"] == 1)
+    consumer.stop()
+    assert got == [True] and consumer.stats["reclaimed"] == 1
+
+
+if __name__ == "__main__":
+    # 需要本地 Redis
+    client = RedisClient(host="localhost", port=6379)
+    stream = "test:stream"
+    client.delete(stream, f"{stream}:dead")
+    client.xgroup_create(stream, "workers", id="0", mkstream=True)
+    # 模拟已崩溃的消费者：读取一条后不确认，应被 XAUTOCLAIM 接管
+    client.publish_stream(stream, {"i": -1})
+    client.xreadgroup("workers", "crashed", {stream: ">"}, count=1)
+
+    count = 5000
+    done = []
+    lock = threading.Lock()
+
+    def cb(body, properties, headers):
+        if body.get("fail"):
+            raise ValueError("模拟处理失败")
+        with lock:
+            done.append(body["i"])
+
+    consumer = client.subscribe_stream(stream, "workers", cb, concurrency=8, batch_size=100,
+                                       claim_idle_ms=200, claim_interval=0.5, max_retries=0)
+    start = time.perf_counter()
+    with client.pipeline(transaction=False) as pipe:
+        for i in range(count):
+            pipe.xadd(stream, {"body": f'{{"i": {i}}}', "content_type": "application/json"})
+        pipe.execute()
+    client.publish_stream(stream, {"fail": True})
+    while len(done) < count + 1 and time.perf_counter() - start < 30:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    consumer.stop()
+
+    print(f"处理 {len(done)} 条，耗时 {elapsed * 1e3:.1f} ms ({len(done) / elapsed:.0f} msg/s)")
+    print(f"统计: {consumer.stats}")
+    assert len(set(done)) == count + 1
+    assert client.xlen(f"{stream}:dead") == 1
+    assert client.xpending(stream, "workers")["pending"] == 0
+    client.delete(stream, f"{stream}:dead")
+    client.close()
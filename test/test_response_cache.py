@@ -0,0 +1,183 @@
+import sys
+import os
+import asyncio
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+import httpx
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from redis import asyncio as aioredis
+from db.redisClient import AsyncRedisClient
+from middleware.responsecache import CacheEntry, CachePolicy, ResponseCache, ResponseCacheMiddleware
+from models import Result
+
+
+def make_app(cache):
+    api = FastAPI()
+    api.add_middleware(ResponseCacheMiddleware, cache=cache)
+    api.state.calls = 0
+
+    @api.get("/goods")
+    async def goods(a: int = 0, b: int = 0):
+        api.state.calls += 1
+        await asyncio.sleep(0.05)
+        return Result.success(data={"a": a, "b": b, "calls": api.state.calls}).response()
+
+    @api.get("/goods/missing")
+    def missing():
+        api.state.calls += 1
+        return Result.error(404, "未找到").response(status_code=404)
+
+    @api.get("/goods/login")
+    def login(response: Response):
+        api.state.calls += 1
+        response.set_cookie("sid", "1")
+        return {"ok": True}
+
+    @api.get("/nocache")
+    def nocache():
+        api.state.calls += 1
+        return {"ok": True}
+
+    return api
+
+
+def make_cache(**kwargs):
+    return ResponseCache([CachePolicy("goods", ttl=30, path="/goods", vary=("x-user-id",))], **kwargs)
+
+
+def test_cache_hit_and_etag():
+    api = make_app(make_cache())
+    client = TestClient(api)
+    first = client.get("/goods?a=1&b=2")
+    assert first.headers["x-cache"] == "MISS" and first.json()["data"]["calls"] == 1
+    # 查询参数顺序不同视为同一请求
+    second = client.get("/goods?b=2&a=1")
+    assert second.headers["x-cache"] == "HIT" and second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert api.state.calls == 1
+    not_modified = client.get("/goods?a=1&b=2", headers={"If-None-Match": f'W/{first.headers["etag"]}'})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert not_modified.headers["etag"] == first.headers["etag"]
+    # vary 头不同、no-cache 时重新执行
+    client.get("/goods?a=1&b=2", headers={"X-User-Id": "7"})
+    client.get("/goods?a=1&b=2", headers={"Cache-Control": "no-cache"})
+    assert api.state.calls == 3
+
+
+def test_uncacheable_responses():
+    api = make_app(make_cache())
+    client = TestClient(api)
+    for path in ("/goods/missing", "/goods/login", "/nocache"):
+        client.get(path)
+        resp = client.get(path)
+        assert "x-cache" not in resp.headers
+    assert api.state.calls == 6
+
+
+def test_concurrent_misses_coalesced():
+    cache = make_cache()
+    api = make_app(cache)
+
+    async def run():
+        transport = httpx.ASGITransport(app=api)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[client.get("/goods?a=5") for _ in range(20)])
+
+    responses = asyncio.run(run())
+    assert api.state.calls == 1
+    assert len({r.content for r in responses}) == 1 and all(r.status_code == 200 for r in responses)
+    assert cache.stats["coalesced"] == 19
+
+
+def test_entry_serialization_and_invalidate():
+    entry = CacheEntry(200, [(b"content-type", b"application/json")], b'{"a":1}\n', b'"abc"', time.time() + 5)
+    assert CacheEntry.loads(entry.dumps()) == entry
+    cache = make_cache()
+    client = TestClient(make_app(cache))
+    client.get("/goods?a=1")
+    client.get("/goods?a=2")
+    assert cache.invalidate("/goods") == 2
+    assert client.get("/goods?a=1").headers["x-cache"] == "MISS"
+
+
+def test_async_cluster_store():
+    # redis.asyncio.RedisCluster 不是 redis.asyncio.Redis 的子类，仍需按协程访问
+    cache = make_cache(redis=AsyncRedisClient(mode="cluster", cluster_nodes="127.0.0.1:1"), store="redis")
+    assert cache.is_async and isinstance(cache.redis, aioredis.RedisCluster)
+    store = {}
+
+    async def get(key):
+        return store.get(key)
+
+    async def set(key, value, ex=None, px=None):
+        store[key] = value
+
+    cache.redis.get, cache.redis.set = get, set
+    client = TestClient(make_app(cache))
+    assert client.get("/goods?a=1").headers["x-cache"] == "MISS"
+    assert client.get("/goods?a=1").headers["x-cache"] == "HIT"
+    assert len(store) == 1 and isinstance(next(iter(store.values())), bytes)
+    # 异步客户端只删除本地缓存（store=redis 时没有本地缓存）
+    assert cache.invalidate("/goods") == 0
+
+
+def test_match_path_segment():
+    cache = ResponseCache([CachePolicy("order", ttl=30, path="/api/v1/order"),
+                           CachePolicy("order-admin", ttl=0, path="/api/v1/order/admin")],
+                          default=CachePolicy("default", ttl=5))
+    assert cache.match("/api/v1/order").name == "order"
+    assert cache.match("/api/v1/order/1").name == "order"
+    # 同前缀的兄弟路径不套用该策略（包括 ttl=0 的排除规则）
+    assert cache.match("/api/v1/orders_export").name == "default"
+    assert cache.match("/api/v1/order/admin/1") is None
+    assert cache.match("/api/v1/order/administrators").name == "order"
+
+
+def test_credentials_not_shared():
+    api = make_app(make_cache())
+    client = TestClient(api)
+    alice = client.get("/goods?a=1", headers={"Authorization": "Bearer alice"})
+    bob = client.get("/goods?a=1", headers={"Authorization": "Bearer bob"})
+    assert "x-cache" not in alice.headers and "x-cache" not in bob.headers
+    assert bob.json()["data"]["calls"] == 2
+    # Cookie 同样不缓存
+    client.get("/goods?a=1", cookies={"sid": "alice"})
+    client.cookies.clear()
+    assert client.get("/goods?a=1", cookies={"sid": "bob"}).json()["data"]["calls"] == 4
+
+
+def test_credentials_vary_or_shared():
+    client = TestClient(make_app(ResponseCache([CachePolicy("goods", ttl=30, path="/goods", vary=("authorization",))])))
+    alice = client.get("/goods?a=1", headers={"Authorization": "Bearer alice"})
+    bob = client.get("/goods?a=1", headers={"Authorization": "Bearer bob"})
+    assert alice.headers["x-cache"] == bob.headers["x-cache"] == "MISS"
+    assert client.get("/goods?a=1", headers={"Authorization": "Bearer alice"}).headers["x-cache"] == "HIT"
+    client = TestClient(make_app(ResponseCache([CachePolicy("goods", ttl=30, path="/goods", shared=True)])))
+    client.get("/goods?a=1", headers={"Authorization": "Bearer alice"})
+    assert client.get("/goods?a=1", headers={"Authorization": "Bearer bob"}).headers["x-cache"] == "HIT"
+
+
+if __name__ == "__main__":
+    # 命中与未命中的单请求耗时（需要本地 Redis）
+    from db.redisClient import RedisClient
+    from test_middleware_bench import call
+
+    redis = RedisClient()
+    for store in ("local", "redis", "both"):
+        cache = ResponseCache([CachePolicy("ping", ttl=60, path="/ping")], redis=redis, store=store)
+        api = FastAPI()
+        api.add_middleware(ResponseCacheMiddleware, cache=cache)
+
+        @api.get("/ping")
+        async def ping():
+            await asyncio.sleep(0.002)      # 模拟一次数据库查询
+            return {"code": 200, "msg": "success", "data": "pong"}
+
+        cache.invalidate("/ping")
+        us = asyncio.run(call(api, 2000))
+        print(f"{store:<6}: {us:7.1f} us/请求 {cache.stats}")
+    redis.close()
@@ -0,0 +1,153 @@
+import sys
+import os
+import asyncio
+import json
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, date
+from decimal import Decimal
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from models import Result, ResultResponse, ResultStream
+from models.result import json_default
+
+
+def make_rows(n):
+    return [{"id": i, "order_no": f"NO{i:08d}", "amount": Decimal(f"{i}.50"), "qty": Decimal(i),
+             "created_at": datetime(2025, 1, 1, 8, 30, i % 60), "day": date(2025, 1, 1),
+             "buyer": {"uid": uuid.UUID(int=i), "tags": ["a", "b"]}} for i in range(n)]
+
+
+def test_matches_jsonable_encoder():
+    oid = ObjectId("65a1b2c3d4e5f60718293a4b")
+    result = Result.success_page(data=dict(rows=make_rows(3), oid=oid, raw=b"abc", codes={1, }), total=3)
+    expected = jsonable_encoder(result.to_dict(), custom_encoder={ObjectId: str})
+    assert json.loads(result.to_bytes()) == expected
+    # 标准库回退路径输出一致
+    fallback = json.dumps(result.to_dict(), ensure_ascii=False, separators=(",", ":"), default=json_default)
+    assert json.loads(fallback) == expected
+
+
+def test_sqlalchemy_rows():
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT 1 AS id, 'a' AS name UNION ALL SELECT 2, 'b'")).all()
+        data = json.loads(Result.success(data=rows).to_bytes())["data"]
+        assert data == [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+        cursor = conn.execute(text("SELECT 3 AS id"))
+        assert json.loads(Result.success(data=cursor).to_bytes())["data"] == [{"id": 3}]
+
+
+def test_route():
+    api = FastAPI()
+
+    @api.get("/orders", response_class=ResultResponse)
+    def orders():
+        return Result.success_page(data=make_rows(2), total=2).response()
+
+    @api.get("/missing", response_class=ResultResponse)
+    def missing():
+        return Result.error(404, "未找到").response(status_code=404)
+
+    client = TestClient(api)
+    resp = client.get("/orders")
+    assert resp.headers["content-type"] == "application/json"
+    body = resp.json()
+    assert body["page"]["total"] == 2 and body["data"][1]["amount"] == 1.5
+    assert body["data"][0]["created_at"] == "2025-01-01T08:30:00"
+    resp = client.get("/missing")
+    assert resp.status_code == 404 and resp.json()["msg"] == "未找到"
+
+
+def stream_app():
+    api = FastAPI()
+
+    @api.get("/export")
+    def export(n: int = 5, total: int = None):
+        return Result.success_stream(make_rows(n), page_index=1, page_size=n, total=total, batch_size=2)
+
+    @api.get("/export/async")
+    async def export_async(n: int = 5):
+        async def rows():
+            for row in make_rows(n):
+                yield row
+        return Result.success_stream(rows(), batch_size=2)
+
+    @api.get("/export/batches")
+    def export_batches(ndjson: bool = False):
+        return Result.success_stream(iter([make_rows(2), [], make_rows(1)]), batched=True, ndjson=ndjson)
+
+    return api
+
+
+def test_stream_envelope():
+    client = TestClient(stream_app())
+    body = client.get("/export").json()
+    expected = jsonable_encoder(Result.success_page(data=make_rows(5), page_index=1, page_size=5, total=5).to_dict())
+    assert body == expected
+    assert client.get("/export", params={"total": 100}).json()["page"]["total"] == 100
+    # 无数据时 total 为 0，与 Result.to_dict 一致不输出 page
+    assert client.get("/export", params={"n": 0}).json() == {"code": 200, "msg": "success", "data": []}
+    body = client.get("/export/async").json()
+    assert "page" not in body and [r["id"] for r in body["data"]] == [0, 1, 2, 3, 4]
+    assert [r["id"] for r in client.get("/export/batches").json()["data"]] == [0, 1, 0]
+
+
+def test_stream_ndjson():
+    resp = TestClient(stream_app()).get("/export/batches", params={"ndjson": True})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = resp.text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [0, 1, 0]
+
+
+def stream_peak(n):
+    """直接以 ASGI 方式输出 n 行并丢弃，返回 (峰值内存字节, 输出字节数)"""
+    def rows():
+        for i in range(n):
+            yield {"id": i, "order_no": f"NO{i:08d}", "amount": Decimal(f"{i}.50"), "created_at": datetime(2025, 1, 1)}
+
+    sent = 0
+
+    async def receive():
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal sent
+        sent += len(message.get("body", b""))
+
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "method": "GET", "path": "/", "headers": []}
+    tracemalloc.start()
+    asyncio.run(Result.success_stream(rows(), batch_size=500)(scope, receive, send))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, sent
+
+
+if __name__ == "__main__":
+    for n in (10000, 100000, 300000):
+        start = time.perf_counter()
+        peak, sent = stream_peak(n)
+        print(f"流式输出 {n:>8} 行: {sent / 1e6:7.1f} MB, 峰值内存 {peak / 1e6:5.2f} MB, "
+              f"{time.perf_counter() - start:5.2f}s")
+    for size in (100, 1000, 10000):
+        result = Result.success_page(data=make_rows(size), page_size=size, total=size * 10)
+        count = max(10, 20000 // size)
+        start = time.perf_counter()
+        for _ in range(count):
+            JSONResponse(jsonable_encoder(result.to_dict()))
+        t_default = (time.perf_counter() - start) / count * 1000
+        start = time.perf_counter()
+        for _ in range(count):
+            result.response()
+        t_fast = (time.perf_counter() - start) / count * 1000
+        print(f"分页 {size:>5} 行: jsonable_encoder+JSONResponse {t_default:8.2f} ms, "
+              f"ResultResponse {t_fast:6.2f} ms, {t_default / t_fast:5.1f}x")
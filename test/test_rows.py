@@ -0,0 +1,78 @@
+import sys
+import os
+from collections import namedtuple
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import create_engine, text
+from db.mysqlClient import rows_to_dicts, rows_to_columns, rows_to_json, rows_to_split
+from models import Result
+from utils.jsonutil import dumps
+
+SQL = text("SELECT id, channel_id FROM pay_channel ORDER BY id")
+
+
+def new_engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE pay_channel (id INTEGER PRIMARY KEY, channel_id TEXT)"))
+        conn.execute(text("INSERT INTO pay_channel (channel_id) VALUES ('wx'), ('ali')"))
+    return engine
+
+
+def test_rows_to_dicts():
+    with new_engine().connect() as conn:
+        expected = [row._asdict() for row in conn.execute(SQL)]
+        assert rows_to_dicts(conn.execute(SQL)) == expected
+        assert rows_to_dicts(conn.execute(SQL).all()) == expected
+        assert rows_to_dicts([]) == []
+
+
+def test_rows_to_columns():
+    with new_engine().connect() as conn:
+        assert rows_to_columns(conn.execute(SQL)) == {"id": [1, 2], "channel_id": ["wx", "ali"]}
+        # 空结果保留列名
+        assert rows_to_columns(conn.execute(text("SELECT id, channel_id FROM pay_channel WHERE id < 0"))) == \
+            {"id": [], "channel_id": []}
+
+
+def test_rows_to_split():
+    with new_engine().connect() as conn:
+        assert rows_to_split(conn.execute(SQL)) == {"columns": ["id", "channel_id"], "data": [(1, "wx"), (2, "ali")]}
+        assert rows_to_split(conn.execute(SQL).all()) == rows_to_split(conn.execute(SQL))
+        assert Result.success_rows(conn.execute(SQL), orient="split").data["columns"] == ["id", "channel_id"]
+
+
+def test_rows_to_json():
+    with new_engine().connect() as conn:
+        assert rows_to_json(conn.execute(SQL)) == b'[{"id":1,"channel_id":"wx"},{"id":2,"channel_id":"ali"}]'
+        assert rows_to_json(conn.execute(SQL), orient="columns") == b'{"id":[1,2],"channel_id":["wx","ali"]}'
+        assert rows_to_json(conn.execute(SQL), orient="split") == \
+            b'{"columns":["id","channel_id"],"data":[[1,"wx"],[2,"ali"]]}'
+        try:
+            rows_to_json(conn.execute(SQL), orient="index")
+            assert False, "不支持的 orient 应抛出 ValueError"
+        except ValueError:
+            pass
+
+
+def test_rows_to_json_shares_result_encoder():
+    Row = namedtuple("Row", ["amount", "price", "at", "raw"])
+    rows = [Row(Decimal("2"), Decimal("1.50"), datetime(2025, 1, 2, 3, 4, 5), b"ab")]
+    # rows_to_json 与 Result 响应使用同一个类型转换
+    assert rows_to_json(rows) == dumps(Result.success_rows(rows).data)
+    assert rows_to_json(rows) == b'[{"amount":2,"price":1.5,"at":"2025-01-02T03:04:05","raw":"ab"}]'
+
+
+def test_success_rows():
+    with new_engine().connect() as conn:
+        assert Result.success_rows(conn.execute(SQL)).data == [{"id": 1, "channel_id": "wx"}, {"id": 2, "channel_id": "ali"}]
+        assert Result.success_rows(conn.execute(SQL), orient="columns").data == {"id": [1, 2], "channel_id": ["wx", "ali"]}
+        try:
+            Result.success_rows(conn.execute(SQL), orient="column")
+            assert False, "不支持的 orient 应抛出 ValueError"
+        except ValueError:
+            pass
@@ -0,0 +1,135 @@
+import sys
+import os
+import asyncio
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from middleware.tracing import TracingMiddleware
+from utils import traceutil
+from utils.traceutil import Tracer, SpanContext
+
+
+class Collector:
+    """收集导出的 OTLP 请求体"""
+
+    def __init__(self):
+        self.payloads = []
+
+    def __call__(self, payload):
+        self.payloads.append(payload)
+
+    @property
+    def spans(self):
+        return [s for p in self.payloads for rs in p["resourceSpans"] for ss in rs["scopeSpans"] for s in ss["spans"]]
+
+
+def make_app():
+    api = FastAPI()
+    api.add_middleware(TracingMiddleware)
+
+    @api.get("/orders/{order_id}")
+    def order(order_id: int):
+        with traceutil.start_span("load order", attributes={"order.id": order_id}):
+            headers = traceutil.inject({})
+        return headers
+
+    return api
+
+
+def test_traceparent():
+    ctx = SpanContext("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)
+    value = traceutil.format_traceparent(ctx)
+    assert value == "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    assert traceutil.parse_traceparent(value) == ctx
+    assert traceutil.parse_traceparent(value.encode()) == ctx
+    for bad in (None, "", "00-abc-def-01", "00-00000000000000000000000000000000-00f067aa0ba902b7-01",
+                "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-zz"):
+        assert traceutil.parse_traceparent(bad) is None
+
+
+def test_disabled_by_default():
+    span = traceutil.start_span("noop")
+    assert not span.recording and span.context is None
+    with span:
+        assert traceutil.inject({}) == {}
+
+
+def test_middleware_continues_trace():
+    collector = Collector()
+    tracer = traceutil.set_tracer(Tracer("test-api", collector))
+    try:
+        parent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        resp = TestClient(make_app()).get("/orders/7", headers={"traceparent": parent})
+        tracer.flush()
+    finally:
+        traceutil.set_tracer(Tracer())
+    assert resp.status_code == 200
+    server, child = sorted(collector.spans, key=lambda s: s["kind"], reverse=True)
+    assert server["name"] == "GET /orders/{order_id}" and server["kind"] == 2
+    assert server["traceId"] == child["traceId"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert server["parentSpanId"] == "00f067aa0ba902b7"
+    assert child["parentSpanId"] == server["spanId"]
+    # handler 中注入的是子 span 的上下文，响应头返回服务端 span 的上下文
+    assert resp.json()["traceparent"].split("-")[2] == child["spanId"]
+    assert resp.headers["traceparent"].split("-")[2] == server["spanId"]
+    resource = collector.payloads[0]["resourceSpans"][0]["resource"]["attributes"]
+    assert {"key": "service.name", "value": {"stringValue": "test-api"}} in resource
+
+
+def test_head_sampling():
+    collector = Collector()
+    tracer = traceutil.set_tracer(Tracer("test-api", collector, sample_rate=0))
+    try:
+        resp = TestClient(make_app()).get("/orders/1")
+        tracer.flush()
+    finally:
+        traceutil.set_tracer(Tracer())
+    # 未采样：不导出，但上下文照常传递且标记为未采样
+    assert collector.spans == []
+    assert resp.json()["traceparent"].endswith("-00")
+    assert tracer.stats()["sampled"] == 0
+
+
+def test_async_cluster_pipeline():
+    # redis.asyncio 的 ClusterPipeline 没有 command_stack；空 pipeline 不访问集群节点
+    from db.redisClient import AsyncRedisClient
+    collector = Collector()
+    tracer = traceutil.set_tracer(Tracer("test-api", collector))
+
+    async def run():
+        client = AsyncRedisClient(mode="cluster", cluster_nodes="127.0.0.1:7000")
+        result = await client.connect().pipeline().execute()
+        await client.close()
+        return result
+
+    try:
+        assert asyncio.run(run()) == []
+        tracer.flush()
+    finally:
+        traceutil.set_tracer(Tracer())
+    span, = collector.spans
+    assert span["name"] == "redis PIPELINE"
+    assert {"key": "db.redis.commands", "value": {"intValue": "0"}} in span["attributes"]
+
+
+if __name__ == "__main__":
+    # 每条 Redis 命令的追踪开销（需要本地 Redis）
+    from db.redisClient import RedisClient
+
+    count = 20000
+    for name, tracer in (("未启用", Tracer()), ("采样 0", Tracer("bench", Collector(), sample_rate=0)),
+                         ("采样 0.1", Tracer("bench", Collector(), sample_rate=0.1)),
+                         ("采样 1", Tracer("bench", Collector(), sample_rate=1, max_queue=count * 2))):
+        traceutil.set_tracer(tracer)
+        client = RedisClient()
+        client.set("trace:bench", "1")
+        start = time.perf_counter()
+        for _ in range(count):
+            client.get("trace:bench")
+        us = (time.perf_counter() - start) / count * 1e6
+        client.close()
+        print(f"GET {name:<8}: {us:6.1f} us/命令  {tracer.stats()}")
@@ -0,0 +1,67 @@
+import dataclasses
+import enum
+import json
+import uuid
+from datetime import datetime, date, time
+from decimal import Decimal
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，缺失时退回标准库 json
+    orjson = None
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+"""
+JSON 序列化：Result 响应、rows_to_json 等共用同一个类型转换，输出与 FastAPI jsonable_encoder 保持一致。
+"""
+
+
+def json_default(obj: Any) -> Any:
+    """
+    orjson/json 无法直接序列化的类型：
+    datetime/date/time、Decimal、ObjectId、bytes、SQLAlchemy Row/Result/ORM 对象、pydantic 模型、Result 等
+    """
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if ObjectId is not None and isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return bytes(obj).decode()
+    if hasattr(obj, "_mapping"):
+        # SQLAlchemy Row
+        return dict(obj._mapping)
+    if hasattr(obj, "returns_rows"):
+        # SQLAlchemy Result，整体转换
+        from db.mysqlClient import rows_to_dicts
+        return rows_to_dicts(obj)
+    if hasattr(obj, "__table__"):
+        # SQLAlchemy ORM 对象
+        return {c.key: getattr(obj, c.key, None) for c in obj.__table__.columns}
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if callable(getattr(obj, "to_dict", None)):
+        # models.Result 等提供 to_dict() 的对象
+        return obj.to_dict()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """序列化为紧凑的 JSON 字节串，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8")
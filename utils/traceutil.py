@@ -0,0 +1,366 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List, Mapping, MutableMapping, NamedTuple, Optional
+
+"""
+轻量分布式追踪，兼容 OpenTelemetry：
+    - 上下文按 W3C Trace Context 传播（traceparent 头），可与其他语言的 OpenTelemetry 服务串联
+    - 导出 OTLP/JSON：FileExporter 写入 JSONL 文件，OTLPExporter 发送到本地 collector（默认 http://127.0.0.1:4318/v1/traces）
+    - 基于头部的采样：根 span 按 sample_rate 决定是否采样，下游 span 与跨服务调用沿用同一决定，
+      未采样的请求只传递上下文，不记录也不导出
+
+未启用时（默认）start_span 返回空 span，各客户端在建立连接时检查 enabled()，未启用则不安装任何钩子。
+
+Usage:
+    traceutil.set_tracer(Tracer("order-api", OTLPExporter(), sample_rate=0.1))
+    with traceutil.start_span("calc", attributes={"order.id": 1}) as span:
+        ...
+    headers = traceutil.inject({})            # {"traceparent": "00-<trace_id>-<span_id>-01"}
+    parent = traceutil.extract(message_headers)
+"""
+
+logger = logging.getLogger(__name__)
+
+# span 类型，与 OpenTelemetry SpanKind 对应
+KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+
+class SpanContext(NamedTuple):
+    trace_id: str   # 32 位十六进制
+    span_id: str    # 16 位十六进制
+    sampled: bool
+
+
+def format_traceparent(ctx: SpanContext) -> str:
+    return f"00-{ctx.trace_id}-{ctx.span_id}-{'01' if ctx.sampled else '00'}"
+
+
+def parse_traceparent(value: Any) -> Optional[SpanContext]:
+    """解析 traceparent，格式错误时返回 None"""
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    if not isinstance(value, str):
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[0] == "ff":
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        if int(parts[1], 16) == 0 or int(parts[2], 16) == 0:
+            return None
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 1))
+
+
+_current: contextvars.ContextVar[Optional[SpanContext]] = contextvars.ContextVar("pmf_trace_context", default=None)
+
+
+class Span:
+    """记录中的 span，使用 with 语句时在代码块内成为当前 span"""
+    __slots__ = ("tracer", "name", "context", "parent_id", "kind", "start_ns", "end_ns", "attributes",
+                 "status", "message", "_token")
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, context: SpanContext, parent_id: Optional[str], kind: str,
+                 attributes: Optional[Dict[str, Any]]):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = STATUS_UNSET
+        self.message = ""
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, error: Any) -> None:
+        self.status = STATUS_ERROR
+        self.message = str(error)[:500]
+        if isinstance(error, BaseException):
+            self.attributes["exception.type"] = type(error).__name__
+
+    def end(self) -> None:
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        self.tracer._export(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self.context)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.set_error(exc)
+        _current.reset(self._token)
+        self.end()
+
+
+class NonRecordingSpan:
+    """未采样或未启用追踪时的 span：只传递上下文，不记录"""
+    __slots__ = ("context", "_token")
+    recording = False
+
+    def __init__(self, context: Optional[SpanContext]):
+        self.context = context
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, error: Any) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "NonRecordingSpan":
+        if self.context is not None:
+            self._token = _current.set(self.context)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+
+
+_NOOP = NonRecordingSpan(None)
+
+
+def _attr_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _attributes(attrs: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _attr_value(v)} for k, v in attrs.items() if v is not None]
+
+
+def to_otlp(spans: List[Span], resource: Mapping[str, Any]) -> Dict[str, Any]:
+    """转换为 OTLP/JSON ExportTraceServiceRequest"""
+    items = []
+    for s in spans:
+        item = {"traceId": s.context.trace_id, "spanId": s.context.span_id, "name": s.name,
+                "kind": KINDS.get(s.kind, 1), "startTimeUnixNano": str(s.start_ns), "endTimeUnixNano": str(s.end_ns),
+                "attributes": _attributes(s.attributes), "status": {"code": s.status}}
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        if s.message:
+            item["status"]["message"] = s.message
+        items.append(item)
+    return {"resourceSpans": [{"resource": {"attributes": _attributes(resource)},
+                               "scopeSpans": [{"scope": {"name": "pmf"}, "spans": items}]}]}
+
+
+class FileExporter:
+    """每批写入一行 OTLP/JSON，可由 collector 的 filelog/otlpjsonfile receiver 读取"""
+
+    def __init__(self, path: str = "logs/traces.jsonl"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, payload: Dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+class OTLPExporter:
+    """OTLP/HTTP JSON 协议发送到 collector"""
+
+    def __init__(self, endpoint: str = "http://127.0.0.1:4318/v1/traces", timeout: float = 5,
+                 headers: Optional[Dict[str, str]] = None):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def __call__(self, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        req = urllib.request.Request(self.endpoint, data=data, headers=self.headers, method="POST")
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+
+class Tracer:
+    """
+    :param service_name: 服务名，作为 resource 的 service.name
+    :param exporter: 接收 OTLP/JSON 请求体的可调用对象，None 表示不启用
+    :param sample_rate: 根 span 的采样率
+    :param max_queue: 待导出 span 队列容量，满时丢弃
+    :param batch_size: 每批导出的最大 span 数
+    :param flush_interval: 不足一批时最长等待秒数
+    """
+
+    def __init__(self, service_name: str = "pmf", exporter: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 sample_rate: float = 1.0, max_queue: int = 4096, batch_size: int = 512, flush_interval: float = 2.0):
+        self.service_name = service_name
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.resource = {"service.name": service_name, "telemetry.sdk.name": "pmf", "telemetry.sdk.language": "python"}
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._stats = dict(started=0, sampled=0, exported=0, dropped=0, failed=0)
+        self._thread: Optional[threading.Thread] = None
+        if exporter is not None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start_span(self, name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None,
+                   parent: Optional[SpanContext] = None):
+        """
+        创建 span，需调用 end() 或使用 with 语句结束
+        :param parent: 上游传入的上下文，默认使用当前 span
+        """
+        if self.exporter is None:
+            return _NOOP
+        parent = parent or _current.get()
+        self._stats["started"] += 1
+        if parent is None:
+            trace_id = f"{random.getrandbits(128) or 1:032x}"
+            sampled = random.random() < self.sample_rate
+        else:
+            trace_id, sampled = parent.trace_id, parent.sampled
+        context = SpanContext(trace_id, f"{random.getrandbits(64) or 1:016x}", sampled)
+        if not sampled:
+            return NonRecordingSpan(context)
+        self._stats["sampled"] += 1
+        return Span(self, name, context, parent.span_id if parent else None, kind, attributes)
+
+    def _export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self._stats["dropped"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self._stats)
+        s["queued"] = self._queue.qsize()
+        return s
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        deadline = 0.0
+        while True:
+            timeout = max(deadline - time.monotonic(), 0) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, Span):
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._flush(batch)
+                batch = []
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _flush(self, batch: List[Span]) -> None:
+        try:
+            self.exporter(to_otlp(batch, self.resource))
+            self._stats["exported"] += len(batch)
+        except Exception as e:
+            self._stats["failed"] += len(batch)
+            logger.warning(f"追踪数据导出失败，丢弃 {len(batch)} 个 span: {e}")
+
+    def flush(self, timeout: float = 5) -> bool:
+        """导出已结束的 span 并等待完成"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+
+tracer = Tracer()
+
+
+def set_tracer(new_tracer: Tracer) -> Tracer:
+    """替换全局 tracer，需在各客户端建立连接之前调用"""
+    global tracer
+    tracer = new_tracer
+    return tracer
+
+
+def enabled() -> bool:
+    return tracer.exporter is not None
+
+
+def start_span(name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None,
+               parent: Optional[SpanContext] = None):
+    return tracer.start_span(name, kind, attributes, parent)
+
+
+def current_context() -> Optional[SpanContext]:
+    return _current.get()
+
+
+def inject(headers: Optional[MutableMapping[str, Any]] = None,
+           context: Optional[SpanContext] = None) -> MutableMapping[str, Any]:
+    """把当前（或指定）上下文写入 headers 的 traceparent"""
+    headers = {} if headers is None else headers
+    context = context or _current.get()
+    if context is not None:
+        headers["traceparent"] = format_traceparent(context)
+    return headers
+
+
+def extract(headers: Optional[Mapping[str, Any]]) -> Optional[SpanContext]:
+    if not headers:
+        return None
+    return parse_traceparent(headers.get("traceparent"))
+
+
+def from_config(conf: Mapping[str, Any], default_service: str = "pmf") -> Tracer:
+    """
+    按配置 pmf.trace 创建并设置全局 tracer:
+        trace:
+          enabled: true
+          service: order-api          # 默认使用应用名
+          sample_rate: 0.1
+          exporter: otlp              # otlp / file
+          endpoint: http://127.0.0.1:4318/v1/traces
+          file: logs/traces.jsonl
+    """
+    if not conf or not conf.get("enabled", False):
+        return tracer
+    if conf.get("exporter", "otlp") == "file":
+        exporter = FileExporter(conf.get("file", "logs/traces.jsonl"))
+    else:
+        exporter = OTLPExporter(conf.get("endpoint", "http://127.0.0.1:4318/v1/traces"))
+    return set_tracer(Tracer(conf.get("service") or default_service, exporter,
+                             sample_rate=float(conf.get("sample_rate", 1.0)),
+                             max_queue=int(conf.get("queue", 4096)), batch_size=int(conf.get("batch", 512))))
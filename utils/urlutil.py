@@ -6,4 +6,8 @@ def url_encode(raw_string: str) -> str:
 
 def url_decode(encoded: str) -> str:
     """URL解码"""
-    return urllib.parse.unquote(encoded)
\ No newline at end of file
+    return urllib.parse.unquote(encoded)
+
+def path_matches(path: str, prefix: str) -> bool:
+    """按路径段匹配前缀：/api/v1/order 匹配 /api/v1/order 与 /api/v1/order/1，不匹配 /api/v1/orders_export"""
+    return path == prefix or path.startswith(prefix.rstrip("/") + "/")
@@ -1,7 +1,22 @@
 import zipfile
 import gzip
 import os
+import zlib
 from io import BytesIO
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
 
 def zip_files(filename: str, files: list[str], srcpath: str, aliasnames: list[str] = None) -> None:
     """压缩多个文件"""
@@ -16,14 +31,84 @@ def zip_files(filename: str, files: list[str], srcpath: str, aliasnames: list[st
                 arcname = arcname.replace(old, new)
             zf.write(file, arcname=arcname)
 
-def compress(data: bytes) -> bytes:
+def compress(data: bytes, level: int = 9) -> bytes:
     """Gzip压缩"""
     buf = BytesIO()
-    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=level) as f:
         f.write(data)
     return buf.getvalue()
 
 def decompress(data: bytes) -> bytes:
     """Gzip解压缩"""
     with gzip.GzipFile(fileobj=BytesIO(data), mode='rb') as f:
-        return f.read()
\ No newline at end of file
+        return f.read()
+
+
+# HTTP Content-Encoding 压缩，gzip 使用标准库，br/zstd 在安装了 brotli/zstandard 时可用
+# 默认压缩级别：gzip 1-9，br 0-11，zstd 1-22
+DEFAULT_LEVELS: Dict[str, int] = {"zstd": 3, "br": 4, "gzip": 6}
+
+
+def available_encodings() -> list[str]:
+    """当前环境可用的编码，按压缩效率从高到低"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+class StreamCompressor:
+    """
+    流式压缩：compress(chunk) 返回可以立即发送的压缩数据（每块都做同步刷新，客户端可以边收边解压），
+    finish() 返回结束数据
+    """
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        self.encoding = encoding
+        level = DEFAULT_LEVELS.get(encoding, 6) if level is None else level
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br" and brotli is not None:
+            self._obj = brotli.Compressor(quality=level)
+        elif encoding == "zstd" and zstandard is not None:
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"不支持的编码: {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.compress(chunk) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._obj.process(chunk) + self._obj.flush()
+        return self._obj.compress(chunk) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+def compress_as(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """按编码一次性压缩"""
+    level = DEFAULT_LEVELS.get(encoding, 6) if level is None else level
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=level)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"不支持的编码: {encoding}")
+
+
+def decompress_as(data: bytes, encoding: str) -> bytes:
+    """按编码解压"""
+    if encoding == "gzip":
+        return zlib.decompress(data, 47)
+    if encoding == "br" and brotli is not None:
+        return brotli.decompress(data)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError(f"不支持的编码: {encoding}")